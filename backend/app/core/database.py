@@ -1,29 +1,174 @@
-from sqlalchemy import create_engine
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 import os
 
-# Use SQLite for local development if PostgreSQL URL not available
-db_url = settings.DATABASE_URL
-if not db_url or 'postgresql' in db_url:
-    # Fall back to SQLite for local development
-    db_url = 'sqlite:///./scrapper.db'
+def get_sync_url(url: str) -> str:
+    """A bare postgresql:// URL goes through psycopg 3 (what requirements.txt installs), not psycopg2"""
+    scheme, rest = url.split("://", 1)
+    if scheme in ("postgresql", "postgres"):
+        return f"postgresql+psycopg://{rest}"
+    return url
+
+# Fall back to SQLite for local development only when no database is configured
+db_url = get_sync_url(settings.DATABASE_URL) if settings.DATABASE_URL else 'sqlite:///./scrapper.db'
+
+class PoolMetrics:
+    """Checkout counters for one engine's pool, fed by pool events"""
+
+    def __init__(self, role: str):
+        self.role = role
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        # Checkouts that took the last free slot: the next caller waits up to pool_timeout
+        self.saturated_checkouts = 0
+        self.peak_checked_out = 0
+        self._lock = threading.Lock()
+
+    def attach(self, pool, limit: int = None):
+        @event.listens_for(pool, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            with self._lock:
+                self.connects += 1
+
+        @event.listens_for(pool, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            checked_out = pool.checkedout() if hasattr(pool, "checkedout") else 0
+            with self._lock:
+                self.checkouts += 1
+                self.peak_checked_out = max(self.peak_checked_out, checked_out)
+                if limit and checked_out >= limit:
+                    self.saturated_checkouts += 1
+
+        @event.listens_for(pool, "invalidate")
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            with self._lock:
+                self.invalidations += 1
+
+    def snapshot(self, pool) -> dict:
+        data = {
+            "role": self.role,
+            "checkouts": self.checkouts,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "saturated_checkouts": self.saturated_checkouts,
+            "peak_checked_out": self.peak_checked_out,
+        }
+        # QueuePool gauges; SQLite's pools don't have them
+        for gauge in ("size", "checkedout", "checkedin", "overflow"):
+            if hasattr(pool, gauge):
+                data[gauge] = getattr(pool, gauge)()
+        return data
+
+def pool_options(role: str) -> dict:
+    """create_engine pool arguments for a process role"""
+    if "postgresql" not in db_url:
+        return {}
+    profile = settings.DB_POOL_PROFILES.get(role, settings.DB_POOL_PROFILES["api"])
+    return {
+        "pool_size": profile["pool_size"],
+        "max_overflow": profile["max_overflow"],
+        "pool_timeout": profile["pool_timeout"],
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": True,
+    }
+
+def connect_args(role: str, is_async: bool = False) -> dict:
+    """Driver connect arguments: statement timeout and PgBouncer compatibility"""
+    if "sqlite" in db_url:
+        return {} if is_async else {"check_same_thread": False}
+    timeout = settings.DB_POOL_PROFILES.get(role, settings.DB_POOL_PROFILES["api"])["statement_timeout_ms"]
+    if is_async:
+        if settings.DB_PGBOUNCER:
+            return {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return {"server_settings": {"statement_timeout": str(timeout)}}
+    if settings.DB_PGBOUNCER:
+        # PgBouncer rejects unknown startup options; set statement_timeout on the database role
+        return {}
+    return {"options": f"-c statement_timeout={timeout}"}
+
+def instrument(pool, role: str, options: dict) -> PoolMetrics:
+    """Attach checkout metrics to a pool built from `options`"""
+    metrics = PoolMetrics(role)
+    limit = options["pool_size"] + options["max_overflow"] if options else None
+    metrics.attach(pool, limit)
+    return metrics
+
+def build_engine(role: str):
+    """Sync engine with the pool profile of `role`"""
+    options = pool_options(role)
+    new_engine = create_engine(
+        db_url,
+        connect_args=connect_args(role),
+        echo=settings.SQL_ECHO,
+        **options
+    )
+    new_engine.pool_metrics = instrument(new_engine.pool, role, options)
+    return new_engine
 
 # Create database engine
-engine = create_engine(
-    db_url,
-    connect_args={"check_same_thread": False} if "sqlite" in db_url else {},
-    pool_pre_ping=True if "postgresql" in db_url else False,
-    echo=settings.DEBUG
-)
+engine = build_engine(settings.DB_ROLE)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def configure_database(role: str):
+    """
+    Rebuild the sync engine for this process's role. Called from Celery's
+    worker_process_init / beat_init; connections inherited over fork are
+    abandoned without closing them, since the parent still owns the sockets.
+    """
+    global engine
+    if engine.pool_metrics.role == role:
+        engine.dispose(close=False)
+        return
+    old_engine, engine = engine, build_engine(role)
+    old_engine.dispose(close=False)
+    SessionLocal.configure(bind=engine)
+
+def get_async_url(url: str) -> str:
+    """Same database through an asyncio driver (asyncpg / aiosqlite)"""
+    scheme, rest = url.split("://", 1)
+    if scheme.startswith("postgresql"):
+        return f"postgresql+asyncpg://{rest}"
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+# Async engine for request handlers, so queries don't block the event loop
+async_engine = create_async_engine(
+    get_async_url(db_url),
+    connect_args=connect_args("api", is_async=True),
+    echo=settings.SQL_ECHO,
+    **pool_options("api")
+)
+async_engine.sync_engine.pool_metrics = instrument(async_engine.sync_engine.pool, "api-async", pool_options("api"))
+
+# expire_on_commit=False: attributes can't lazy-load outside the session's greenlet
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+def pool_metrics() -> list:
+    """Pool gauges and counters for every engine in this process"""
+    return [
+        engine.pool_metrics.snapshot(engine.pool),
+        async_engine.sync_engine.pool_metrics.snapshot(async_engine.sync_engine.pool),
+    ]
+
 # Create base class for models
 Base = declarative_base()
 
+def dialect_insert(db, table):
+    """INSERT construct for the session's dialect, supporting ON CONFLICT upserts"""
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
 def get_db():
     """Dependency to get database session"""
     db = SessionLocal()
@@ -31,3 +176,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    """Dependency to get an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
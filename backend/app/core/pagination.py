@@ -0,0 +1,107 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional
+
+from sqlalchemy import and_, func, or_, tuple_
+
+NEXT = "next"
+PREV = "prev"
+
+class InvalidCursor(ValueError):
+    pass
+
+class KeysetPage:
+    """One page of rows plus opaque cursors for its neighbours"""
+
+    def __init__(self, items: List[Any], next_cursor: Optional[str] = None,
+                 prev_cursor: Optional[str] = None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+def encode_cursor(row, direction: str) -> str:
+    """Opaque cursor pointing just past `row` in `direction`"""
+    payload = {"t": row.created_at.isoformat(), "id": row.id, "d": direction}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    """(created_at, id, direction) from a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction = payload["d"]
+        if direction not in (NEXT, PREV):
+            raise ValueError(direction)
+        return datetime.fromisoformat(payload["t"]), int(payload["id"]), direction
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+def _sort_column(dialect: str, column, value):
+    """
+    SQLite keeps DATETIME as text in two formats (the server default has no
+    microseconds), so compare as julian days there. Development only: the
+    function call hides the index.
+    """
+    if dialect == "sqlite":
+        return func.julianday(column), func.julianday(value.strftime("%Y-%m-%d %H:%M:%S.%f"))
+    return column, value
+
+def keyset_filter(dialect: str, model, created_at: datetime, row_id: int, direction: str):
+    """Rows strictly after (created_at, id) in newest-first order, or before it for PREV"""
+    if dialect == "postgresql":
+        # Row comparison becomes a single range condition on the composite index
+        key, bound = tuple_(model.created_at, model.id), tuple_(created_at, row_id)
+        return key < bound if direction == NEXT else key > bound
+    column, value = _sort_column(dialect, model.created_at, created_at)
+    if direction == NEXT:
+        return or_(column < value, and_(column == value, model.id < row_id))
+    return or_(column > value, and_(column == value, model.id > row_id))
+
+def keyset_query(dialect: str, query, model, cursor: Optional[str], limit: int):
+    """
+    Apply cursor filter, ordering and limit (one extra row to detect another
+    page) to a select of `model`, newest first. Returns (query, direction).
+    """
+    direction = NEXT
+    if cursor:
+        created_at, row_id, direction = decode_cursor(cursor)
+        query = query.where(keyset_filter(dialect, model, created_at, row_id, direction))
+    if direction == NEXT:
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.created_at.asc(), model.id.asc())
+    return query.limit(limit + 1), direction
+
+def build_page(rows: List[Any], cursor: Optional[str], direction: str, limit: int) -> KeysetPage:
+    """Trim the look-ahead row, restore newest-first order and compute cursors"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == PREV:
+        rows.reverse()
+    if not rows:
+        return KeysetPage([])
+
+    if direction == NEXT:
+        has_next, has_prev = has_more, bool(cursor)
+    else:
+        has_next, has_prev = True, has_more
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1], NEXT) if has_next else None,
+        prev_cursor=encode_cursor(rows[0], PREV) if has_prev else None,
+    )
+
+def encode_offset_cursor(offset: int) -> str:
+    """Cursor for result sets without a stable sort key, e.g. relevance-ranked search"""
+    return base64.urlsafe_b64encode(json.dumps({"o": offset}).encode()).decode().rstrip("=")
+
+def decode_offset_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = int(json.loads(base64.urlsafe_b64decode(padded.encode()))["o"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+    if offset < 0:
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return offset
@@ -0,0 +1,23 @@
+import redis
+
+from app.core.config import settings
+
+_client = None
+
+def get_redis() -> redis.Redis:
+    """Shared Redis client (connections are pooled by redis-py)"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
+
+_async_client = None
+
+def get_async_redis():
+    """Shared asyncio Redis client for request handlers"""
+    import redis.asyncio as aioredis
+
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _async_client
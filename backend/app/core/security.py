@@ -18,18 +18,31 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str):
-    """Verify JWT token"""
+# Scope of tokens that may only open the task event stream
+STREAM_SCOPE = "tasks:stream"
+
+def create_stream_token(user_id: int) -> str:
+    """
+    Short-lived token for the task event stream. EventSource can't send
+    headers, so it goes in the query string (and from there into access
+    logs); it only opens the stream and expires within a minute.
+    """
+    return create_access_token(
+        {"sub": str(user_id), "scope": STREAM_SCOPE},
+        timedelta(seconds=settings.STREAM_TOKEN_EXPIRE_SECONDS)
+    )
+
+def verify_token(token: str, scope: Optional[str] = None) -> int:
+    """
+    Verify JWT token and return its user ID (JWT subjects are strings; ours
+    hold an integer ID). Scoped tokens are only accepted for their scope.
+    """
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials"
-            )
-        return user_id
-    except JWTError:
+        if payload.get("scope") != scope:
+            raise ValueError("token scope mismatch")
+        return int(payload["sub"])
+    except (JWTError, KeyError, TypeError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials"
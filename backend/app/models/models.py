@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Numeric, ForeignKey, Enum, JSON, UniqueConstraint
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Boolean, Numeric, Float, ForeignKey, Enum, JSON, UniqueConstraint, Table, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from app.core.database import Base
 from datetime import datetime
 import enum
@@ -53,12 +53,23 @@ class User(Base):
 
 class ScrapingTask(Base):
     __tablename__ = "scraping_tasks"
+    __table_args__ = (
+        # Keyset pagination: newest-first pages per user are index range scans
+        Index('ix_scraping_tasks_user_created_id', 'user_id', 'created_at', 'id'),
+        # Tasks held back by the dispatcher (pending, not yet sent to Celery)
+        Index(
+            'ix_scraping_tasks_waiting', 'user_id', 'created_at',
+            postgresql_where=text("celery_task_id IS NULL AND status = 'pending'"),
+            sqlite_where=text("celery_task_id IS NULL AND status = 'pending'")
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     platform = Column(Enum(ScrapingPlatform), nullable=False, index=True)
     task_type = Column(String(50), nullable=False)  # 'keyword_search', 'url_scrape', 'shop_monitor'
     input_data = Column(JSON, nullable=False)
+    priority = Column(String(20), nullable=False, default="interactive")  # 'interactive', 'scheduled', 'bulk'
     status = Column(Enum(ScrapingStatus), default=ScrapingStatus.pending, index=True)
     results_count = Column(Integer, default=0)
     error_message = Column(Text)
@@ -67,16 +78,50 @@ class ScrapingTask(Base):
     completed_at = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Tasks not started by then are skipped (scheduled runs expire at the next run)
     expires_at = Column(DateTime(timezone=True))
+    schedule_id = Column(Integer, ForeignKey("monitor_schedules.id", ondelete="SET NULL"), nullable=True, index=True)
+    # Crawl progress committed with each ingested batch ({"pages": [...], "last_external_id": ...}), for resuming
+    checkpoint = Column(JSON)
+    retry_count = Column(Integer, nullable=False, default=0)
     
     # Relationships
     user = relationship("User", back_populates="scraping_tasks")
     products = relationship("Product", back_populates="task", cascade="all, delete-orphan")
 
+class MonitorSchedule(Base):
+    """Recurring shop_monitor/keyword_search runs, dispatched by Celery Beat"""
+    __tablename__ = "monitor_schedules"
+    __table_args__ = (
+        UniqueConstraint('user_id', 'platform', 'task_type', 'target', name='uq_monitor_schedule_target'),
+        # Due-schedule scans by the dispatcher
+        Index('ix_monitor_schedules_active_next_run', 'is_active', 'next_run_at'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    platform = Column(Enum(ScrapingPlatform), nullable=False)
+    task_type = Column(String(50), nullable=False)  # 'shop_monitor' or 'keyword_search'
+    target = Column(String(255), nullable=False)  # shop_id or keyword
+    options = Column(JSON, nullable=False, default=dict)  # extra input_data, e.g. max_pages
+    interval_minutes = Column(Integer, nullable=False)  # requested interval
+    current_interval_minutes = Column(Integer, nullable=False)  # adapted to the listing's change rate
+    change_rate = Column(Float)  # smoothed share of scraped products with a new price_history row
+    is_active = Column(Boolean, default=True)
+    next_run_at = Column(DateTime(timezone=True), nullable=False)
+    last_run_at = Column(DateTime(timezone=True))
+    last_task_id = Column(Integer)
+    expires_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class Product(Base):
     __tablename__ = "products"
     __table_args__ = (
         UniqueConstraint('platform', 'external_id', 'user_id', name='uq_product_platform_id_user'),
+        # Keyset pagination, with and without the platform filter
+        Index('ix_products_user_created_id', 'user_id', 'created_at', 'id'),
+        Index('ix_products_user_platform_created_id', 'user_id', 'platform', 'created_at', 'id'),
     )
     
     id = Column(Integer, primary_key=True, index=True)
@@ -112,6 +157,10 @@ class Product(Base):
 
 class PriceHistory(Base):
     __tablename__ = "price_history"
+    __table_args__ = (
+        # Per-product time range scans; on PostgreSQL the table is also partitioned by month (schema.sql)
+        Index('ix_price_history_product_recorded', 'product_id', 'recorded_at'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
@@ -125,6 +174,70 @@ class PriceHistory(Base):
     # Relationships
     product = relationship("Product", back_populates="price_history")
 
+class PriceRollup(Base):
+    """Hourly/daily/weekly downsample of price_history, maintained at ingestion time"""
+    __tablename__ = "price_rollups"
+    __table_args__ = (
+        UniqueConstraint('product_id', 'resolution', 'bucket_start', name='uq_price_rollup_bucket'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    resolution = Column(String(10), nullable=False)  # 'hour', 'day', 'week'
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    min_price = Column(Numeric(15, 2))
+    max_price = Column(Numeric(15, 2))
+    price_sum = Column(Numeric(20, 2), default=0)
+    price_samples = Column(Integer, default=0)
+    last_price = Column(Numeric(15, 2))
+    last_sold_count = Column(Integer)
+    sold_count_delta = Column(BigInteger, default=0)
+    samples = Column(Integer, default=0)
+    last_recorded_at = Column(DateTime(timezone=True))
+
+class UserCounter(Base):
+    """Maintained row counts per user, e.g. 'products', 'products:platform:shopee', 'tasks:status:pending'"""
+    __tablename__ = "user_counters"
+    __table_args__ = (
+        UniqueConstraint('user_id', 'counter_key', name='uq_user_counter_key'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    counter_key = Column(String(100), nullable=False)
+    count = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ExportJob(Base):
+    """Background export of a dataset to a downloadable file"""
+    __tablename__ = "export_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    dataset = Column(String(50), nullable=False)  # 'products', 'price-history', 'task-results'
+    format = Column(String(20), nullable=False)  # 'csv', 'ndjson', 'parquet'
+    filters = Column(JSON, nullable=False, default=dict)
+    status = Column(Enum(ScrapingStatus), default=ScrapingStatus.pending, index=True)
+    row_count = Column(Integer, default=0)
+    file_path = Column(String(500))
+    file_size = Column(BigInteger)
+    error_message = Column(Text)
+    celery_task_id = Column(String(255))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True))
+    expires_at = Column(DateTime(timezone=True))
+
+collection_products = Table(
+    "collection_products",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("collection_id", Integer, ForeignKey("collections.id"), nullable=False, index=True),
+    Column("product_id", Integer, ForeignKey("products.id"), nullable=False),
+    Column("added_at", DateTime(timezone=True), server_default=func.now()),
+    UniqueConstraint("collection_id", "product_id", name="uq_collection_product"),
+)
+
 class Collection(Base):
     __tablename__ = "collections"
     
@@ -0,0 +1,166 @@
+import asyncio
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from app.core.database import get_async_db
+from app.core.security import verify_token
+from app.schemas.schemas import (
+    ProductResponse, TrendingProductResponse, TrendingGroupResponse, SuccessResponse
+)
+from app.services.async_scraping_service import AsyncProductService
+from app.services.price_analytics_service import PriceAnalyticsService
+from app.services.trend_service import AsyncTrendService, VELOCITY, PRICE_DROP
+
+router = APIRouter(prefix="/api/v1/analytics", tags=["Analytics"])
+
+def get_current_user_id(authorization: Optional[str] = None) -> int:
+    """Dependency to extract user ID from token"""
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+    token = authorization.split(" ")[1]
+    return verify_token(token)
+
+def check_scope(scope: str, value: Optional[str]):
+    if scope != "all" and not value:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"'value' is required for scope '{scope}'"
+        )
+
+async def product_leaderboard(db: AsyncSession, user_id: int, kind: str, scope: str,
+                              value: Optional[str], limit: int):
+    """Leaderboard entries joined to their products, in leaderboard order"""
+    entries = await AsyncTrendService.top(user_id, kind, scope, value, limit)
+    products = await AsyncProductService.get_products_by_ids(
+        db, [int(entry["member"]) for entry in entries], user_id
+    )
+    by_id = {product.id: product for product in products}
+    return [
+        TrendingProductResponse(
+            product=ProductResponse.model_validate(by_id[int(entry["member"])]),
+            score=entry["score"],
+            rank=entry["rank"],
+            rank_change=entry["rank_change"]
+        )
+        for entry in entries
+        if int(entry["member"]) in by_id
+    ]
+
+@router.get("/trending", response_model=SuccessResponse)
+async def trending_products(
+    scope: str = Query("all", pattern="^(all|category|shop)$"),
+    value: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    authorization: Optional[str] = None
+):
+    """Fastest-selling products (units sold per hour, time-decayed), overall or within a category/shop"""
+    user_id = get_current_user_id(authorization)
+    check_scope(scope, value)
+    
+    return SuccessResponse(
+        success=True,
+        message="Trending products retrieved successfully",
+        data=await product_leaderboard(db, user_id, VELOCITY, scope, value, limit)
+    )
+
+@router.get("/price-drops", response_model=SuccessResponse)
+async def price_drops(
+    scope: str = Query("all", pattern="^(all|category|shop)$"),
+    value: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    authorization: Optional[str] = None
+):
+    """Largest current price drops (fraction of the previous price)"""
+    user_id = get_current_user_id(authorization)
+    check_scope(scope, value)
+    
+    return SuccessResponse(
+        success=True,
+        message="Price drops retrieved successfully",
+        data=await product_leaderboard(db, user_id, PRICE_DROP, scope, value, limit)
+    )
+
+@router.get("/categories", response_model=SuccessResponse)
+async def trending_categories(
+    limit: int = Query(20, ge=1, le=100),
+    authorization: Optional[str] = None
+):
+    """Categories ranked by combined sales velocity"""
+    user_id = get_current_user_id(authorization)
+    entries = await AsyncTrendService.top(user_id, VELOCITY, "category_totals", limit=limit)
+    
+    return SuccessResponse(
+        success=True,
+        message="Trending categories retrieved successfully",
+        data=[
+            TrendingGroupResponse(name=e["member"], velocity_per_hour=e["score"], rank=e["rank"], rank_change=e["rank_change"])
+            for e in entries
+        ]
+    )
+
+@router.get("/shops", response_model=SuccessResponse)
+async def trending_shops(
+    limit: int = Query(20, ge=1, le=100),
+    authorization: Optional[str] = None
+):
+    """Shops ranked by combined sales velocity"""
+    user_id = get_current_user_id(authorization)
+    entries = await AsyncTrendService.top(user_id, VELOCITY, "shop_totals", limit=limit)
+    
+    return SuccessResponse(
+        success=True,
+        message="Trending shops retrieved successfully",
+        data=[
+            TrendingGroupResponse(name=e["member"], velocity_per_hour=e["score"], rank=e["rank"], rank_change=e["rank_change"])
+            for e in entries
+        ]
+    )
+
+@router.get("/price-history", response_model=SuccessResponse)
+async def price_history_analysis(
+    collection_id: Optional[int] = None,
+    category: Optional[str] = None,
+    shop: Optional[str] = None,
+    platform: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    resolution: str = Query("day", pattern="^(day|week)$"),
+    authorization: Optional[str] = None
+):
+    """
+    Median price over time, discount-depth distribution and price-cut vs
+    sales response for a selection of products (defaults to the last 90 days)
+    """
+    user_id = get_current_user_id(authorization)
+    if since and until and since >= until:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'since' must be before 'until'"
+        )
+    
+    # CPU-bound scan on a sync session; keep it off the event loop
+    data = await asyncio.to_thread(
+        PriceAnalyticsService.analyze_in_session,
+        user_id=user_id,
+        since=since,
+        until=until,
+        resolution=resolution,
+        collection_id=collection_id,
+        category=category,
+        shop_name=shop,
+        platform=platform
+    )
+    
+    return SuccessResponse(
+        success=True,
+        message="Price history analysis completed successfully",
+        data=data
+    )
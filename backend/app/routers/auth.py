@@ -24,7 +24,7 @@ async def login(credentials: LoginRequest):
     # Demo authentication - replace with real database lookup
     if credentials.email == DEMO_USER["email"] and credentials.password == "demo123":
         access_token = create_access_token(
-            data={"sub": DEMO_USER["id"]},
+            data={"sub": str(DEMO_USER["id"])},
             expires_delta=timedelta(minutes=30)
         )
         
@@ -0,0 +1,137 @@
+import os
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Path
+from fastapi.responses import StreamingResponse, FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from app.core.database import get_async_db
+from app.core.security import verify_token
+from app.schemas.schemas import ExportJobResponse, SuccessResponse
+from app.models.models import ScrapingStatus
+from app.services.export_service import ExportService, AsyncExportService, FORMATS
+
+router = APIRouter(prefix="/api/v1/exports", tags=["Exports"])
+
+DATASET_PATTERN = "^(products|price-history|task-results)$"
+FORMAT_PATTERN = "^(csv|ndjson|parquet)$"
+
+def get_current_user_id(authorization: Optional[str] = None) -> int:
+    """Dependency to extract user ID from token"""
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+    token = authorization.split(" ")[1]
+    return verify_token(token)
+
+def export_filters(dataset: str, platform: Optional[str], task_id: Optional[int],
+                   since: Optional[datetime], until: Optional[datetime]) -> dict:
+    if dataset == "task-results" and task_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'task_id' is required for task-results exports"
+        )
+    filters = {"platform": platform, "task_id": task_id,
+               "since": since.isoformat() if since else None,
+               "until": until.isoformat() if until else None}
+    return {key: value for key, value in filters.items() if value is not None}
+
+@router.get("/jobs/{job_id}", response_model=SuccessResponse)
+async def get_export_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    authorization: Optional[str] = None
+):
+    """Status of a background export job"""
+    user_id = get_current_user_id(authorization)
+
+    job = await AsyncExportService.get_job(db, job_id, user_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export job not found"
+        )
+
+    return SuccessResponse(
+        success=True,
+        message="Export job retrieved successfully",
+        data=ExportJobResponse.model_validate(job)
+    )
+
+@router.get("/jobs/{job_id}/download")
+async def download_export(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    authorization: Optional[str] = None
+):
+    """Download a completed export job's file"""
+    user_id = get_current_user_id(authorization)
+
+    job = await AsyncExportService.get_job(db, job_id, user_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export job not found"
+        )
+    if job.status != ScrapingStatus.completed:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Export job is {job.status.value}"
+        )
+    if not job.file_path or not os.path.exists(job.file_path):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Export file has expired"
+        )
+
+    return FileResponse(
+        job.file_path,
+        media_type=FORMATS[job.format][0],
+        filename=ExportService.file_name(job)
+    )
+
+@router.post("/{dataset}/jobs", response_model=SuccessResponse)
+async def create_export_job(
+    dataset: str = Path(..., pattern=DATASET_PATTERN),
+    format: str = Query("csv", pattern=FORMAT_PATTERN),
+    platform: Optional[str] = None,
+    task_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+    authorization: Optional[str] = None
+):
+    """Export a dataset to a downloadable file in the background"""
+    user_id = get_current_user_id(authorization)
+    filters = export_filters(dataset, platform, task_id, since, until)
+
+    job = await AsyncExportService.create_job(db, user_id, dataset, format, filters)
+    return SuccessResponse(
+        success=True,
+        message="Export job created successfully",
+        data=ExportJobResponse.model_validate(job)
+    )
+
+@router.get("/{dataset}")
+async def stream_export(
+    dataset: str = Path(..., pattern=DATASET_PATTERN),
+    format: str = Query("csv", pattern=FORMAT_PATTERN),
+    platform: Optional[str] = None,
+    task_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    authorization: Optional[str] = None
+):
+    """Stream a dataset (products, price-history, task-results) as CSV, NDJSON or Parquet"""
+    user_id = get_current_user_id(authorization)
+    filters = export_filters(dataset, platform, task_id, since, until)
+    media_type, extension = FORMATS[format]
+
+    return StreamingResponse(
+        ExportService.stream(user_id, dataset, format, filters),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{extension}"'}
+    )
@@ -0,0 +1,120 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from app.core.database import get_async_db
+from app.core.security import verify_token
+from app.schemas.schemas import (
+    MonitorScheduleCreate, MonitorScheduleUpdate, MonitorScheduleResponse, SuccessResponse
+)
+from app.services.monitor_service import AsyncMonitorService
+
+router = APIRouter(prefix="/api/v1/monitors", tags=["Monitors"])
+
+def get_current_user_id(authorization: Optional[str] = None) -> int:
+    """Dependency to extract user ID from token"""
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+    token = authorization.split(" ")[1]
+    return verify_token(token)
+
+async def get_schedule_or_404(db: AsyncSession, schedule_id: int, user_id: int):
+    schedule = await AsyncMonitorService.get(db, schedule_id, user_id)
+    if not schedule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Monitor not found"
+        )
+    return schedule
+
+@router.post("", response_model=SuccessResponse)
+async def create_monitor(
+    monitor_input: MonitorScheduleCreate,
+    db: AsyncSession = Depends(get_async_db),
+    authorization: Optional[str] = None
+):
+    """Monitor a shop or keyword on a recurring, load-adaptive interval"""
+    user_id = get_current_user_id(authorization)
+
+    try:
+        schedule = await AsyncMonitorService.create(
+            db, user_id, monitor_input.platform, monitor_input.task_type, monitor_input.target,
+            monitor_input.interval_minutes, monitor_input.options, monitor_input.expires_at
+        )
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A monitor for this target already exists"
+        )
+
+    return SuccessResponse(
+        success=True,
+        message="Monitor created successfully",
+        data=MonitorScheduleResponse.model_validate(schedule)
+    )
+
+@router.get("", response_model=SuccessResponse)
+async def list_monitors(
+    db: AsyncSession = Depends(get_async_db),
+    authorization: Optional[str] = None
+):
+    """List the user's monitors"""
+    user_id = get_current_user_id(authorization)
+    schedules = await AsyncMonitorService.list(db, user_id)
+
+    return SuccessResponse(
+        success=True,
+        message="Monitors retrieved successfully",
+        data=[MonitorScheduleResponse.model_validate(schedule) for schedule in schedules]
+    )
+
+@router.get("/{monitor_id}", response_model=SuccessResponse)
+async def get_monitor(
+    monitor_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    authorization: Optional[str] = None
+):
+    """Get a specific monitor"""
+    user_id = get_current_user_id(authorization)
+    schedule = await get_schedule_or_404(db, monitor_id, user_id)
+
+    return SuccessResponse(
+        success=True,
+        message="Monitor retrieved successfully",
+        data=MonitorScheduleResponse.model_validate(schedule)
+    )
+
+@router.patch("/{monitor_id}", response_model=SuccessResponse)
+async def update_monitor(
+    monitor_id: int,
+    changes: MonitorScheduleUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    authorization: Optional[str] = None
+):
+    """Change a monitor's interval, options, expiry or pause/resume it"""
+    user_id = get_current_user_id(authorization)
+    schedule = await get_schedule_or_404(db, monitor_id, user_id)
+    schedule = await AsyncMonitorService.update(db, schedule, changes.model_dump(exclude_unset=True))
+
+    return SuccessResponse(
+        success=True,
+        message="Monitor updated successfully",
+        data=MonitorScheduleResponse.model_validate(schedule)
+    )
+
+@router.delete("/{monitor_id}", response_model=SuccessResponse)
+async def delete_monitor(
+    monitor_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    authorization: Optional[str] = None
+):
+    """Stop and remove a monitor (its past tasks are kept)"""
+    user_id = get_current_user_id(authorization)
+    schedule = await get_schedule_or_404(db, monitor_id, user_id)
+    await AsyncMonitorService.delete(db, schedule)
+
+    return SuccessResponse(success=True, message="Monitor deleted successfully")
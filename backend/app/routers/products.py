@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.security import verify_token
+from app.core.pagination import InvalidCursor
 from app.schemas.schemas import (
-    ProductResponse, ProductDetailResponse, PriceHistoryResponse,
-    ProductWithHistoryResponse, SuccessResponse, PaginatedResponse
+    ProductResponse, ProductDetailResponse, PriceHistoryResponse, PriceRollupResponse,
+    ProductWithHistoryResponse, SuccessResponse, PaginatedResponse, SearchResponse
 )
-from app.services.scraping_service import ProductService
-from app.models.models import Product
+from app.services.async_scraping_service import AsyncProductService, AsyncCounterService
+from app.services.counter_service import PRODUCTS, counter_key
+from app.services.search_service import ProductSearchService
 
 router = APIRouter(prefix="/api/v1/products", tags=["Products"])
 
@@ -28,14 +30,31 @@ async def list_products(
     platform: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    count: str = Query("estimate", pattern="^(exact|estimate|none)$"),
+    db: AsyncSession = Depends(get_async_db),
     authorization: Optional[str] = None
 ):
-    """List all products for the current user"""
+    """
+    List all products for the current user.
+    count: 'estimate' (maintained counter, default), 'exact' (COUNT query) or 'none'.
+    """
     user_id = get_current_user_id(authorization)
     
-    products = ProductService.get_user_products(db, user_id, platform, skip, limit)
-    total = db.query(Product).filter(Product.user_id == user_id).count()
+    try:
+        products = await AsyncProductService.get_user_products(db, user_id, platform, skip, limit, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if count == "exact":
+        total = await AsyncProductService.get_products_count(db, user_id, platform)
+    elif count == "estimate":
+        key = counter_key(PRODUCTS, "platform", platform) if platform else counter_key(PRODUCTS)
+        total = await AsyncCounterService.get(db, user_id, key)
+    else:
+        total = None
     
     return SuccessResponse(
         success=True,
@@ -44,20 +63,73 @@ async def list_products(
             total=total,
             page=skip // limit + 1,
             page_size=limit,
-            items=[ProductResponse.model_validate(p) for p in products]
+            items=[ProductResponse.model_validate(p) for p in products.items],
+            next_cursor=products.next_cursor,
+            prev_cursor=products.prev_cursor
+        )
+    )
+
+@router.get("/search", response_model=SuccessResponse)
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    platform: Optional[str] = None,
+    category: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    authorization: Optional[str] = None
+):
+    """Relevance-ranked product search with per-platform and per-category facets"""
+    user_id = get_current_user_id(authorization)
+    
+    try:
+        results = await ProductSearchService.search(db, user_id, q, platform, category, skip, limit, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return SuccessResponse(
+        success=True,
+        message="Products found",
+        data=SearchResponse(
+            total=results.total,
+            page=skip // limit + 1,
+            page_size=limit,
+            items=[ProductResponse.model_validate(p) for p in results.items],
+            next_cursor=results.next_cursor,
+            prev_cursor=results.prev_cursor,
+            facets=results.facets
         )
     )
 
+@router.get("/search/{query}", response_model=SuccessResponse, deprecated=True)
+async def search_products_by_path(
+    query: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    authorization: Optional[str] = None
+):
+    """Search products by name or category (use /search?q= instead)"""
+    return await search_products(
+        q=query, platform=None, category=None, skip=skip, limit=limit,
+        cursor=cursor, db=db, authorization=authorization
+    )
+
 @router.get("/{product_id}", response_model=SuccessResponse)
 async def get_product(
     product_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     authorization: Optional[str] = None
 ):
     """Get a specific product with details"""
     user_id = get_current_user_id(authorization)
     
-    product = ProductService.get_product_by_id(db, product_id, user_id)
+    product = await AsyncProductService.get_product_by_id(db, product_id, user_id)
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -74,47 +146,35 @@ async def get_product(
 async def get_product_price_history(
     product_id: int,
     limit: int = Query(50, ge=1, le=500),
-    db: Session = Depends(get_db),
+    resolution: str = Query("raw", pattern="^(raw|hour|day|week)$"),
+    db: AsyncSession = Depends(get_async_db),
     authorization: Optional[str] = None
 ):
-    """Get price history for a product"""
+    """
+    Get price history for a product: raw snapshots, or `limit` hourly/daily/weekly
+    buckets with min/max/avg/last price and units sold in the bucket.
+    """
     user_id = get_current_user_id(authorization)
     
-    product = ProductService.get_product_by_id(db, product_id, user_id)
+    product = await AsyncProductService.get_product_by_id(db, product_id, user_id)
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found"
         )
     
-    history = ProductService.get_price_history(db, product_id, user_id, limit)
+    if resolution != "raw":
+        rollups = await AsyncProductService.get_price_rollups(db, product_id, user_id, resolution, limit)
+        return SuccessResponse(
+            success=True,
+            message="Price history retrieved successfully",
+            data=[PriceRollupResponse.from_rollup(r) for r in rollups]
+        )
+    
+    history = await AsyncProductService.get_price_history(db, product_id, user_id, limit)
     
     return SuccessResponse(
         success=True,
         message="Price history retrieved successfully",
         data=[PriceHistoryResponse.model_validate(h) for h in history]
     )
-
-@router.get("/search/{query}", response_model=SuccessResponse)
-async def search_products(
-    query: str,
-    skip: int = Query(0, ge=0),
-    limit: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db),
-    authorization: Optional[str] = None
-):
-    """Search products by name or category"""
-    user_id = get_current_user_id(authorization)
-    
-    products = ProductService.search_products(db, user_id, query, skip, limit)
-    
-    return SuccessResponse(
-        success=True,
-        message="Products found",
-        data=PaginatedResponse(
-            total=len(products),
-            page=skip // limit + 1,
-            page_size=limit,
-            items=[ProductResponse.model_validate(p) for p in products]
-        )
-    )
@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
-from app.core.database import get_db
-from app.core.security import verify_token
+from app.core.database import get_async_db
+from app.core.security import verify_token, create_stream_token, STREAM_SCOPE
+from app.core.pagination import InvalidCursor
 from app.schemas.schemas import (
-    ScrapingTaskInput, ScrapingTaskResponse, ScrapingTaskDetailResponse,
+    ScrapingTaskInput, ScrapingTaskBatchInput, ScrapingTaskBatchResponse,
+    ScrapingTaskResponse, ScrapingTaskDetailResponse,
     SuccessResponse, PaginatedResponse
 )
-from app.services.scraping_service import ScrapingTaskService
+from app.services.async_scraping_service import AsyncScrapingTaskService, AsyncCounterService
+from app.services.counter_service import TASKS, counter_key
+from app.services.task_events import AsyncTaskEventService
 
 router = APIRouter(prefix="/api/v1/tasks", tags=["Scraping Tasks"])
 
@@ -25,14 +32,14 @@ def get_current_user_id(authorization: Optional[str] = None) -> int:
 @router.post("", response_model=SuccessResponse)
 async def create_scraping_task(
     task_input: ScrapingTaskInput,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     authorization: Optional[str] = None
 ):
     """Create a new scraping task"""
     user_id = get_current_user_id(authorization)
     
     try:
-        task = ScrapingTaskService.create_task(db, user_id, task_input)
+        task = await AsyncScrapingTaskService.create_task(db, user_id, task_input)
         return SuccessResponse(
             success=True,
             message="Scraping task created successfully",
@@ -44,16 +51,85 @@ async def create_scraping_task(
             detail=f"Error creating task: {str(e)}"
         )
 
+@router.post("/batch", response_model=SuccessResponse)
+async def create_scraping_tasks_batch(
+    batch_input: ScrapingTaskBatchInput,
+    db: AsyncSession = Depends(get_async_db),
+    authorization: Optional[str] = None
+):
+    """Create many scraping tasks in one request (bulk priority unless set per task)"""
+    user_id = get_current_user_id(authorization)
+    
+    try:
+        tasks = await AsyncScrapingTaskService.create_tasks(db, user_id, batch_input.tasks)
+        dispatched = sum(1 for task in tasks if task.celery_task_id)
+        return SuccessResponse(
+            success=True,
+            message=f"{len(tasks)} scraping tasks created successfully",
+            data=ScrapingTaskBatchResponse(
+                task_ids=[task.id for task in tasks],
+                dispatched=dispatched,
+                held=len(tasks) - dispatched
+            )
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error creating tasks: {str(e)}"
+        )
+
+@router.post("/stream-token", response_model=SuccessResponse)
+async def create_task_stream_token(authorization: Optional[str] = None):
+    """Issue a short-lived token for opening the task event stream"""
+    user_id = get_current_user_id(authorization)
+    return SuccessResponse(
+        success=True,
+        message="Stream token created",
+        data={"token": create_stream_token(user_id)}
+    )
+
+@router.get("/stream")
+async def stream_task_events(
+    request: Request,
+    token: str = Query(...)
+):
+    """
+    Server-sent events for the user's tasks: 'created' (full task),
+    'status' (status, counts and timestamps) and 'progress' (pages_crawled,
+    products_ingested). Replaces polling the task list.
+
+    Authenticated by a token from POST /stream-token, never the access token:
+    EventSource puts it in the URL, where it ends up in logs.
+    """
+    user_id = verify_token(token, scope=STREAM_SCOPE)
+    
+    async def events():
+        # Reconnect delay for EventSource clients, in milliseconds
+        yield "retry: 3000\n\n"
+        async for event in AsyncTaskEventService.subscribe(user_id):
+            if await request.is_disconnected():
+                break
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {event.pop('event')}\ndata: {json.dumps(event)}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/{task_id}", response_model=SuccessResponse)
 async def get_scraping_task(
     task_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     authorization: Optional[str] = None
 ):
     """Get a specific scraping task"""
     user_id = get_current_user_id(authorization)
     
-    task = ScrapingTaskService.get_task_by_id(db, task_id, user_id)
+    task = await AsyncScrapingTaskService.get_task_by_id(db, task_id, user_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -70,14 +146,30 @@ async def get_scraping_task(
 async def list_scraping_tasks(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    count: str = Query("estimate", pattern="^(exact|estimate|none)$"),
+    db: AsyncSession = Depends(get_async_db),
     authorization: Optional[str] = None
 ):
-    """List all scraping tasks for the current user"""
+    """
+    List all scraping tasks for the current user.
+    count: 'estimate' (maintained counter, default), 'exact' (COUNT query) or 'none'.
+    """
     user_id = get_current_user_id(authorization)
     
-    tasks = ScrapingTaskService.get_user_tasks(db, user_id, skip, limit)
-    total = ScrapingTaskService.get_tasks_count(db, user_id)
+    try:
+        tasks = await AsyncScrapingTaskService.get_user_tasks(db, user_id, skip, limit, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if count == "exact":
+        total = await AsyncScrapingTaskService.get_tasks_count(db, user_id)
+    elif count == "estimate":
+        total = await AsyncCounterService.get(db, user_id, counter_key(TASKS))
+    else:
+        total = None
     
     return SuccessResponse(
         success=True,
@@ -86,6 +178,8 @@ async def list_scraping_tasks(
             total=total,
             page=skip // limit + 1,
             page_size=limit,
-            items=[ScrapingTaskResponse.model_validate(task) for task in tasks]
+            items=[ScrapingTaskResponse.model_validate(task) for task in tasks.items],
+            next_cursor=tasks.next_cursor,
+            prev_cursor=tasks.prev_cursor
         )
     )
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+from app.core.config import settings
 from app.models.models import ScrapingPlatform, ScrapingStatus, ProductStatus
 
 # User Schemas
@@ -44,11 +45,23 @@ class ScrapingTaskInput(BaseModel):
     task_type: str  # 'keyword_search', 'url_scrape', 'shop_monitor'
     input_data: Dict[str, Any]
     expires_at: Optional[datetime] = None
+    # 'scheduled' is reserved for monitor runs
+    priority: str = Field("interactive", pattern="^(interactive|bulk)$")
+
+class ScrapingTaskBatchInput(BaseModel):
+    # Batched tasks default to the 'bulk' priority
+    tasks: List[ScrapingTaskInput] = Field(..., min_length=1, max_length=settings.TASK_BATCH_MAX_SIZE)
+
+class ScrapingTaskBatchResponse(BaseModel):
+    task_ids: List[int]
+    dispatched: int  # sent to Celery now
+    held: int  # waiting for a free slot in the user's quota
 
 class ScrapingTaskResponse(BaseModel):
     id: int
     platform: ScrapingPlatform
     task_type: str
+    priority: str = "interactive"
     status: ScrapingStatus
     results_count: int
     celery_task_id: Optional[str] = None
@@ -63,6 +76,44 @@ class ScrapingTaskDetailResponse(ScrapingTaskResponse):
     input_data: Dict[str, Any]
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    schedule_id: Optional[int] = None
+    retry_count: int = 0
+
+# Monitor Schedule Schemas
+class MonitorScheduleCreate(BaseModel):
+    platform: ScrapingPlatform
+    task_type: str = Field("shop_monitor", pattern="^(shop_monitor|keyword_search)$")
+    target: str = Field(..., min_length=1, max_length=255)  # shop_id or keyword
+    interval_minutes: int = Field(60, ge=1)
+    options: Dict[str, Any] = {}
+    expires_at: Optional[datetime] = None
+
+class MonitorScheduleUpdate(BaseModel):
+    interval_minutes: Optional[int] = Field(None, ge=1)
+    options: Optional[Dict[str, Any]] = None
+    is_active: Optional[bool] = None
+    expires_at: Optional[datetime] = None
+
+class MonitorScheduleResponse(BaseModel):
+    id: int
+    platform: ScrapingPlatform
+    task_type: str
+    target: str
+    options: Dict[str, Any] = {}
+    interval_minutes: int
+    # Interval in effect after adapting to how fast the listing changes
+    current_interval_minutes: int
+    change_rate: Optional[float] = None
+    is_active: bool
+    next_run_at: datetime
+    last_run_at: Optional[datetime] = None
+    last_task_id: Optional[int] = None
+    expires_at: Optional[datetime] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
 
 # Product Schemas
 class ProductBase(BaseModel):
@@ -116,6 +167,27 @@ class PriceHistoryResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class PriceRollupResponse(BaseModel):
+    resolution: str
+    bucket_start: datetime
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    avg_price: Optional[float] = None
+    last_price: Optional[float] = None
+    last_sold_count: Optional[int] = None
+    sold_count_delta: int = 0
+    samples: int = 0
+    
+    class Config:
+        from_attributes = True
+
+    @classmethod
+    def from_rollup(cls, rollup) -> "PriceRollupResponse":
+        response = cls.model_validate(rollup)
+        if rollup.price_samples:
+            response.avg_price = float(rollup.price_sum) / rollup.price_samples
+        return response
+
 class ProductWithHistoryResponse(ProductResponse):
     price_history: List[PriceHistoryResponse]
 
@@ -163,12 +235,51 @@ class AlertResponse(AlertBase):
     class Config:
         from_attributes = True
 
+# Analytics Schemas
+class TrendingProductResponse(BaseModel):
+    product: ProductResponse
+    # Units sold per hour (trending) or fractional price drop (price drops)
+    score: float
+    rank: int
+    rank_change: Optional[int] = None
+
+class TrendingGroupResponse(BaseModel):
+    name: str
+    velocity_per_hour: float
+    rank: int
+    rank_change: Optional[int] = None
+
+# Export Schemas
+class ExportJobResponse(BaseModel):
+    id: int
+    dataset: str
+    format: str
+    filters: Dict[str, Any] = {}
+    status: ScrapingStatus
+    row_count: int = 0
+    file_size: Optional[int] = None
+    error_message: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
 # Pagination
 class PaginatedResponse(BaseModel):
-    total: int
+    # None when the client asked for count=none
+    total: Optional[int] = None
     page: int
     page_size: int
     items: List[Any]
+    # Opaque keyset cursors; pass back as ?cursor= to fetch the neighbouring page
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+class SearchResponse(PaginatedResponse):
+    # facet name -> value -> match count, e.g. {"platform": {"shopee": 12}}
+    facets: Dict[str, Dict[str, int]] = {}
 
 # Generic Response
 class SuccessResponse(BaseModel):
@@ -0,0 +1,296 @@
+import logging
+import uuid
+import redis
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, func, desc, delete, or_
+from app.core.config import settings
+from app.core.redis_client import get_async_redis
+from app.models.models import ScrapingTask, Product, PriceHistory, PriceRollup, UserCounter
+from app.schemas.schemas import ScrapingTaskInput, ScrapingTaskResponse
+from app.core.pagination import KeysetPage, keyset_query, build_page
+from app.models.models import ScrapingStatus
+from typing import Optional, List
+from app.services.counter_service import CounterService, PRODUCTS, TASKS, cache_key, counter_key, rebuilt_key
+from app.services.task_events import AsyncTaskEventService
+from app.services.dispatch_service import AsyncTaskDispatcher, PRIORITIES
+
+logger = logging.getLogger(__name__)
+
+async def _fetch_page(db: AsyncSession, query, model, skip: int, limit: int,
+                      cursor: Optional[str]) -> KeysetPage:
+    """
+    Keyset page on (created_at, id). `skip` is only honoured without a cursor,
+    for clients still paging by offset; their pages carry a next cursor too.
+    """
+    query, direction = keyset_query(db.bind.dialect.name, query, model, cursor, limit)
+    if skip and not cursor:
+        query = query.offset(skip)
+    result = await db.execute(query)
+    return build_page(list(result.scalars()), cursor, direction, limit)
+
+class AsyncScrapingTaskService:
+    """Async counterpart of ScrapingTaskService for request handlers"""
+
+    @staticmethod
+    async def create_task(db: AsyncSession, user_id: int, task_input: ScrapingTaskInput) -> ScrapingTask:
+        """Create a new scraping task; it is held back if the user is at their concurrency quota"""
+        task = ScrapingTask(
+            user_id=user_id,
+            platform=task_input.platform,
+            task_type=task_input.task_type,
+            input_data=task_input.input_data,
+            expires_at=task_input.expires_at,
+            priority=task_input.priority,
+            status=ScrapingStatus.pending
+        )
+        db.add(task)
+        await db.flush()
+        await db.execute(CounterService.lock_statement(user_id))
+        await db.execute(CounterService.increment_statement(
+            db, user_id, CounterService.task_created_deltas(task_input.platform, ScrapingStatus.pending)
+        ))
+
+        claimed = await AsyncTaskDispatcher.claim(db, task)
+        await db.commit()
+        await db.refresh(task)
+
+        # Send task to its Celery queue, unless it is held back by the user's quota
+        if claimed:
+            await AsyncTaskDispatcher.send_or_release(db, task)
+            await db.refresh(task)
+        await AsyncCounterService.invalidate(user_id)
+        await AsyncTaskEventService.publish(
+            user_id, "created", ScrapingTaskResponse.model_validate(task).model_dump(mode="json")
+        )
+        return task
+
+    @staticmethod
+    async def create_tasks(db: AsyncSession, user_id: int, task_inputs: List[ScrapingTaskInput]) -> List[ScrapingTask]:
+        """
+        Create many tasks with one multi-row INSERT ... RETURNING, then send
+        those within the user's free quota as a single Celery group. Batched
+        tasks go to the bulk queue unless they ask otherwise; the rest are
+        held for the fair-share pass.
+        """
+        priorities = [
+            task_input.priority if "priority" in task_input.model_fields_set else "bulk"
+            for task_input in task_inputs
+        ]
+        # The free slots go to the most urgent tasks, in submission order
+        urgency = sorted(range(len(task_inputs)), key=lambda i: PRIORITIES.index(priorities[i]))
+        claimed = set(urgency[:await AsyncTaskDispatcher.free_slots(db, user_id)])
+
+        rows = [
+            {
+                "user_id": user_id,
+                "platform": task_input.platform,
+                "task_type": task_input.task_type,
+                "input_data": task_input.input_data,
+                "expires_at": task_input.expires_at,
+                "priority": priorities[i],
+                "status": ScrapingStatus.pending,
+                "celery_task_id": str(uuid.uuid4()) if i in claimed else None,
+            }
+            for i, task_input in enumerate(task_inputs)
+        ]
+        result = await db.scalars(insert(ScrapingTask).returning(ScrapingTask, sort_by_parameter_order=True), rows)
+        tasks = list(result)
+
+        deltas = {}
+        for task_input in task_inputs:
+            for key, delta in CounterService.task_created_deltas(task_input.platform, ScrapingStatus.pending).items():
+                deltas[key] = deltas.get(key, 0) + delta
+        await db.execute(CounterService.lock_statement(user_id))
+        await db.execute(CounterService.increment_statement(db, user_id, deltas))
+        await db.commit()
+
+        await AsyncTaskDispatcher.send_many_or_release(db, [task for task in tasks if task.celery_task_id])
+        await AsyncCounterService.invalidate(user_id)
+        await AsyncTaskEventService.publish_many(
+            user_id, "created", [ScrapingTaskResponse.model_validate(task).model_dump(mode="json") for task in tasks]
+        )
+        return tasks
+
+    @staticmethod
+    async def get_task_by_id(db: AsyncSession, task_id: int, user_id: int) -> Optional[ScrapingTask]:
+        """Get a scraping task by ID (user-scoped)"""
+        result = await db.execute(
+            select(ScrapingTask).where(
+                ScrapingTask.id == task_id,
+                ScrapingTask.user_id == user_id
+            )
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_user_tasks(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 10,
+                             cursor: Optional[str] = None) -> KeysetPage:
+        """Get a page of tasks for a user, newest first"""
+        query = select(ScrapingTask).where(ScrapingTask.user_id == user_id)
+        return await _fetch_page(db, query, ScrapingTask, skip, limit, cursor)
+
+    @staticmethod
+    async def get_tasks_count(db: AsyncSession, user_id: int) -> int:
+        """Get total tasks count for a user"""
+        result = await db.execute(
+            select(func.count()).select_from(ScrapingTask).where(ScrapingTask.user_id == user_id)
+        )
+        return result.scalar_one()
+
+class AsyncProductService:
+    """Async counterpart of ProductService for request handlers"""
+
+    @staticmethod
+    async def get_product_by_id(db: AsyncSession, product_id: int, user_id: int) -> Optional[Product]:
+        """Get product by ID (user-scoped)"""
+        result = await db.execute(
+            select(Product).where(
+                Product.id == product_id,
+                Product.user_id == user_id
+            )
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_user_products(db: AsyncSession, user_id: int, platform: Optional[str] = None,
+                                skip: int = 0, limit: int = 20, cursor: Optional[str] = None) -> KeysetPage:
+        """Get a page of the user's products with optional platform filter"""
+        query = select(Product).where(Product.user_id == user_id)
+        if platform:
+            query = query.where(Product.platform == platform)
+        return await _fetch_page(db, query, Product, skip, limit, cursor)
+
+    @staticmethod
+    async def get_products_count(db: AsyncSession, user_id: int, platform: Optional[str] = None) -> int:
+        """Get exact products count for a user, optionally for one platform"""
+        query = select(func.count()).select_from(Product).where(Product.user_id == user_id)
+        if platform:
+            query = query.where(Product.platform == platform)
+        result = await db.execute(query)
+        return result.scalar_one()
+
+    @staticmethod
+    async def get_products_by_ids(db: AsyncSession, product_ids: List[int], user_id: int) -> List[Product]:
+        """Get the user's products for a list of IDs (unordered)"""
+        if not product_ids:
+            return []
+        result = await db.execute(
+            select(Product).where(Product.id.in_(product_ids), Product.user_id == user_id)
+        )
+        return list(result.scalars())
+
+    @staticmethod
+    async def get_products_by_task(db: AsyncSession, task_id: int, user_id: int) -> List[Product]:
+        """Get all products from a scraping task"""
+        result = await db.execute(
+            select(Product).where(
+                Product.task_id == task_id,
+                Product.user_id == user_id
+            )
+        )
+        return list(result.scalars())
+
+    @staticmethod
+    async def get_price_history(db: AsyncSession, product_id: int, user_id: int,
+                                limit: int = 50) -> List[PriceHistory]:
+        """Get price history for a product"""
+        result = await db.execute(
+            select(PriceHistory).where(
+                PriceHistory.product_id == product_id,
+                PriceHistory.user_id == user_id
+            ).order_by(desc(PriceHistory.recorded_at)).limit(limit)
+        )
+        return list(result.scalars())
+
+    @staticmethod
+    async def get_price_rollups(db: AsyncSession, product_id: int, user_id: int, resolution: str,
+                                limit: int = 50) -> List[PriceRollup]:
+        """Get the latest rollup buckets for a product at one resolution"""
+        result = await db.execute(
+            select(PriceRollup).where(
+                PriceRollup.product_id == product_id,
+                PriceRollup.user_id == user_id,
+                PriceRollup.resolution == resolution
+            ).order_by(desc(PriceRollup.bucket_start)).limit(limit)
+        )
+        return list(result.scalars())
+
+class AsyncCounterService:
+    """Read side of the maintained counters, cached per user in a Redis hash"""
+
+    @staticmethod
+    async def rebuild(db: AsyncSession, user_id: int, entity: str) -> dict:
+        """
+        Recount an entity from its table and overwrite its counters, holding
+        the user's row lock so no writer adds a delta mid-recount
+        """
+        await db.execute(CounterService.lock_statement(user_id))
+        model, dimensions = {
+            PRODUCTS: (Product, {"platform": Product.platform}),
+            TASKS: (ScrapingTask, {"platform": ScrapingTask.platform, "status": ScrapingTask.status}),
+        }[entity]
+
+        counts = {counter_key(entity): 0}
+        for dimension, column in dimensions.items():
+            result = await db.execute(
+                select(column, func.count()).where(model.user_id == user_id).group_by(column)
+            )
+            for member, count in result:
+                counts[counter_key(entity, dimension, member)] = count
+        counts[counter_key(entity)] = sum(
+            count for key, count in counts.items() if key.startswith(f"{entity}:platform:")
+        )
+        counts[rebuilt_key(entity)] = 1
+
+        # Replace every counter of the entity, including ones whose rows are all gone
+        await db.execute(delete(UserCounter).where(
+            UserCounter.user_id == user_id,
+            or_(UserCounter.counter_key == entity, UserCounter.counter_key.like(f"{entity}:%"))
+        ))
+        await db.execute(CounterService.set_statement(db, user_id, counts))
+        await db.commit()
+        return counts
+
+    @staticmethod
+    async def _load(db: AsyncSession, user_id: int) -> dict:
+        result = await db.execute(
+            select(UserCounter.counter_key, UserCounter.count).where(UserCounter.user_id == user_id)
+        )
+        counts = dict(result.all())
+        # Counters only become authoritative once an entity has been recounted;
+        # writers never create the marker, so rows from before counters existed get counted
+        for entity in (PRODUCTS, TASKS):
+            if rebuilt_key(entity) not in counts:
+                counts.update(await AsyncCounterService.rebuild(db, user_id, entity))
+        return counts
+
+    @staticmethod
+    async def get(db: AsyncSession, user_id: int, key: str) -> int:
+        """Maintained count for a counter key, from cache when possible"""
+        client = get_async_redis()
+        try:
+            cached = await client.hget(cache_key(user_id), key)
+            if cached is not None:
+                return int(cached)
+        except redis.RedisError as e:
+            logger.warning(f"Counter cache unavailable: {str(e)}")
+            client = None
+
+        counts = await AsyncCounterService._load(db, user_id)
+        if client is not None:
+            try:
+                async with client.pipeline(transaction=True) as pipe:
+                    pipe.hset(cache_key(user_id), mapping=counts)
+                    pipe.expire(cache_key(user_id), settings.COUNT_CACHE_TTL)
+                    await pipe.execute()
+            except redis.RedisError as e:
+                logger.warning(f"Failed to cache counters: {str(e)}")
+        return counts.get(key, 0)
+
+    @staticmethod
+    async def invalidate(user_id: int):
+        """Drop the user's cached counters"""
+        try:
+            await get_async_redis().delete(cache_key(user_id))
+        except redis.RedisError as e:
+            logger.warning(f"Failed to invalidate counters for user {user_id}: {str(e)}")
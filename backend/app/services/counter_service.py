@@ -0,0 +1,117 @@
+import logging
+from typing import Dict, Optional
+
+import redis
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.database import dialect_insert
+from app.core.redis_client import get_redis
+from app.models.models import User, UserCounter
+
+logger = logging.getLogger(__name__)
+
+PRODUCTS = "products"
+TASKS = "tasks"
+
+def _value(member) -> str:
+    return getattr(member, "value", member)
+
+def counter_key(entity: str, dimension: Optional[str] = None, member=None) -> str:
+    """'products', 'products:platform:shopee', 'tasks:status:pending', ..."""
+    if dimension is None:
+        return entity
+    return f"{entity}:{dimension}:{_value(member)}"
+
+def rebuilt_key(entity: str) -> str:
+    """Marker written by a full recount of `entity`"""
+    return f"{entity}:rebuilt"
+
+def cache_key(user_id: int) -> str:
+    return f"counts:{user_id}"
+
+class CounterService:
+    """
+    Per-user counters kept in user_counters so list endpoints don't COUNT(*)
+    on every request. Writers add deltas in the same transaction as the rows
+    they count, then drop the user's cached hash once committed.
+
+    Writers and recounts serialize on the user's row (lock_statement), so a
+    recount never overwrites a delta it didn't see, and a delta is never
+    applied on top of a recount that already included its rows.
+    """
+
+    @staticmethod
+    def lock_statement(user_id: int):
+        """
+        Lock the user's row until commit. FOR NO KEY UPDATE leaves the
+        key-share locks taken by inserts referencing the user alone.
+        """
+        return select(User.id).where(User.id == user_id).with_for_update(key_share=True)
+
+    @staticmethod
+    def product_deltas(platform, inserted: int) -> Dict[str, int]:
+        return {
+            counter_key(PRODUCTS): inserted,
+            counter_key(PRODUCTS, "platform", platform): inserted,
+        }
+
+    @staticmethod
+    def task_created_deltas(platform, status) -> Dict[str, int]:
+        return {
+            counter_key(TASKS): 1,
+            counter_key(TASKS, "platform", platform): 1,
+            counter_key(TASKS, "status", status): 1,
+        }
+
+    @staticmethod
+    def task_status_deltas(old_status, new_status) -> Dict[str, int]:
+        if _value(old_status) == _value(new_status):
+            return {}
+        deltas = {counter_key(TASKS, "status", new_status): 1}
+        if old_status is not None:
+            deltas[counter_key(TASKS, "status", old_status)] = -1
+        return deltas
+
+    @staticmethod
+    def _upsert(db, user_id: int, counts: Dict[str, int], add: bool):
+        stmt = dialect_insert(db, UserCounter).values([
+            {"user_id": user_id, "counter_key": key, "count": count}
+            for key, count in counts.items()
+        ])
+        return stmt.on_conflict_do_update(
+            index_elements=["user_id", "counter_key"],
+            set_={
+                "count": UserCounter.count + stmt.excluded.count if add else stmt.excluded.count,
+                "updated_at": func.now()
+            }
+        )
+
+    @staticmethod
+    def increment_statement(db, user_id: int, deltas: Dict[str, int]):
+        """
+        Upsert adding each delta to its counter; works for sync and async
+        sessions. Execute lock_statement first in the same transaction.
+        """
+        return CounterService._upsert(db, user_id, deltas, add=True)
+
+    @staticmethod
+    def set_statement(db, user_id: int, counts: Dict[str, int]):
+        """Upsert overwriting counters with absolute values"""
+        return CounterService._upsert(db, user_id, counts, add=False)
+
+    @staticmethod
+    def increment(db: Session, user_id: int, deltas: Dict[str, int]):
+        """Add deltas inside the caller's transaction (call invalidate after commit)"""
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if deltas:
+            db.execute(CounterService.lock_statement(user_id))
+            db.execute(CounterService.increment_statement(db, user_id, deltas))
+
+    @staticmethod
+    def invalidate(user_id: int):
+        """Drop the user's cached counters"""
+        try:
+            get_redis().delete(cache_key(user_id))
+        except redis.RedisError as e:
+            logger.warning(f"Failed to invalidate counters for user {user_id}: {str(e)}")
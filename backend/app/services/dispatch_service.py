@@ -0,0 +1,271 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from celery import group
+from sqlalchemy import select, update, func, case, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import (
+    ScrapingTask, ScrapingStatus, ScrapingPlatform, User, UserRole, UserSubscription, SubscriptionPlan
+)
+from celery_app import create_scraping_task_celery
+
+logger = logging.getLogger(__name__)
+
+# Dispatch order within a user's backlog, most urgent first
+PRIORITIES = ("interactive", "scheduled", "bulk")
+
+def queue_name(platform, priority: str) -> str:
+    """scrape.{platform}.{priority}, e.g. scrape.shopee.interactive"""
+    return f"scrape.{getattr(platform, 'value', platform)}.{priority}"
+
+def all_queues() -> List[str]:
+    return [queue_name(platform, priority) for platform in ScrapingPlatform for priority in PRIORITIES]
+
+def _priority_rank():
+    return case(
+        *[(ScrapingTask.priority == priority, rank) for rank, priority in enumerate(PRIORITIES)],
+        else_=len(PRIORITIES)
+    )
+
+def _waiting():
+    """Tasks accepted but not yet handed to Celery"""
+    return and_(ScrapingTask.status == ScrapingStatus.pending, ScrapingTask.celery_task_id.is_(None))
+
+def quota_query(user_ids: Iterable[int]):
+    """(user_id, role, plan max_scraping_jobs) rows; a user may have several subscriptions"""
+    return (
+        select(User.id, User.role, SubscriptionPlan.max_scraping_jobs)
+        .outerjoin(UserSubscription, and_(
+            UserSubscription.user_id == User.id, UserSubscription.is_active.is_(True)
+        ))
+        .outerjoin(SubscriptionPlan, SubscriptionPlan.id == UserSubscription.plan_id)
+        .where(User.id.in_(list(user_ids)))
+    )
+
+def lock_users_query(user_ids: Iterable[int]):
+    """
+    Row locks that serialize quota checks per user: whoever holds a user's
+    row counts their in-flight tasks and claims slots before anyone else
+    can. FOR NO KEY UPDATE, so it doesn't conflict with the key-share lock
+    a task INSERT already holds on its user through the foreign key.
+    """
+    return (
+        select(User.id)
+        .where(User.id.in_(list(user_ids)))
+        .order_by(User.id)
+        .with_for_update(key_share=True)
+    )
+
+def in_flight_query(user_ids: Iterable[int]):
+    """
+    Dispatched, unfinished tasks per user. Tasks untouched for longer than
+    SCHEDULER_INFLIGHT_TTL_SECONDS are assumed lost (e.g. a killed worker)
+    so they can't pin a user's quota forever.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.SCHEDULER_INFLIGHT_TTL_SECONDS)
+    return (
+        select(ScrapingTask.user_id, func.count())
+        .where(
+            ScrapingTask.user_id.in_(list(user_ids)),
+            ScrapingTask.celery_task_id.isnot(None),
+            ScrapingTask.status.in_([ScrapingStatus.pending, ScrapingStatus.running]),
+            ScrapingTask.updated_at >= cutoff
+        )
+        .group_by(ScrapingTask.user_id)
+    )
+
+def quotas_from_rows(rows) -> Dict[int, int]:
+    """Concurrent task quota per user: the best active plan's max_scraping_jobs, else the role default"""
+    quotas: Dict[int, int] = {}
+    for user_id, role, plan_limit in rows:
+        role_value = getattr(role, "value", role) or UserRole.user.value
+        quota = plan_limit if plan_limit else settings.ROLE_CONCURRENCY_QUOTAS.get(role_value, 1)
+        quotas[user_id] = max(quotas.get(user_id, 0), quota)
+    return quotas
+
+class TaskDispatcher:
+    """
+    Hands scraping tasks to Celery on per-platform, per-priority queues,
+    holding back tasks beyond the user's concurrency quota. Held tasks stay
+    pending with no celery_task_id until a slot frees up; the fair-share
+    pass then releases them round-robin across users.
+
+    Dispatch is claim-then-send: the Celery task id is generated and
+    committed with the row first, so a crash between the two can't send a
+    task twice.
+    """
+
+    @staticmethod
+    def quotas(db: Session, user_ids: Iterable[int]) -> Dict[int, int]:
+        return quotas_from_rows(db.execute(quota_query(user_ids)).all())
+
+    @staticmethod
+    def in_flight(db: Session, user_ids: Iterable[int]) -> Dict[int, int]:
+        return dict(db.execute(in_flight_query(user_ids)).all())
+
+    @staticmethod
+    def claim(db: Session, task: ScrapingTask) -> bool:
+        """
+        Reserve a Celery id for a new (flushed) task if its user has a free
+        slot. The user's row stays locked until the caller commits.
+        """
+        db.execute(lock_users_query([task.user_id]))
+        quota = TaskDispatcher.quotas(db, [task.user_id]).get(task.user_id, 1)
+        if TaskDispatcher.in_flight(db, [task.user_id]).get(task.user_id, 0) >= quota:
+            return False
+        task.celery_task_id = str(uuid.uuid4())
+        return True
+
+    @staticmethod
+    def signature(task: ScrapingTask):
+        """The Celery call for a claimed task, routed to its queue"""
+        return create_scraping_task_celery.signature(
+            kwargs={
+                "task_id": task.id,
+                "user_id": task.user_id,
+                "platform": getattr(task.platform, "value", task.platform),
+                "task_type": task.task_type,
+                "input_data": task.input_data,
+            },
+            task_id=task.celery_task_id,
+            queue=queue_name(task.platform, task.priority)
+        )
+
+    @staticmethod
+    def send(task: ScrapingTask):
+        """Publish a claimed task to its queue"""
+        TaskDispatcher.signature(task).apply_async()
+
+    @staticmethod
+    def send_many(tasks: List[ScrapingTask]):
+        """Publish claimed tasks as one group, over a single producer connection"""
+        group(TaskDispatcher.signature(task) for task in tasks).apply_async()
+
+    @staticmethod
+    def send_or_release(db: Session, task: ScrapingTask) -> bool:
+        """Send a committed claim; on broker errors give the claim back to the fair-share pass"""
+        try:
+            TaskDispatcher.send(task)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to send task {task.id} to Celery: {str(e)}")
+            task.celery_task_id = None
+            db.commit()
+            return False
+
+    @staticmethod
+    def dispatch_pending(db: Session, user_ids: Optional[List[int]] = None,
+                         limit: Optional[int] = None) -> dict:
+        """
+        Fair-share pass over held tasks: every user with a free slot gets
+        their most urgent task released before anyone gets a second one, and
+        users furthest below their quota go first within each round.
+        """
+        limit = limit or settings.SCHEDULER_DISPATCH_BATCH
+        waiting_users = select(ScrapingTask.user_id).where(_waiting()).distinct()
+        if user_ids is not None:
+            waiting_users = waiting_users.where(ScrapingTask.user_id.in_(user_ids))
+        candidates = list(db.execute(waiting_users).scalars())
+        if not candidates:
+            return {"dispatched": 0, "waiting_users": 0}
+
+        db.execute(lock_users_query(candidates))
+        quotas = TaskDispatcher.quotas(db, candidates)
+        in_flight = TaskDispatcher.in_flight(db, candidates)
+        slots = {
+            user_id: quotas.get(user_id, 1) - in_flight.get(user_id, 0)
+            for user_id in candidates
+        }
+        slots = {user_id: free for user_id, free in slots.items() if free > 0}
+        if not slots:
+            return {"dispatched": 0, "waiting_users": len(candidates)}
+
+        rank = func.row_number().over(
+            partition_by=ScrapingTask.user_id,
+            order_by=(_priority_rank(), ScrapingTask.created_at, ScrapingTask.id)
+        ).label("rank")
+        backlog = (
+            select(ScrapingTask.id, ScrapingTask.user_id, rank)
+            .where(_waiting(), ScrapingTask.user_id.in_(list(slots)))
+            .subquery()
+        )
+        rows = db.execute(
+            select(backlog.c.id, backlog.c.user_id, backlog.c.rank)
+            .where(backlog.c.rank <= max(slots.values()))
+        ).all()
+
+        usage = {user_id: in_flight.get(user_id, 0) / quotas.get(user_id, 1) for user_id in slots}
+        chosen = sorted(
+            (row for row in rows if row.rank <= slots[row.user_id]),
+            key=lambda row: (row.rank, usage[row.user_id], row.user_id)
+        )[:limit]
+
+        tasks = db.execute(
+            select(ScrapingTask)
+            .where(ScrapingTask.id.in_([row.id for row in chosen]), _waiting())
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        order = {row.id: position for position, row in enumerate(chosen)}
+        tasks.sort(key=lambda task: order[task.id])
+        for task in tasks:
+            task.celery_task_id = str(uuid.uuid4())
+        db.commit()
+
+        dispatched = sum(1 for task in tasks if TaskDispatcher.send_or_release(db, task))
+        return {"dispatched": dispatched, "waiting_users": len(candidates)}
+
+class AsyncTaskDispatcher:
+    """Quota check for request handlers; sending reuses TaskDispatcher in a thread"""
+
+    @staticmethod
+    async def free_slots(db: AsyncSession, user_id: int) -> int:
+        """Free slots for a user, whose row stays locked until the caller commits its claims"""
+        await db.execute(lock_users_query([user_id]))
+        quota = quotas_from_rows((await db.execute(quota_query([user_id]))).all()).get(user_id, 1)
+        in_flight = dict((await db.execute(in_flight_query([user_id]))).all()).get(user_id, 0)
+        return max(quota - in_flight, 0)
+
+    @staticmethod
+    async def claim(db: AsyncSession, task: ScrapingTask) -> bool:
+        if not await AsyncTaskDispatcher.free_slots(db, task.user_id):
+            return False
+        task.celery_task_id = str(uuid.uuid4())
+        return True
+
+    @staticmethod
+    async def send_or_release(db: AsyncSession, task: ScrapingTask) -> bool:
+        """Send a committed claim (broker I/O is blocking, keep it off the event loop)"""
+        try:
+            await asyncio.to_thread(TaskDispatcher.send, task)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to send task {task.id} to Celery: {str(e)}")
+            task.celery_task_id = None
+            await db.commit()
+            return False
+
+    @staticmethod
+    async def send_many_or_release(db: AsyncSession, tasks: List[ScrapingTask]) -> int:
+        """Send committed claims as one group; on broker errors give them all back to the fair-share pass"""
+        if not tasks:
+            return 0
+        try:
+            await asyncio.to_thread(TaskDispatcher.send_many, tasks)
+            return len(tasks)
+        except Exception as e:
+            logger.error(f"Failed to send {len(tasks)} tasks to Celery: {str(e)}")
+            await db.execute(
+                update(ScrapingTask)
+                .where(ScrapingTask.id.in_([task.id for task in tasks]))
+                .values(celery_task_id=None)
+            )
+            await db.commit()
+            for task in tasks:
+                task.celery_task_id = None
+            return 0
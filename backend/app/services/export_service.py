@@ -0,0 +1,358 @@
+import asyncio
+import csv
+import enum
+import io
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import AsyncIterator, Iterator, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select, JSON, Integer, BigInteger, Numeric, DateTime, Boolean
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.models import ExportJob, Product, PriceHistory, ScrapingStatus
+from celery_app import run_export_celery
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_COLUMNS = [
+    Product.id, Product.task_id, Product.platform, Product.external_id, Product.product_name,
+    Product.price, Product.original_price, Product.discount_percentage, Product.sold_count,
+    Product.rating, Product.review_count, Product.shop_id, Product.shop_name, Product.shop_rating,
+    Product.shop_location, Product.product_url, Product.image_urls, Product.category,
+    Product.status, Product.created_at, Product.updated_at,
+]
+PRICE_HISTORY_COLUMNS = [
+    PriceHistory.product_id, Product.platform, Product.external_id, PriceHistory.price,
+    PriceHistory.discount_percentage, PriceHistory.sold_count, PriceHistory.rating, PriceHistory.recorded_at,
+]
+
+DATASETS = ("products", "price-history", "task-results")
+# format -> (media type, file extension)
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+def _cell(value):
+    """Plain JSON/CSV-friendly value; datetimes are left to the writer"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+def _arrow_type(column) -> pa.DataType:
+    column_type = column.type
+    if isinstance(column_type, (Integer, BigInteger)):
+        return pa.int64()
+    if isinstance(column_type, Numeric):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us", tz="UTC")
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    return pa.string()
+
+class CsvWriter:
+    def __init__(self, columns):
+        self.names = [column.key for column in columns]
+        self.json_columns = [isinstance(column.type, JSON) for column in columns]
+        self.rows = 0
+
+    def begin(self) -> bytes:
+        return self._encode([self.names])
+
+    def write(self, rows) -> bytes:
+        self.rows += len(rows)
+        return self._encode(
+            [
+                json.dumps(value) if is_json and value is not None
+                else value.isoformat() if isinstance(value, datetime) else _cell(value)
+                for value, is_json in zip(row, self.json_columns)
+            ]
+            for row in rows
+        )
+
+    def end(self) -> bytes:
+        return b""
+
+    @staticmethod
+    def _encode(rows) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+class NdjsonWriter:
+    def __init__(self, columns):
+        self.names = [column.key for column in columns]
+        self.rows = 0
+
+    def begin(self) -> bytes:
+        return b""
+
+    def write(self, rows) -> bytes:
+        self.rows += len(rows)
+        lines = [
+            json.dumps(
+                {name: value.isoformat() if isinstance(value, datetime) else _cell(value)
+                 for name, value in zip(self.names, row)},
+                ensure_ascii=False
+            )
+            for row in rows
+        ]
+        return ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+
+    def end(self) -> bytes:
+        return b""
+
+class _DrainableSink:
+    """Write-only file object that hands back whatever pyarrow wrote since the last drain"""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.buffer.write(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = self.buffer.getvalue()
+        self.buffer = io.BytesIO()
+        return data
+
+class ParquetWriter:
+    """One row group per fetched chunk, emitted as soon as it is encoded"""
+
+    def __init__(self, columns):
+        self.names = [column.key for column in columns]
+        self.json_columns = [isinstance(column.type, JSON) for column in columns]
+        self.schema = pa.schema([(column.key, _arrow_type(column)) for column in columns])
+        self.sink = _DrainableSink()
+        self.writer = pq.ParquetWriter(self.sink, self.schema, compression="snappy")
+        self.rows = 0
+
+    def begin(self) -> bytes:
+        return self.sink.drain()
+
+    def write(self, rows) -> bytes:
+        self.rows += len(rows)
+        columns = list(zip(*rows)) if rows else [[] for _ in self.names]
+        data = {
+            name: [json.dumps(value) if is_json and value is not None else _cell(value) for value in values]
+            for name, values, is_json in zip(self.names, columns, self.json_columns)
+        }
+        self.writer.write_table(pa.Table.from_pydict(data, schema=self.schema))
+        return self.sink.drain()
+
+    def end(self) -> bytes:
+        # Footer with the row group index
+        self.writer.close()
+        return self.sink.drain()
+
+WRITERS = {"csv": CsvWriter, "ndjson": NdjsonWriter, "parquet": ParquetWriter}
+
+def _parse_datetime(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+class ExportService:
+    """
+    Bulk exports streamed from server-side cursors. Rows are fetched
+    `EXPORT_CHUNK_SIZE` at a time and encoded chunk by chunk, so memory is
+    flat regardless of export size. Large exports can run as background
+    jobs that write the same bytes to a file under EXPORT_DIR.
+    """
+
+    @staticmethod
+    def columns(dataset: str) -> list:
+        return PRICE_HISTORY_COLUMNS if dataset == "price-history" else PRODUCT_COLUMNS
+
+    @staticmethod
+    def query(dataset: str, user_id: int, filters: dict):
+        """Export query for a dataset; filters: platform, task_id, since, until"""
+        platform = filters.get("platform")
+        since, until = _parse_datetime(filters.get("since")), _parse_datetime(filters.get("until"))
+
+        if dataset == "price-history":
+            query = (
+                select(*PRICE_HISTORY_COLUMNS)
+                .join(Product, Product.id == PriceHistory.product_id)
+                .where(PriceHistory.user_id == user_id)
+                .order_by(PriceHistory.product_id, PriceHistory.recorded_at)
+            )
+            if since:
+                query = query.where(PriceHistory.recorded_at >= since)
+            if until:
+                query = query.where(PriceHistory.recorded_at < until)
+        else:
+            query = select(*PRODUCT_COLUMNS).where(Product.user_id == user_id).order_by(Product.id)
+            if since:
+                query = query.where(Product.updated_at >= since)
+            if until:
+                query = query.where(Product.updated_at < until)
+        if dataset == "task-results":
+            query = query.where(Product.task_id == filters["task_id"])
+        if platform:
+            query = query.where(Product.platform == platform)
+        return query.execution_options(yield_per=settings.EXPORT_CHUNK_SIZE)
+
+    @staticmethod
+    def writer(dataset: str, export_format: str):
+        return WRITERS[export_format](ExportService.columns(dataset))
+
+    @staticmethod
+    async def stream(user_id: int, dataset: str, export_format: str, filters: dict) -> AsyncIterator[bytes]:
+        """
+        Encoded export bytes for a StreamingResponse. Uses its own session:
+        the response body is produced after the request's dependencies exit.
+        """
+        writer = ExportService.writer(dataset, export_format)
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(ExportService.query(dataset, user_id, filters))
+            yield writer.begin()
+            async for rows in result.partitions():
+                chunk = writer.write(rows)
+                if chunk:
+                    yield chunk
+            yield writer.end()
+
+    @staticmethod
+    def iterate(db: Session, writer, query) -> Iterator[bytes]:
+        """Sync counterpart of stream() for background jobs"""
+        result = db.execute(query)
+        yield writer.begin()
+        for rows in result.partitions():
+            yield writer.write(rows)
+        yield writer.end()
+
+    @staticmethod
+    def file_name(job: ExportJob) -> str:
+        return f"{job.dataset}-{job.id}.{FORMATS[job.format][1]}"
+
+    @staticmethod
+    def run_job(db: Session, job_id: int) -> Optional[ExportJob]:
+        """Write an export job's file, then mark it completed (or failed)"""
+        job = db.get(ExportJob, job_id)
+        if job is None:
+            return None
+        job.status = ScrapingStatus.running
+        db.commit()
+
+        os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+        path = os.path.join(settings.EXPORT_DIR, ExportService.file_name(job))
+        partial = f"{path}.part"
+        try:
+            writer = ExportService.writer(job.dataset, job.format)
+            query = ExportService.query(job.dataset, job.user_id, job.filters or {})
+            with open(partial, "wb") as output:
+                for chunk in ExportService.iterate(db, writer, query):
+                    output.write(chunk)
+            os.replace(partial, path)
+
+            job.status = ScrapingStatus.completed
+            job.row_count = writer.rows
+            job.file_path = path
+            job.file_size = os.path.getsize(path)
+            job.completed_at = datetime.now(timezone.utc)
+            job.expires_at = job.completed_at + timedelta(hours=settings.EXPORT_FILE_TTL_HOURS)
+        except Exception as e:
+            db.rollback()
+            if os.path.exists(partial):
+                os.remove(partial)
+            job.status = ScrapingStatus.failed
+            job.error_message = str(e)
+        db.commit()
+        return job
+
+    @staticmethod
+    def purge_expired(db: Session) -> int:
+        """Delete export files past their expiry (the job rows stay as history)"""
+        expired = db.execute(
+            select(ExportJob).where(
+                ExportJob.expires_at < datetime.now(timezone.utc),
+                ExportJob.file_path.isnot(None)
+            )
+        ).scalars().all()
+        for job in expired:
+            try:
+                os.remove(job.file_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to remove export file {job.file_path}: {str(e)}")
+                continue
+            job.file_path = None
+        db.commit()
+        return len(expired)
+
+class AsyncExportService:
+    """Export job bookkeeping for request handlers"""
+
+    @staticmethod
+    async def create_job(db: AsyncSession, user_id: int, dataset: str, export_format: str,
+                         filters: dict) -> ExportJob:
+        """
+        Record an export job and hand it to a worker. The job (with its
+        reserved Celery id) is committed before it is sent, so the worker
+        always finds it; a broker error fails the job instead of leaving it pending.
+        """
+        job = ExportJob(
+            user_id=user_id,
+            dataset=dataset,
+            format=export_format,
+            filters=filters,
+            status=ScrapingStatus.pending,
+            celery_task_id=str(uuid.uuid4())
+        )
+        db.add(job)
+        await db.commit()
+
+        try:
+            await asyncio.to_thread(
+                run_export_celery.apply_async, kwargs={"job_id": job.id}, task_id=job.celery_task_id
+            )
+        except Exception as e:
+            logger.error(f"Failed to send export job {job.id} to Celery: {str(e)}")
+            job.status = ScrapingStatus.failed
+            job.error_message = f"Could not queue export: {str(e)}"
+            job.celery_task_id = None
+            await db.commit()
+        await db.refresh(job)
+        return job
+
+    @staticmethod
+    async def get_job(db: AsyncSession, job_id: int, user_id: int) -> Optional[ExportJob]:
+        """Get an export job by ID (user-scoped)"""
+        result = await db.execute(
+            select(ExportJob).where(ExportJob.id == job_id, ExportJob.user_id == user_id)
+        )
+        return result.scalar_one_or_none()
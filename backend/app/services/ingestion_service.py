@@ -0,0 +1,268 @@
+from datetime import datetime, timezone
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, insert, func, literal_column
+from typing import Iterable, Iterator, List, Optional
+from app.core.config import settings
+from app.core.database import dialect_insert
+from app.models.models import Product, ScrapingTask, PriceHistory
+from app.services.counter_service import CounterService
+from app.services.timeseries_service import PriceRollupService
+from app.services.trend_service import TrendService
+from app.services.task_events import TaskEventService
+
+CONFLICT_COLUMNS = ["platform", "external_id", "user_id"]
+
+# A change in any of these writes a price_history snapshot
+TRACKED_COLUMNS = ["price", "discount_percentage", "sold_count", "rating"]
+
+# Columns a scraper may write; ids and timestamps are managed by the database
+PRODUCT_COLUMNS = {
+    column.name for column in Product.__table__.columns
+} - {"id", "created_at", "updated_at"}
+
+class IngestionResult:
+    """Inserted/updated/snapshot counts for one ingestion run"""
+
+    def __init__(self, inserted: int = 0, updated: int = 0, snapshots: int = 0,
+                 product_ids: Optional[List[int]] = None):
+        self.inserted = inserted
+        self.updated = updated
+        self.snapshots = snapshots
+        # Ids of the rows this run wrote; task_id on those rows is last-writer-wins
+        self.product_ids = product_ids or []
+
+    @property
+    def total(self) -> int:
+        return self.inserted + self.updated
+
+    def add(self, other: "IngestionResult"):
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.snapshots += other.snapshots
+        self.product_ids.extend(other.product_ids)
+
+class IngestionSink:
+    """
+    Persists products as a scrape streams them. Each write is upserted and
+    committed in INGEST_BATCH_SIZE chunks, together with its price history
+    and the task's results_count. Memory stays flat (only the written
+    product ids are kept, for coalesced followers), and whatever was
+    written survives a crawl that later fails or times out.
+    """
+
+    def __init__(self, db: Session, task_id: int, user_id: int, platform: str,
+                 batch_size: Optional[int] = None):
+        self.db = db
+        self.task_id = task_id
+        self.user_id = user_id
+        self.platform = platform
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.result = IngestionResult()
+
+    def write(self, products: List[dict], checkpoint: Optional[dict] = None):
+        """`checkpoint` (the crawl position after these products) commits with the last chunk"""
+        for start in range(0, len(products), self.batch_size):
+            end = start + self.batch_size
+            self.result.add(ProductIngestionService.ingest_batch(
+                self.db, self.task_id, self.user_id, self.platform, products[start:end],
+                checkpoint=checkpoint if end >= len(products) else None
+            ))
+            TaskEventService.progress(self.user_id, self.task_id, products_ingested=self.result.total)
+
+class ProductIngestionService:
+    @staticmethod
+    def ingest(db: Session, task_id: int, user_id: int, platform: str,
+               products: Iterable[dict], batch_size: Optional[int] = None) -> IngestionResult:
+        """
+        Upsert scraped products in chunks, one statement and one commit per chunk.
+        Price history snapshots and the task's results_count are written in the
+        same transaction as each chunk; a progress event follows each commit.
+        """
+        sink = IngestionSink(db, task_id, user_id, platform, batch_size)
+        chunk: List[dict] = []
+
+        for product_data in products:
+            chunk.append(product_data)
+            if len(chunk) >= sink.batch_size:
+                sink.write(chunk)
+                chunk = []
+
+        if chunk:
+            sink.write(chunk)
+
+        return sink.result
+
+    @staticmethod
+    def products_by_id(db: Session, product_ids: List[int],
+                       batch_size: Optional[int] = None) -> Iterator[dict]:
+        """
+        Replay products as scraper-shaped dicts, reading the given ids a chunk
+        at a time so callers may commit between chunks. Used to fan a
+        leader's results out to coalesced followers: keyed by the ids the
+        leader wrote, not by task_id, which later upserts overwrite.
+        """
+        batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        columns = [getattr(Product, column) for column in sorted(PRODUCT_COLUMNS)]
+        for start in range(0, len(product_ids), batch_size):
+            rows = db.execute(
+                select(*columns)
+                .where(Product.id.in_(product_ids[start:start + batch_size]))
+                .order_by(Product.id)
+            ).all()
+            for row in rows:
+                yield {column: row._mapping[column] for column in PRODUCT_COLUMNS}
+
+    @staticmethod
+    def ingest_batch(db: Session, task_id: int, user_id: int, platform: str,
+                     products: List[dict], checkpoint: Optional[dict] = None) -> IngestionResult:
+        """
+        Upsert one batch of products and commit it with its price history,
+        results_count, counters and (if given) the task's crawl checkpoint,
+        so a resumed crawl never ingests a page twice
+        """
+        rows = ProductIngestionService._prepare_rows(task_id, user_id, platform, products)
+        if not rows:
+            return IngestionResult()
+
+        try:
+            upserted = []
+            # Multi-row VALUES needs the same keys on every row, and padding
+            # with NULL would overwrite stored values a partial row (DOM vs API
+            # fields, partial detail enrichment) didn't supply: one statement per key set
+            for group in ProductIngestionService._group_by_keys(rows):
+                upserted.extend(ProductIngestionService._upsert(db, user_id, platform, group))
+            batch_result = ProductIngestionService._record_snapshots(db, user_id, upserted)
+            values = {"results_count": func.coalesce(ScrapingTask.results_count, 0) + batch_result.total}
+            if checkpoint is not None:
+                values["checkpoint"] = checkpoint
+            db.execute(update(ScrapingTask).where(ScrapingTask.id == task_id).values(**values))
+            CounterService.increment(db, user_id, CounterService.product_deltas(platform, batch_result.inserted))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        if batch_result.inserted:
+            CounterService.invalidate(user_id)
+        TrendService.record_batch(user_id, rows, upserted)
+
+        return batch_result
+
+    @staticmethod
+    def _prepare_rows(task_id: int, user_id: int, platform: str, products: List[dict]) -> List[dict]:
+        """Keep known columns, drop rows without an external_id and dedupe within the batch"""
+        by_external_id = {}
+        for product_data in products:
+            external_id = product_data.get("external_id")
+            if not external_id:
+                continue
+            row = {key: value for key, value in product_data.items() if key in PRODUCT_COLUMNS}
+            row.update(task_id=task_id, user_id=user_id, platform=platform, external_id=str(external_id))
+            # ON CONFLICT cannot touch the same row twice in one statement; last one wins
+            by_external_id[row["external_id"]] = row
+
+        return list(by_external_id.values())
+
+    @staticmethod
+    def _group_by_keys(rows: List[dict]) -> List[List[dict]]:
+        """Split rows into groups that supply the same columns"""
+        groups = {}
+        for row in rows:
+            groups.setdefault(frozenset(row), []).append(row)
+        return list(groups.values())
+
+    @staticmethod
+    def _upsert(db: Session, user_id: int, platform: str, rows: List[dict]) -> List[dict]:
+        """
+        Upsert rows (all supplying the same columns) and return, per product,
+        its id and external_id, whether it was inserted, the new tracked values
+        and the values it had before the upsert. Columns a row doesn't supply
+        keep their stored values.
+        """
+        stmt = dialect_insert(db, Product).values(rows)
+        update_columns = {
+            key: stmt.excluded[key] for key in rows[0].keys() if key not in CONFLICT_COLUMNS
+        }
+        update_columns["updated_at"] = func.now()
+        stmt = stmt.on_conflict_do_update(index_elements=CONFLICT_COLUMNS, set_=update_columns)
+
+        tracked = [getattr(Product, column) for column in TRACKED_COLUMNS]
+        previous_query = select(Product.id, Product.external_id, *tracked).where(
+            Product.user_id == user_id,
+            Product.platform == platform,
+            Product.external_id.in_([row["external_id"] for row in rows])
+        )
+
+        if db.bind.dialect.name == "postgresql":
+            # Every WITH member sees the pre-statement snapshot, so "previous"
+            # holds the old values while "upserted" returns the new ones, in a
+            # single round trip. xmax is 0 only for freshly inserted tuples.
+            previous = previous_query.cte("previous")
+            upserted = stmt.returning(
+                Product.id, Product.external_id, *tracked, literal_column("(xmax = 0)").label("inserted")
+            ).cte("upserted")
+            query = select(
+                upserted.c.id,
+                upserted.c.external_id,
+                upserted.c.inserted,
+                *[upserted.c[column] for column in TRACKED_COLUMNS],
+                *[previous.c[column].label(f"previous_{column}") for column in TRACKED_COLUMNS]
+            ).select_from(upserted.outerjoin(previous, previous.c.id == upserted.c.id))
+            return [dict(row._mapping) for row in db.execute(query)]
+
+        # SQLite cannot put DML in a CTE; read the previous values first
+        previous = {row.external_id: row for row in db.execute(previous_query)}
+        returned = db.execute(stmt.returning(Product.id, Product.external_id, *tracked)).all()
+        results = []
+        for row in returned:
+            before = previous.get(row.external_id)
+            result = {"id": row.id, "external_id": row.external_id, "inserted": before is None}
+            for column in TRACKED_COLUMNS:
+                result[column] = getattr(row, column)
+                result[f"previous_{column}"] = getattr(before, column) if before else None
+            results.append(result)
+        return results
+
+    @staticmethod
+    def _record_snapshots(db: Session, user_id: int, upserted: List[dict]) -> IngestionResult:
+        """
+        Append price_history rows for new products and ones whose tracked
+        values changed, and fold them into the price rollups.
+        """
+        recorded_at = datetime.now(timezone.utc)
+        history_rows = [
+            {
+                "product_id": row["id"],
+                "user_id": user_id,
+                "recorded_at": recorded_at,
+                **{column: row[column] for column in TRACKED_COLUMNS}
+            }
+            for row in upserted
+            if row["inserted"] or any(
+                row[column] != row[f"previous_{column}"] for column in TRACKED_COLUMNS
+            )
+        ]
+        if history_rows:
+            db.execute(insert(PriceHistory), history_rows)
+            previous_sold = {row["id"]: row["previous_sold_count"] for row in upserted}
+            PriceRollupService.record(db, user_id, [
+                {
+                    **history_row,
+                    "sold_count_delta": ProductIngestionService._sold_delta(
+                        previous_sold[history_row["product_id"]], history_row["sold_count"]
+                    )
+                }
+                for history_row in history_rows
+            ])
+
+        inserted = sum(1 for row in upserted if row["inserted"])
+        return IngestionResult(
+            inserted, len(upserted) - inserted, len(history_rows), [row["id"] for row in upserted]
+        )
+
+    @staticmethod
+    def _sold_delta(previous: Optional[int], current: Optional[int]) -> int:
+        """Units sold since the previous snapshot; counters that reset count as zero"""
+        if previous is None or current is None:
+            return 0
+        return max(0, current - previous)
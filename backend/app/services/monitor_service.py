@@ -0,0 +1,196 @@
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import select, update, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import MonitorSchedule, ScrapingPlatform
+from app.schemas.schemas import ScrapingTaskInput
+from app.services.ingestion_service import IngestionResult
+from app.services.scraping_service import ScrapingTaskService
+
+logger = logging.getLogger(__name__)
+
+# Schedulable task types and the input_data key their target fills
+TARGET_KEYS = {"shop_monitor": "shop_id", "keyword_search": "keyword"}
+
+# New monitors start within this window, so bulk-created ones don't fire together
+FIRST_RUN_SPREAD_MINUTES = 60
+
+def clamp_interval(minutes: int) -> int:
+    return max(settings.MONITOR_MIN_INTERVAL_MINUTES, min(int(minutes), settings.MONITOR_MAX_INTERVAL_MINUTES))
+
+def jittered(minutes: int) -> timedelta:
+    """The interval scaled by a random factor in 1 +/- MONITOR_JITTER_FRACTION"""
+    fraction = settings.MONITOR_JITTER_FRACTION
+    return timedelta(minutes=minutes * random.uniform(1 - fraction, 1 + fraction))
+
+def first_run_at(now: datetime, minutes: int) -> datetime:
+    return now + timedelta(minutes=random.uniform(0, min(minutes, FIRST_RUN_SPREAD_MINUTES)))
+
+def adapt_interval(current: int, requested: int, change_rate: float) -> int:
+    """
+    Halve the interval for fast-moving listings, stretch it by half for
+    static ones, and otherwise ease back towards the requested interval.
+    """
+    if change_rate >= settings.MONITOR_FAST_CHANGE_RATE:
+        minutes = current / 2
+    elif change_rate <= settings.MONITOR_SLOW_CHANGE_RATE:
+        minutes = current * 1.5
+    else:
+        minutes = current + (requested - current) / 2
+    return clamp_interval(round(minutes))
+
+def _aware(moment: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands back naive datetimes for timezone-aware columns
+    if moment is not None and moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment
+
+class MonitorScheduleService:
+    """Dispatch of due monitors and interval adaptation, for Celery"""
+
+    @staticmethod
+    def task_input(schedule: MonitorSchedule, expires_at: datetime) -> ScrapingTaskInput:
+        return ScrapingTaskInput(
+            platform=schedule.platform,
+            task_type=schedule.task_type,
+            input_data={**(schedule.options or {}), TARGET_KEYS[schedule.task_type]: schedule.target},
+            expires_at=expires_at
+        )
+
+    @staticmethod
+    def dispatch_due(db: Session, limit: Optional[int] = None) -> dict:
+        """
+        Create a scraping task for each due schedule. Schedules are claimed
+        (next run moved forward, with jitter) and committed before any task
+        is sent, so an overlapping Beat run can't dispatch them twice.
+        Fastest-moving monitors go first when more are due than `limit`.
+        """
+        now = datetime.now(timezone.utc)
+        expired = db.execute(
+            update(MonitorSchedule)
+            .where(MonitorSchedule.is_active.is_(True), MonitorSchedule.expires_at <= now)
+            .values(is_active=False)
+        ).rowcount
+
+        due = db.execute(
+            select(MonitorSchedule)
+            .where(
+                MonitorSchedule.is_active.is_(True),
+                MonitorSchedule.next_run_at <= now,
+                or_(MonitorSchedule.expires_at.is_(None), MonitorSchedule.expires_at > now)
+            )
+            .order_by(MonitorSchedule.current_interval_minutes, MonitorSchedule.next_run_at)
+            .limit(limit or settings.MONITOR_DISPATCH_BATCH)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+
+        claimed = []
+        for schedule in due:
+            # A run still queued when the next one is due is superseded by it
+            claimed.append((schedule, now + timedelta(minutes=schedule.current_interval_minutes)))
+            schedule.last_run_at = now
+            schedule.next_run_at = now + jittered(schedule.current_interval_minutes)
+        db.commit()
+
+        dispatched = 0
+        for schedule, expires_at in claimed:
+            try:
+                task = ScrapingTaskService.create_task(
+                    db, schedule.user_id, MonitorScheduleService.task_input(schedule, expires_at),
+                    schedule_id=schedule.id, priority="scheduled"
+                )
+                schedule.last_task_id = task.id
+                db.commit()
+                dispatched += 1
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Failed to dispatch monitor {schedule.id}: {str(e)}")
+
+        return {"due": len(due), "dispatched": dispatched, "expired": expired}
+
+    @staticmethod
+    def record_run(db: Session, schedule_id: int, ingestion: IngestionResult):
+        """Fold a completed run's change rate into the schedule and re-plan its next run"""
+        schedule = db.get(MonitorSchedule, schedule_id)
+        if schedule is None or not ingestion.updated:
+            # Nothing seen before (e.g. the first run): no evidence of how fast the listing moves
+            return
+
+        # Snapshots are written for every new product and for changed
+        # price/discount/sold/rating; only the latter measure change
+        rate = (ingestion.snapshots - ingestion.inserted) / ingestion.updated
+        if schedule.change_rate is None:
+            schedule.change_rate = rate
+        else:
+            schedule.change_rate += settings.MONITOR_CHANGE_RATE_SMOOTHING * (rate - schedule.change_rate)
+
+        minutes = adapt_interval(schedule.current_interval_minutes, schedule.interval_minutes, schedule.change_rate)
+        if minutes != schedule.current_interval_minutes:
+            schedule.current_interval_minutes = minutes
+            started = _aware(schedule.last_run_at) or datetime.now(timezone.utc)
+            schedule.next_run_at = started + jittered(minutes)
+        db.commit()
+
+class AsyncMonitorService:
+    """Monitor schedule CRUD for request handlers"""
+
+    @staticmethod
+    async def create(db: AsyncSession, user_id: int, platform: ScrapingPlatform, task_type: str, target: str,
+                     interval_minutes: int, options: dict, expires_at: Optional[datetime] = None) -> MonitorSchedule:
+        minutes = clamp_interval(interval_minutes)
+        schedule = MonitorSchedule(
+            user_id=user_id,
+            platform=platform,
+            task_type=task_type,
+            target=target,
+            options=options,
+            interval_minutes=minutes,
+            current_interval_minutes=minutes,
+            next_run_at=first_run_at(datetime.now(timezone.utc), minutes),
+            expires_at=expires_at,
+            is_active=True
+        )
+        db.add(schedule)
+        await db.commit()
+        await db.refresh(schedule)
+        return schedule
+
+    @staticmethod
+    async def get(db: AsyncSession, schedule_id: int, user_id: int) -> Optional[MonitorSchedule]:
+        """Get a schedule by ID (user-scoped)"""
+        result = await db.execute(
+            select(MonitorSchedule).where(MonitorSchedule.id == schedule_id, MonitorSchedule.user_id == user_id)
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def list(db: AsyncSession, user_id: int) -> List[MonitorSchedule]:
+        result = await db.execute(
+            select(MonitorSchedule).where(MonitorSchedule.user_id == user_id).order_by(MonitorSchedule.id)
+        )
+        return list(result.scalars())
+
+    @staticmethod
+    async def update(db: AsyncSession, schedule: MonitorSchedule, changes: dict) -> MonitorSchedule:
+        """Apply changes; a new interval resets adaptation and re-plans the next run"""
+        if changes.get("interval_minutes") is not None:
+            minutes = clamp_interval(changes.pop("interval_minutes"))
+            schedule.interval_minutes = minutes
+            schedule.current_interval_minutes = minutes
+            schedule.next_run_at = first_run_at(datetime.now(timezone.utc), minutes)
+        for key, value in changes.items():
+            setattr(schedule, key, value)
+        await db.commit()
+        await db.refresh(schedule)
+        return schedule
+
+    @staticmethod
+    async def delete(db: AsyncSession, schedule: MonitorSchedule):
+        await db.delete(schedule)
+        await db.commit()
@@ -0,0 +1,279 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, cast, Float
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import PriceHistory, Product, Collection, collection_products
+
+COLUMNS = ["product_id", "recorded_at", "price", "discount_percentage", "sold_count"]
+
+# Log-spaced price bins (1 .. 10^10): medians are read off mergeable
+# histograms, so memory stays per-bucket instead of per-row. Bins are ~2.3%
+# wide, which bounds the median's relative error.
+PRICE_BIN_EDGES = np.geomspace(1, 1e10, 1001)
+DISCOUNT_BIN_WIDTH = 5
+# Relative price change that counts as a cut, and depth buckets for the response curve
+PRICE_CUT_THRESHOLD = 0.01
+PRICE_CUT_EDGES = np.array([0.01, 0.05, 0.10, 0.20, 0.30, 0.50, 1.0])
+
+def _float_list(values) -> List[Optional[float]]:
+    """JSON-safe floats (NaN -> None)"""
+    return [None if np.isnan(value) else round(float(value), 4) for value in values]
+
+def _bucket(recorded_at: pd.Series, resolution: str) -> pd.Series:
+    if resolution == "day":
+        return recorded_at.dt.floor("D")
+    if resolution == "week":
+        day = recorded_at.dt.floor("D")
+        return day - pd.to_timedelta(day.dt.weekday, unit="D")
+    raise ValueError(f"Unknown resolution: {resolution}")
+
+class MedianPriceAggregate:
+    """Median/mean/min/max price per time bucket from per-bucket price histograms"""
+
+    def __init__(self, resolution: str):
+        self.resolution = resolution
+        self.histograms: Dict[pd.Timestamp, np.ndarray] = {}
+        self.stats: Dict[pd.Timestamp, np.ndarray] = {}  # count, sum, min, max
+
+    def add(self, frame: pd.DataFrame):
+        frame = frame[frame["price"].notna()]
+        if frame.empty:
+            return
+        codes, buckets = pd.factorize(_bucket(frame["recorded_at"], self.resolution))
+        prices = frame["price"].to_numpy()
+        bins = np.clip(np.searchsorted(PRICE_BIN_EDGES, prices, side="right") - 1, 0, len(PRICE_BIN_EDGES) - 2)
+        width = len(PRICE_BIN_EDGES) - 1
+        counts = np.bincount(codes * width + bins, minlength=len(buckets) * width).reshape(len(buckets), width)
+
+        grouped = pd.Series(prices).groupby(codes).agg(["count", "sum", "min", "max"])
+        for code, bucket in enumerate(buckets):
+            chunk_stats = grouped.loc[code].to_numpy()
+            if bucket in self.histograms:
+                self.histograms[bucket] += counts[code]
+                stats = self.stats[bucket]
+                stats[0] += chunk_stats[0]
+                stats[1] += chunk_stats[1]
+                stats[2] = min(stats[2], chunk_stats[2])
+                stats[3] = max(stats[3], chunk_stats[3])
+            else:
+                self.histograms[bucket] = counts[code].copy()
+                self.stats[bucket] = chunk_stats.astype(float)
+
+    @staticmethod
+    def _median(histogram: np.ndarray, low: float, high: float) -> float:
+        cumulative = np.cumsum(histogram)
+        half = cumulative[-1] / 2
+        index = int(np.searchsorted(cumulative, half))
+        before = cumulative[index - 1] if index else 0
+        fraction = (half - before) / histogram[index]
+        # Geometric interpolation inside the log-spaced bin, clamped to the observed range
+        lower, upper = PRICE_BIN_EDGES[index], PRICE_BIN_EDGES[index + 1]
+        return float(np.clip(lower * (upper / lower) ** fraction, low, high))
+
+    def result(self) -> dict:
+        buckets = sorted(self.histograms)
+        stats = np.array([self.stats[bucket] for bucket in buckets]).reshape(-1, 4)
+        medians = np.array([
+            self._median(self.histograms[bucket], self.stats[bucket][2], self.stats[bucket][3])
+            for bucket in buckets
+        ])
+        return {
+            "resolution": self.resolution,
+            "buckets": [bucket.isoformat() for bucket in buckets],
+            "median": _float_list(medians),
+            "mean": _float_list(stats[:, 1] / stats[:, 0]) if len(buckets) else [],
+            "min": _float_list(stats[:, 2]),
+            "max": _float_list(stats[:, 3]),
+            "samples": stats[:, 0].astype(int).tolist(),
+        }
+
+class DiscountDepthAggregate:
+    """Distribution of discount_percentage in fixed-width bins"""
+
+    def __init__(self):
+        self.counts = np.zeros(100 // DISCOUNT_BIN_WIDTH + 1, dtype=np.int64)
+        self.total = 0.0
+        self.discounted = 0
+
+    def add(self, frame: pd.DataFrame):
+        discounts = frame["discount_percentage"].dropna().to_numpy()
+        discounts = np.clip(discounts, 0, 100)
+        self.counts += np.bincount((discounts // DISCOUNT_BIN_WIDTH).astype(np.int64), minlength=len(self.counts))
+        self.total += discounts.sum()
+        self.discounted += int((discounts > 0).sum())
+
+    def result(self) -> dict:
+        samples = int(self.counts.sum())
+        return {
+            "bin_edges": list(range(0, 101, DISCOUNT_BIN_WIDTH)),
+            # The last bin holds exactly-100% discounts
+            "counts": self.counts.tolist(),
+            "samples": samples,
+            "discounted_share": round(self.discounted / samples, 4) if samples else None,
+            "mean": round(float(self.total) / samples, 4) if samples else None,
+        }
+
+class PriceCutResponseAggregate:
+    """
+    Correlation between relative price changes and sold_count jumps across
+    consecutive snapshots of the same product. Rows must arrive ordered by
+    (product_id, recorded_at); the last row of each chunk is carried into the
+    next so pairs spanning a chunk boundary are not lost.
+    """
+
+    def __init__(self):
+        # n, sum x, sum y, sum x^2, sum y^2, sum xy for a streaming Pearson r
+        self.moments = np.zeros(6)
+        self.cut_sums = np.zeros(len(PRICE_CUT_EDGES) - 1)
+        self.cut_counts = np.zeros(len(PRICE_CUT_EDGES) - 1, dtype=np.int64)
+        self.baseline = np.zeros(2)  # sum, count of sold jumps without a cut
+        self.carry: Optional[pd.DataFrame] = None
+
+    def add(self, frame: pd.DataFrame):
+        frame = frame[["product_id", "price", "sold_count"]]
+        if self.carry is not None:
+            frame = pd.concat([self.carry, frame], ignore_index=True)
+        self.carry = frame.iloc[-1:]
+
+        product_ids = frame["product_id"].to_numpy()
+        prices = frame["price"].to_numpy()
+        sold = frame["sold_count"].to_numpy(dtype=float)
+        same_product = product_ids[1:] == product_ids[:-1]
+        previous_price = prices[:-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = (prices[1:] - previous_price) / previous_price
+        # sold_count is cumulative; negative deltas are relistings or scrape noise
+        jump = np.maximum(sold[1:] - sold[:-1], 0)
+        valid = same_product & (previous_price > 0) & np.isfinite(change) & np.isfinite(jump)
+        x, y = change[valid], jump[valid]
+        if not len(x):
+            return
+
+        self.moments += [len(x), x.sum(), y.sum(), (x * x).sum(), (y * y).sum(), (x * y).sum()]
+        depth = -x
+        is_cut = depth >= PRICE_CUT_THRESHOLD
+        bins = np.clip(np.searchsorted(PRICE_CUT_EDGES, depth[is_cut], side="right") - 1, 0, len(self.cut_sums) - 1)
+        self.cut_sums += np.bincount(bins, weights=y[is_cut], minlength=len(self.cut_sums))
+        self.cut_counts += np.bincount(bins, minlength=len(self.cut_counts))
+        self.baseline += [y[~is_cut].sum(), (~is_cut).sum()]
+
+    def result(self) -> dict:
+        n, sx, sy, sxx, syy, sxy = self.moments
+        correlation = None
+        if n > 1:
+            covariance = n * sxy - sx * sy
+            spread = np.sqrt(max(n * sxx - sx * sx, 0) * max(n * syy - sy * sy, 0))
+            correlation = round(float(covariance / spread), 4) if spread else None
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_jump = self.cut_sums / self.cut_counts
+        return {
+            "pairs": int(n),
+            "correlation": correlation,
+            "baseline_mean_sold_jump": round(float(self.baseline[0] / self.baseline[1]), 4) if self.baseline[1] else None,
+            "cut_depth_edges": PRICE_CUT_EDGES.tolist(),
+            "cut_counts": self.cut_counts.tolist(),
+            "cut_mean_sold_jump": _float_list(mean_jump),
+        }
+
+class PriceAnalyticsService:
+    """
+    Bulk price_history analytics for a selection of products. History is
+    streamed from a server-side cursor in columnar chunks and folded into
+    mergeable aggregates, so memory is bounded by chunk size and bucket
+    count rather than by the number of rows scanned.
+    """
+
+    @staticmethod
+    def history_query(user_id: int, since: datetime, until: datetime,
+                      collection_id: Optional[int] = None, category: Optional[str] = None,
+                      shop_name: Optional[str] = None, platform: Optional[str] = None):
+        products = select(Product.id).where(Product.user_id == user_id)
+        if collection_id is not None:
+            products = products.where(Product.id.in_(
+                select(collection_products.c.product_id)
+                .join(Collection, Collection.id == collection_products.c.collection_id)
+                .where(Collection.id == collection_id, Collection.user_id == user_id)
+            ))
+        if category:
+            products = products.where(Product.category == category)
+        if shop_name:
+            products = products.where(Product.shop_name == shop_name)
+        if platform:
+            products = products.where(Product.platform == platform)
+
+        # Only the columns the aggregates need; the time range prunes price_history partitions
+        return (
+            select(
+                PriceHistory.product_id,
+                PriceHistory.recorded_at,
+                cast(PriceHistory.price, Float),
+                PriceHistory.discount_percentage,
+                PriceHistory.sold_count,
+            )
+            .where(
+                PriceHistory.user_id == user_id,
+                PriceHistory.product_id.in_(products),
+                PriceHistory.recorded_at >= since,
+                PriceHistory.recorded_at < until,
+            )
+            .order_by(PriceHistory.product_id, PriceHistory.recorded_at)
+        )
+
+    @staticmethod
+    def stream_history(db: Session, query, chunk_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """Yield the query's rows as DataFrames of at most `chunk_size` rows"""
+        chunk_size = chunk_size or settings.PRICE_ANALYTICS_CHUNK_SIZE
+        result = db.execute(query.execution_options(stream_results=True, yield_per=chunk_size))
+        for rows in result.partitions(chunk_size):
+            frame = pd.DataFrame.from_records(rows, columns=COLUMNS)
+            frame["recorded_at"] = pd.to_datetime(frame["recorded_at"], utc=True)
+            frame["price"] = frame["price"].astype(float)
+            frame["discount_percentage"] = frame["discount_percentage"].astype(float)
+            frame["sold_count"] = frame["sold_count"].astype(float)
+            yield frame
+
+    @staticmethod
+    def analyze(db: Session, user_id: int, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                resolution: str = "day", collection_id: Optional[int] = None, category: Optional[str] = None,
+                shop_name: Optional[str] = None, platform: Optional[str] = None,
+                chunk_size: Optional[int] = None) -> dict:
+        """Median price over time, discount-depth distribution and price-cut response in one scan"""
+        until = until or datetime.now(timezone.utc)
+        since = since or until - timedelta(days=settings.PRICE_ANALYTICS_DEFAULT_DAYS)
+        query = PriceAnalyticsService.history_query(
+            user_id, since, until, collection_id, category, shop_name, platform
+        )
+
+        median_price = MedianPriceAggregate(resolution)
+        discount_depth = DiscountDepthAggregate()
+        price_cut_response = PriceCutResponseAggregate()
+        rows = 0
+        for frame in PriceAnalyticsService.stream_history(db, query, chunk_size):
+            rows += len(frame)
+            median_price.add(frame)
+            discount_depth.add(frame)
+            price_cut_response.add(frame)
+
+        return {
+            "since": since.isoformat(),
+            "until": until.isoformat(),
+            "rows": rows,
+            "median_price": median_price.result(),
+            "discount_depth": discount_depth.result(),
+            "price_cut_response": price_cut_response.result(),
+        }
+
+    @staticmethod
+    def analyze_in_session(**kwargs) -> dict:
+        """analyze() on a dedicated sync session, for running in a worker thread"""
+        db = SessionLocal()
+        try:
+            return PriceAnalyticsService.analyze(db, **kwargs)
+        finally:
+            db.close()
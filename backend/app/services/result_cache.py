@@ -0,0 +1,225 @@
+import hashlib
+import json
+import logging
+import time
+from typing import Iterator, List, Optional, Tuple
+
+import redis
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Options that change how we scrape, not what comes back
+IGNORED_INPUT_KEYS = {"mode", "navigation_profile", "concurrency", "fresh"}
+
+# A follower registered this long ago whose leader key is gone was never
+# drained: the leader died (SIGKILL, OOM, hard time limit) without releasing it
+FOLLOWER_GRACE_SECONDS = 60
+
+class ScrapeResultCache:
+    """
+    Reuses recent scrape results for identical (platform, task_type, input)
+    requests and coalesces concurrent identical tasks onto one browser run.
+
+    The first task to claim a key becomes the leader; tasks arriving while it
+    runs register as followers and receive the leader's products. Followers
+    are also listed, with their registration time, in one sorted set: the
+    leader and the orphan reaper each take a follower out of it with ZREM,
+    and whoever removes it owns it, so a follower whose leader died is
+    requeued exactly once. Redis errors degrade to "no cache": every task
+    scrapes for itself.
+    """
+
+    KEY_PREFIX = "scrape"
+
+    @staticmethod
+    def normalize_input(input_data: dict) -> dict:
+        def normalize(value):
+            if isinstance(value, str):
+                return " ".join(value.lower().split())
+            if isinstance(value, dict):
+                return {k: normalize(v) for k, v in sorted(value.items())}
+            if isinstance(value, list):
+                return [normalize(v) for v in value]
+            return value
+
+        return normalize({k: v for k, v in input_data.items() if k not in IGNORED_INPUT_KEYS})
+
+    @staticmethod
+    def cache_key(platform: str, task_type: str, input_data: dict) -> str:
+        normalized = json.dumps(ScrapeResultCache.normalize_input(input_data), sort_keys=True)
+        digest = hashlib.sha256(f"{platform}|{task_type}|{normalized}".encode()).hexdigest()
+        return f"{platform}:{task_type}:{digest}"
+
+    @staticmethod
+    def _result_key(key: str) -> str:
+        # A list of JSON product batches, in scrape order
+        return f"{ScrapeResultCache.KEY_PREFIX}:batches:{key}"
+
+    @staticmethod
+    def _staging_key(key: str, task_id: int) -> str:
+        return f"{ScrapeResultCache.KEY_PREFIX}:staging:{key}:{task_id}"
+
+    @staticmethod
+    def _inflight_key(key: str) -> str:
+        return f"{ScrapeResultCache.KEY_PREFIX}:inflight:{key}"
+
+    @staticmethod
+    def _followers_key(key: str) -> str:
+        return f"{ScrapeResultCache.KEY_PREFIX}:followers:{key}"
+
+    @staticmethod
+    def _following_key() -> str:
+        # Every registered follower as [task_id, user_id, key], scored by registration time
+        return f"{ScrapeResultCache.KEY_PREFIX}:following"
+
+    @staticmethod
+    def get(key: str) -> Optional[Iterator[List[dict]]]:
+        """
+        Cached product batches for a key, or None on a miss. The list is read
+        in one LRANGE, so expiry or a Redis error can't cut a hit short;
+        batches are decoded one at a time.
+        """
+        try:
+            payloads = get_redis().lrange(ScrapeResultCache._result_key(key), 0, -1)
+        except redis.RedisError as e:
+            logger.warning(f"Result cache unavailable: {str(e)}")
+            return None
+        return (json.loads(payload) for payload in payloads) if payloads else None
+
+    @staticmethod
+    def stage(key: str, task_type: str, task_id: int, products: List[dict]):
+        """
+        Append a batch to the task's private staging list while it scrapes;
+        publish makes it the cached result once the crawl has finished
+        (no-op when the task type's TTL is 0).
+        """
+        if not settings.SCRAPE_CACHE_TTLS.get(task_type, 0):
+            return
+        staging_key = ScrapeResultCache._staging_key(key, task_id)
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.rpush(staging_key, json.dumps(products, default=str))
+            pipe.expire(staging_key, settings.SCRAPE_INFLIGHT_TTL)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Failed to stage scrape result: {str(e)}")
+
+    @staticmethod
+    def publish(key: str, task_type: str, task_id: int):
+        """Swap the task's staged batches in as the cached result for the task type's TTL"""
+        ttl = settings.SCRAPE_CACHE_TTLS.get(task_type, 0)
+        if not ttl:
+            return
+        client = get_redis()
+        staging_key = ScrapeResultCache._staging_key(key, task_id)
+        try:
+            if not client.exists(staging_key):
+                return
+            pipe = client.pipeline(transaction=True)
+            pipe.rename(staging_key, ScrapeResultCache._result_key(key))
+            pipe.expire(ScrapeResultCache._result_key(key), ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Failed to cache scrape result: {str(e)}")
+
+    @staticmethod
+    def discard(key: str, task_id: int):
+        """Drop a failed crawl's staged batches"""
+        try:
+            get_redis().delete(ScrapeResultCache._staging_key(key, task_id))
+        except redis.RedisError as e:
+            logger.warning(f"Failed to discard staged scrape result: {str(e)}")
+
+    @staticmethod
+    def claim(key: str, task_id: int) -> bool:
+        """Become the leader for a key; False if another task is already scraping it"""
+        try:
+            return bool(get_redis().set(
+                ScrapeResultCache._inflight_key(key), task_id, nx=True, ex=settings.SCRAPE_INFLIGHT_TTL
+            ))
+        except redis.RedisError as e:
+            logger.warning(f"Coalescing unavailable: {str(e)}")
+            return True
+
+    @staticmethod
+    def follow(key: str, task_id: int, user_id: int) -> bool:
+        """
+        Register as a follower of the running leader. Returns False when the
+        leader finished before it could pick us up; the caller then handles
+        the task itself (from the cache if the leader succeeded).
+        """
+        client = get_redis()
+        member = json.dumps([task_id, user_id])
+        following = json.dumps([task_id, user_id, key])
+        followers_key = ScrapeResultCache._followers_key(key)
+        try:
+            # Registered before listing, so a leader draining the list always finds us here
+            client.zadd(ScrapeResultCache._following_key(), {following: time.time()})
+            client.rpush(followers_key, member)
+            client.expire(followers_key, settings.SCRAPE_INFLIGHT_TTL)
+            if client.exists(ScrapeResultCache._inflight_key(key)):
+                return True
+            # Leader is gone. If we are still listed it never drained us.
+            if client.lrem(followers_key, 0, member) == 0:
+                return True
+            client.zrem(ScrapeResultCache._following_key(), following)
+            return False
+        except redis.RedisError as e:
+            logger.warning(f"Coalescing unavailable: {str(e)}")
+            return False
+
+    @staticmethod
+    def release(key: str) -> List[Tuple[int, int]]:
+        """
+        Give up leadership and return the (task_id, user_id) followers to fan
+        out to, minus any the orphan reaper already took
+        """
+        client = get_redis()
+        followers_key = ScrapeResultCache._followers_key(key)
+        try:
+            client.delete(ScrapeResultCache._inflight_key(key))
+            pipe = client.pipeline(transaction=True)
+            pipe.lrange(followers_key, 0, -1)
+            pipe.delete(followers_key)
+            members, _ = pipe.execute()
+            followers = [tuple(json.loads(member)) for member in members]
+            if not followers:
+                return []
+            pipe = client.pipeline(transaction=False)
+            for task_id, user_id in followers:
+                pipe.zrem(ScrapeResultCache._following_key(), json.dumps([task_id, user_id, key]))
+            owned = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Failed to release coalesced tasks: {str(e)}")
+            return []
+        return [follower for follower, removed in zip(followers, owned) if removed]
+
+    @staticmethod
+    def reap_orphans(limit: int = 500) -> List[Tuple[int, int]]:
+        """
+        Take over followers whose leader died without releasing them: its
+        inflight key is gone (past a grace period) or they have waited longer
+        than SCRAPE_INFLIGHT_TTL. Returns (task_id, user_id) to requeue.
+        """
+        client = get_redis()
+        following_key = ScrapeResultCache._following_key()
+        now = time.time()
+        orphans = []
+        try:
+            registered = client.zrangebyscore(
+                following_key, "-inf", now - FOLLOWER_GRACE_SECONDS, start=0, num=limit, withscores=True
+            )
+            for member, registered_at in registered:
+                task_id, user_id, key = json.loads(member)
+                waited_out = registered_at <= now - settings.SCRAPE_INFLIGHT_TTL
+                if not waited_out and client.exists(ScrapeResultCache._inflight_key(key)):
+                    continue
+                if client.zrem(following_key, member):
+                    client.lrem(ScrapeResultCache._followers_key(key), 0, json.dumps([task_id, user_id]))
+                    orphans.append((task_id, user_id))
+        except redis.RedisError as e:
+            logger.warning(f"Failed to reap orphaned followers: {str(e)}")
+        return orphans
@@ -1,41 +1,44 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from app.models.models import ScrapingTask, Product, PriceHistory
-from app.schemas.schemas import ScrapingTaskInput
+from app.schemas.schemas import ScrapingTaskInput, ScrapingTaskResponse
 from app.models.models import ScrapingStatus
 from typing import Optional, List
-from datetime import datetime
-from celery_app import create_scraping_task_celery
+from datetime import datetime, timezone
+from app.services.counter_service import CounterService
+from app.services.task_events import TaskEventService
+from app.services.dispatch_service import TaskDispatcher
 
 class ScrapingTaskService:
     @staticmethod
-    def create_task(db: Session, user_id: int, task_input: ScrapingTaskInput) -> ScrapingTask:
-        """Create a new scraping task"""
+    def create_task(db: Session, user_id: int, task_input: ScrapingTaskInput,
+                    schedule_id: Optional[int] = None, priority: Optional[str] = None) -> ScrapingTask:
+        """Create a new scraping task; it is held back if the user is at their concurrency quota"""
         task = ScrapingTask(
             user_id=user_id,
             platform=task_input.platform,
             task_type=task_input.task_type,
             input_data=task_input.input_data,
-            expires_at=task_input.expires_at
+            expires_at=task_input.expires_at,
+            schedule_id=schedule_id,
+            priority=priority or task_input.priority,
+            status=ScrapingStatus.pending
         )
         db.add(task)
-        db.commit()
-        db.refresh(task)
-        
-        # Send task to Celery
-        celery_task = create_scraping_task_celery.delay(
-            task_id=task.id,
-            user_id=user_id,
-            platform=task_input.platform.value,
-            task_type=task_input.task_type,
-            input_data=task_input.input_data
+        CounterService.increment(
+            db, user_id, CounterService.task_created_deltas(task_input.platform, ScrapingStatus.pending)
         )
-        
-        # Update task with Celery task ID
-        task.celery_task_id = celery_task.id
-        task.status = ScrapingStatus.pending
+        db.flush()
+        claimed = TaskDispatcher.claim(db, task)
         db.commit()
         db.refresh(task)
+        CounterService.invalidate(user_id)
+        
+        # Send task to its Celery queue
+        if claimed:
+            TaskDispatcher.send_or_release(db, task)
+            db.refresh(task)
+        TaskEventService.publish(user_id, "created", ScrapingTaskResponse.model_validate(task).model_dump(mode="json"))
         
         return task
     
@@ -47,13 +50,6 @@ class ScrapingTaskService:
             ScrapingTask.user_id == user_id
         ).first()
     
-    @staticmethod
-    def get_user_tasks(db: Session, user_id: int, skip: int = 0, limit: int = 10) -> List[ScrapingTask]:
-        """Get all tasks for a user"""
-        return db.query(ScrapingTask).filter(
-            ScrapingTask.user_id == user_id
-        ).order_by(desc(ScrapingTask.created_at)).offset(skip).limit(limit).all()
-    
     @staticmethod
     def get_tasks_count(db: Session, user_id: int) -> int:
         """Get total tasks count for a user"""
@@ -61,12 +57,48 @@ class ScrapingTaskService:
             ScrapingTask.user_id == user_id
         ).count()
     
+    @staticmethod
+    def expire_if_stale(db: Session, task_id: int) -> bool:
+        """Fail a still-pending task whose expires_at has passed; True if it expired"""
+        task = db.query(ScrapingTask).filter(ScrapingTask.id == task_id).first()
+        if not task or not task.expires_at or task.status != ScrapingStatus.pending:
+            return False
+        expires_at = task.expires_at
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if expires_at > datetime.now(timezone.utc):
+            return False
+        ScrapingTaskService.update_task_status(
+            db, task_id, ScrapingStatus.failed, "Task expired before a worker picked it up"
+        )
+        return True
+    
+    @staticmethod
+    def schedule_retry(db: Session, task_id: int, attempt: int, error_message: str) -> Optional[ScrapingTask]:
+        """Put a task back to pending while Celery waits to retry it (it keeps its Celery id and checkpoint)"""
+        task = db.query(ScrapingTask).filter(ScrapingTask.id == task_id).first()
+        if task:
+            task.retry_count = attempt
+        return ScrapingTaskService.update_task_status(db, task_id, ScrapingStatus.pending, error_message)
+    
+    @staticmethod
+    def requeue(db: Session, task_id: int) -> Optional[ScrapingTask]:
+        """Hand a task back to the dispatcher, e.g. a follower whose leader is retrying"""
+        task = db.query(ScrapingTask).filter(ScrapingTask.id == task_id).first()
+        if task:
+            task.celery_task_id = None
+        return ScrapingTaskService.update_task_status(db, task_id, ScrapingStatus.pending)
+    
     @staticmethod
     def update_task_status(db: Session, task_id: int, status: ScrapingStatus, 
                           error_message: Optional[str] = None) -> Optional[ScrapingTask]:
         """Update task status"""
-        task = db.query(ScrapingTask).filter(ScrapingTask.id == task_id).first()
+        # Lock the row so concurrent transitions move the status counters once each
+        task = db.query(ScrapingTask).filter(ScrapingTask.id == task_id).with_for_update().first()
         if task:
+            CounterService.increment(
+                db, task.user_id, CounterService.task_status_deltas(task.status, status)
+            )
             task.status = status
             if error_message:
                 task.error_message = error_message
@@ -76,6 +108,8 @@ class ScrapingTaskService:
                 task.completed_at = datetime.utcnow()
             db.commit()
             db.refresh(task)
+            CounterService.invalidate(task.user_id)
+            TaskEventService.status_changed(task)
         return task
 
 class ProductService:
@@ -96,15 +130,6 @@ class ProductService:
             Product.user_id == user_id
         ).first()
     
-    @staticmethod
-    def get_user_products(db: Session, user_id: int, platform: Optional[str] = None,
-                         skip: int = 0, limit: int = 20) -> List[Product]:
-        """Get user's products with optional platform filter"""
-        query = db.query(Product).filter(Product.user_id == user_id)
-        if platform:
-            query = query.filter(Product.platform == platform)
-        return query.order_by(desc(Product.created_at)).offset(skip).limit(limit).all()
-    
     @staticmethod
     def get_products_by_task(db: Session, task_id: int, user_id: int) -> List[Product]:
         """Get all products from a scraping task"""
@@ -145,15 +170,5 @@ class ProductService:
         db.commit()
         db.refresh(history)
         return history
-    
-    @staticmethod
-    def search_products(db: Session, user_id: int, query: str, 
-                       skip: int = 0, limit: int = 20) -> List[Product]:
-        """Search products by name or category"""
-        return db.query(Product).filter(
-            Product.user_id == user_id,
-            (Product.product_name.ilike(f"%{query}%") | 
-             Product.category.ilike(f"%{query}%"))
-        ).order_by(desc(Product.created_at)).offset(skip).limit(limit).all()
 
 # Services package
@@ -0,0 +1,176 @@
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, func, desc, literal_column, table, column, text, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.pagination import encode_offset_cursor, decode_offset_cursor
+from app.models.models import Product
+
+# Text search config of the GIN index in database/schema.sql. Fixed rather than
+# configurable: queries only hit the index when they use the indexed config,
+# so changing it means rebuilding idx_products_search under a new definition.
+SEARCH_TS_CONFIG = "simple"
+
+# SQLite: external-content FTS5 index over products, kept in sync by triggers
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        product_name, category, content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, product_name, category)
+        VALUES (new.id, new.product_name, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, product_name, category)
+        VALUES ('delete', old.id, old.product_name, old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF product_name, category ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, product_name, category)
+        VALUES ('delete', old.id, old.product_name, old.category);
+        INSERT INTO products_fts(rowid, product_name, category)
+        VALUES (new.id, new.product_name, new.category);
+    END
+    """,
+]
+
+def search_document():
+    """
+    tsvector over name and category. The GIN index is built on exactly this
+    expression, so queries must use it verbatim to be index-backed.
+    """
+    # Literals, not bind parameters: with server-side binding the planner
+    # would not recognise a parameterised expression as the indexed one
+    empty, space = literal_column("''"), literal_column("' '")
+    return func.to_tsvector(
+        literal_column(f"'{SEARCH_TS_CONFIG}'::regconfig"),
+        func.coalesce(Product.product_name, empty).op("||")(space).op("||")(func.coalesce(Product.category, empty))
+    )
+
+# Same definitions as database/schema.sql
+POSTGRESQL_SEARCH_DDL = [
+    "CREATE INDEX IF NOT EXISTS idx_products_search ON products USING GIN "
+    f"(to_tsvector('{SEARCH_TS_CONFIG}'::regconfig, coalesce(product_name, '') || ' ' || coalesce(category, '')))",
+    "CREATE INDEX IF NOT EXISTS idx_products_name_trgm ON products USING GIN (product_name gin_trgm_ops)",
+]
+
+def ensure_search_index(engine):
+    """
+    Create the search index structures for the engine's dialect if missing.
+    pg_trgm is installed by database/schema.sql, not here: CREATE EXTENSION
+    needs privileges the application role shouldn't have.
+    """
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            installed = connection.execute(text(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+            )).first()
+            if not installed:
+                raise RuntimeError("pg_trgm is not installed; apply database/schema.sql to create it")
+            for statement in POSTGRESQL_SEARCH_DDL:
+                connection.execute(text(statement))
+        elif connection.dialect.name == "sqlite":
+            exists = connection.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+            )).first()
+            for statement in SQLITE_SEARCH_DDL:
+                connection.execute(text(statement))
+            if not exists:
+                # Index rows written before the FTS table existed
+                connection.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+
+def fts5_query(query: str) -> str:
+    """Quote each term as an FTS5 prefix query, so user input can't inject FTS syntax"""
+    terms = re.findall(r"\w+", query, flags=re.UNICODE)
+    return " ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+class SearchResult:
+    """A page of ranked products with the total match count and facets"""
+
+    def __init__(self, items: List[Product], total: int, facets: Dict[str, Dict[str, int]],
+                 next_cursor: Optional[str] = None, prev_cursor: Optional[str] = None):
+        self.items = items
+        self.total = total
+        self.facets = facets
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+class ProductSearchService:
+    """Ranked product search: tsvector + pg_trgm on PostgreSQL, FTS5 on SQLite"""
+
+    @staticmethod
+    def _match(dialect: str, query: str):
+        """(filter, rank, from clause) for the dialect; lower rank sorts first"""
+        if dialect == "postgresql":
+            ts_query = func.websearch_to_tsquery(literal_column(f"'{SEARCH_TS_CONFIG}'::regconfig"), query)
+            document = search_document()
+            # Full-text hits, plus trigram similarity for typos and partial words
+            match = or_(document.op("@@")(ts_query), Product.product_name.op("%")(query))
+            rank = -(func.ts_rank_cd(document, ts_query) + func.similarity(Product.product_name, query))
+            return match, rank, Product.__table__
+
+        fts = table("products_fts", column("rowid"), column("products_fts"))
+        match = fts.c.products_fts.op("MATCH")(fts5_query(query))
+        # bm25() is negative, more negative is more relevant
+        rank = func.bm25(literal_column("products_fts"))
+        return match, rank, Product.__table__.join(fts, fts.c.rowid == Product.id)
+
+    @staticmethod
+    async def search(db: AsyncSession, user_id: int, query: str, platform: Optional[str] = None,
+                     category: Optional[str] = None, skip: int = 0, limit: int = 20,
+                     cursor: Optional[str] = None) -> SearchResult:
+        """Relevance-ranked page of the user's products matching `query`, with facets"""
+        offset = decode_offset_cursor(cursor) if cursor else skip
+        dialect = db.bind.dialect.name
+        if dialect == "sqlite" and not fts5_query(query):
+            return SearchResult([], 0, {"platform": {}, "category": {}})
+
+        match, rank, source = ProductSearchService._match(dialect, query)
+        base_filters = [Product.user_id == user_id, match]
+        filters = list(base_filters)
+        if platform:
+            filters.append(Product.platform == platform)
+        if category:
+            filters.append(Product.category == category)
+
+        result = await db.execute(
+            select(Product).select_from(source).where(*filters)
+            .order_by(rank, desc(Product.id)).offset(offset).limit(limit)
+        )
+        items = list(result.scalars())
+
+        total = (await db.execute(
+            select(func.count()).select_from(source).where(*filters)
+        )).scalar_one()
+
+        # Each facet ignores its own filter, so the client can show alternatives
+        facets = {}
+        for name, facet_column, other in (
+            ("platform", Product.platform, Product.category == category if category else None),
+            ("category", Product.category, Product.platform == platform if platform else None),
+        ):
+            facet_filters = base_filters + ([other] if other is not None else [])
+            rows = await db.execute(
+                select(facet_column, func.count()).select_from(source).where(*facet_filters)
+                .group_by(facet_column).order_by(desc(func.count())).limit(settings.SEARCH_FACET_LIMIT)
+            )
+            facets[name] = {
+                getattr(value, "value", value) or "uncategorized": count for value, count in rows
+            }
+
+        return SearchResult(
+            items,
+            total,
+            facets,
+            next_cursor=encode_offset_cursor(offset + limit) if offset + limit < total else None,
+            prev_cursor=encode_offset_cursor(max(0, offset - limit)) if offset > 0 else None,
+        )
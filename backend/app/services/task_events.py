@@ -0,0 +1,94 @@
+import json
+import logging
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+import redis
+
+from app.core.config import settings
+from app.core.redis_client import get_redis, get_async_redis
+
+logger = logging.getLogger(__name__)
+
+def channel(user_id: int) -> str:
+    """Pub/sub channel carrying every task event for one user"""
+    return f"task-events:{user_id}"
+
+def _timestamp(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+def task_payload(task) -> dict:
+    """The mutable fields of a task, as the dashboard list shows them"""
+    return {
+        "id": task.id,
+        "status": getattr(task.status, "value", task.status),
+        "results_count": task.results_count or 0,
+        "error_message": task.error_message,
+        "started_at": _timestamp(task.started_at),
+        "completed_at": _timestamp(task.completed_at),
+        "updated_at": _timestamp(task.updated_at),
+    }
+
+class TaskEventService:
+    """
+    Publishes task lifecycle and progress events for the /tasks/stream push
+    channel. Events are fire-and-forget: a Redis outage only degrades clients
+    to polling, it never fails the task.
+    """
+
+    @staticmethod
+    def publish(user_id: int, event: str, data: dict):
+        """event is 'created', 'status' or 'progress'; data always carries the task id"""
+        try:
+            get_redis().publish(channel(user_id), json.dumps({"event": event, **data}))
+        except redis.RedisError as e:
+            logger.warning(f"Failed to publish task event for user {user_id}: {str(e)}")
+
+    @staticmethod
+    def status_changed(task):
+        TaskEventService.publish(task.user_id, "status", task_payload(task))
+
+    @staticmethod
+    def progress(user_id: int, task_id: int, **progress):
+        """Incremental progress, e.g. pages_crawled=3 or products_ingested=500"""
+        TaskEventService.publish(user_id, "progress", {"id": task_id, **progress})
+
+class AsyncTaskEventService:
+    @staticmethod
+    async def publish(user_id: int, event: str, data: dict):
+        try:
+            await get_async_redis().publish(channel(user_id), json.dumps({"event": event, **data}))
+        except redis.RedisError as e:
+            logger.warning(f"Failed to publish task event for user {user_id}: {str(e)}")
+
+    @staticmethod
+    async def publish_many(user_id: int, event: str, items: List[dict]):
+        """Publish one event per item in a single pipeline round trip"""
+        try:
+            async with get_async_redis().pipeline(transaction=False) as pipe:
+                for data in items:
+                    pipe.publish(channel(user_id), json.dumps({"event": event, **data}))
+                await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Failed to publish task events for user {user_id}: {str(e)}")
+
+    @staticmethod
+    async def subscribe(user_id: int, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[dict]]:
+        """
+        Yield the user's task events as they arrive, and None whenever
+        `heartbeat` seconds pass without one (so callers can keep the
+        connection alive and notice disconnects).
+        """
+        heartbeat = heartbeat or settings.TASK_STREAM_HEARTBEAT_SECONDS
+        pubsub = get_async_redis().pubsub()
+        await pubsub.subscribe(channel(user_id))
+        try:
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat)
+                if message is None:
+                    yield None
+                elif message["type"] == "message":
+                    yield json.loads(message["data"])
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
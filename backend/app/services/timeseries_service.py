@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.core.database import dialect_insert
+from app.models.models import PriceRollup
+
+RESOLUTIONS = ("hour", "day", "week")
+
+def bucket_start(moment: datetime, resolution: str) -> datetime:
+    """Start of the UTC hour/day/ISO week containing `moment`"""
+    moment = moment.astimezone(timezone.utc)
+    if resolution == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == "day":
+        return day
+    if resolution == "week":
+        return day - timedelta(days=day.weekday())
+    raise ValueError(f"Unknown resolution: {resolution}")
+
+def _least(dialect: str, *values):
+    return func.least(*values) if dialect == "postgresql" else func.min(*values)
+
+def _greatest(dialect: str, *values):
+    return func.greatest(*values) if dialect == "postgresql" else func.max(*values)
+
+class PriceRollupService:
+    @staticmethod
+    def record(db: Session, user_id: int, snapshots: List[dict]):
+        """
+        Fold price_history snapshots into every rollup resolution with one
+        upsert, inside the caller's transaction. Each snapshot carries
+        product_id, price, sold_count, sold_count_delta and recorded_at.
+        """
+        rows = []
+        for snapshot in snapshots:
+            price = snapshot["price"]
+            for resolution in RESOLUTIONS:
+                rows.append({
+                    "product_id": snapshot["product_id"],
+                    "user_id": user_id,
+                    "resolution": resolution,
+                    "bucket_start": bucket_start(snapshot["recorded_at"], resolution),
+                    "min_price": price,
+                    "max_price": price,
+                    "price_sum": price or 0,
+                    "price_samples": 1 if price is not None else 0,
+                    "last_price": price,
+                    "last_sold_count": snapshot["sold_count"],
+                    "sold_count_delta": snapshot["sold_count_delta"],
+                    "samples": 1,
+                    "last_recorded_at": snapshot["recorded_at"],
+                })
+        if not rows:
+            return
+
+        dialect = db.bind.dialect.name
+        stmt = dialect_insert(db, PriceRollup).values(rows)
+        excluded = stmt.excluded
+        # min()/max() with several arguments are NULL-propagating in SQLite, hence the coalesces
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["product_id", "resolution", "bucket_start"],
+            set_={
+                "min_price": _least(
+                    dialect,
+                    func.coalesce(PriceRollup.min_price, excluded.min_price),
+                    func.coalesce(excluded.min_price, PriceRollup.min_price)
+                ),
+                "max_price": _greatest(
+                    dialect,
+                    func.coalesce(PriceRollup.max_price, excluded.max_price),
+                    func.coalesce(excluded.max_price, PriceRollup.max_price)
+                ),
+                "price_sum": PriceRollup.price_sum + excluded.price_sum,
+                "price_samples": PriceRollup.price_samples + excluded.price_samples,
+                "last_price": func.coalesce(excluded.last_price, PriceRollup.last_price),
+                "last_sold_count": func.coalesce(excluded.last_sold_count, PriceRollup.last_sold_count),
+                "sold_count_delta": PriceRollup.sold_count_delta + excluded.sold_count_delta,
+                "samples": PriceRollup.samples + excluded.samples,
+                "last_recorded_at": excluded.last_recorded_at,
+            }
+        )
+        db.execute(stmt)
+
+    @staticmethod
+    def ensure_partitions(db: Session, months_ahead: int = 1) -> List[str]:
+        """
+        Create monthly price_history partitions for this month and the next
+        `months_ahead` (PostgreSQL with the partitioned schema only).
+        """
+        if db.bind.dialect.name != "postgresql":
+            return []
+        partitioned = db.execute(text(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'price_history'::regclass"
+        )).first()
+        if not partitioned:
+            return []
+
+        month = datetime.now(timezone.utc).date().replace(day=1)
+        created = []
+        for _ in range(months_ahead + 1):
+            db.execute(text("SELECT create_price_history_partition(:month)"), {"month": month})
+            created.append(f"price_history_{month:%Y_%m}")
+            month = (month + timedelta(days=32)).replace(day=1)
+        db.commit()
+        return created
@@ -0,0 +1,190 @@
+import logging
+import math
+import time
+from typing import Dict, List, Optional
+
+import redis
+
+from app.core.config import settings
+from app.core.redis_client import get_redis, get_async_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "trend"
+EPOCH_KEY = f"{KEY_PREFIX}:epoch"
+
+# Leaderboard kinds: product velocity, price drops, and category/shop velocity
+VELOCITY = "velocity"
+PRICE_DROP = "price_drop"
+
+def leaderboard_key(user_id: int, kind: str, scope: str = "all", value: Optional[str] = None) -> str:
+    """trend:{user}:{kind}:all, trend:{user}:{kind}:category:{name}, trend:{user}:velocity:category_totals, ..."""
+    if scope == "all" or value is None:
+        return f"{KEY_PREFIX}:{user_id}:{kind}:{scope}"
+    return f"{KEY_PREFIX}:{user_id}:{kind}:{scope}:{value}"
+
+def ranks_key(key: str) -> str:
+    """Hash of each member's rank at the last snapshot, for rank movement"""
+    return f"{key}:ranks"
+
+def _half_life_seconds() -> float:
+    return settings.TREND_HALF_LIFE_HOURS * 3600
+
+def decay_weight(now: float, epoch: float) -> float:
+    """
+    Scores are stored relative to `epoch` and grow by 2x per half-life, so
+    older increments decay relative to new ones without rewriting the set.
+    """
+    return 2 ** ((now - epoch) / _half_life_seconds())
+
+def velocity_per_hour(score: float, now: float, epoch: float) -> float:
+    """Decayed units sold converted to an hourly sales rate"""
+    decayed_units = score / decay_weight(now, epoch)
+    return decayed_units * math.log(2) / settings.TREND_HALF_LIFE_HOURS
+
+class TrendService:
+    """
+    Incremental trending leaderboards in Redis sorted sets, per user and per
+    category/shop. Ingestion feeds sold_count and price deltas after each
+    committed batch; nothing rescans products. Redis errors only cost
+    analytics freshness, never the ingestion itself.
+    """
+
+    @staticmethod
+    def _epoch(client) -> float:
+        client.set(EPOCH_KEY, time.time(), nx=True)
+        return float(client.get(EPOCH_KEY))
+
+    @staticmethod
+    def record_batch(user_id: int, rows: List[dict], upserted: List[dict]):
+        """Update leaderboards from one ingested batch (rows as prepared, upserted with previous values)"""
+        by_external_id = {row["external_id"]: row for row in rows}
+        try:
+            client = get_redis()
+            now = time.time()
+            weight = decay_weight(now, TrendService._epoch(client))
+            pipe = client.pipeline(transaction=False)
+            touched = set()
+
+            for product in upserted:
+                if product["inserted"]:
+                    continue
+                row = by_external_id.get(product["external_id"], {})
+                scopes = [("all", None)]
+                if row.get("category"):
+                    scopes.append(("category", row["category"]))
+                if row.get("shop_name"):
+                    scopes.append(("shop", row["shop_name"]))
+
+                sold_delta = TrendService._sold_delta(product)
+                if sold_delta:
+                    for scope, value in scopes:
+                        key = leaderboard_key(user_id, VELOCITY, scope, value)
+                        pipe.zincrby(key, sold_delta * weight, product["id"])
+                        touched.add(key)
+                    for scope, value in scopes[1:]:
+                        key = leaderboard_key(user_id, VELOCITY, f"{scope}_totals")
+                        pipe.zincrby(key, sold_delta * weight, value)
+                        touched.add(key)
+
+                drop = TrendService._price_drop(product)
+                if drop is not None:
+                    for scope, value in scopes:
+                        key = leaderboard_key(user_id, PRICE_DROP, scope, value)
+                        if drop > 0:
+                            pipe.zadd(key, {product["id"]: drop})
+                        else:
+                            # Price recovered: no longer a drop worth showing
+                            pipe.zrem(key, product["id"])
+                        touched.add(key)
+
+            for key in touched:
+                pipe.expire(key, settings.TREND_TTL_SECONDS)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Failed to update trend leaderboards: {str(e)}")
+
+    @staticmethod
+    def _sold_delta(product: dict) -> float:
+        previous, current = product.get("previous_sold_count"), product.get("sold_count")
+        if previous is None or current is None:
+            return 0
+        return max(0, current - previous)
+
+    @staticmethod
+    def _price_drop(product: dict) -> Optional[float]:
+        """Fractional drop vs the previous price (negative for rises), None if unknown/unchanged"""
+        previous, current = product.get("previous_price"), product.get("price")
+        if not previous or current is None or previous == current:
+            return None
+        return float((previous - current) / previous)
+
+    @staticmethod
+    def refresh() -> dict:
+        """
+        Periodic maintenance (Celery Beat): snapshot ranks for rank movement,
+        then rebase velocity scores onto a new epoch so they never overflow.
+        Increments landing mid-rebase are weighted for the old epoch; with
+        hourly runs that skew is a fraction of a percent.
+        """
+        client = get_redis()
+        now = time.time()
+        epoch = TrendService._epoch(client)
+        factor = 1 / decay_weight(now, epoch)
+        rebased = 0
+
+        for key in client.scan_iter(match=f"{KEY_PREFIX}:*:{VELOCITY}:*", count=500):
+            if key.endswith(":ranks"):
+                continue
+            TrendService._snapshot_ranks(client, key)
+            client.zunionstore(key, {key: factor})
+            # Drop members whose decayed sales have faded to nothing
+            client.zremrangebyscore(key, "-inf", settings.TREND_MIN_SCORE)
+            rebased += 1
+
+        for key in client.scan_iter(match=f"{KEY_PREFIX}:*:{PRICE_DROP}:*", count=500):
+            if not key.endswith(":ranks"):
+                TrendService._snapshot_ranks(client, key)
+
+        client.set(EPOCH_KEY, now)
+        return {"rebased": rebased}
+
+    @staticmethod
+    def _snapshot_ranks(client, key: str):
+        members = client.zrevrange(key, 0, settings.TREND_RANKED_MEMBERS - 1)
+        pipe = client.pipeline(transaction=True)
+        pipe.delete(ranks_key(key))
+        if members:
+            pipe.hset(ranks_key(key), mapping={member: rank for rank, member in enumerate(members, 1)})
+            pipe.expire(ranks_key(key), settings.TREND_TTL_SECONDS)
+        pipe.execute()
+
+class AsyncTrendService:
+    """Constant-time reads of the materialized leaderboards for the API"""
+
+    @staticmethod
+    async def top(user_id: int, kind: str, scope: str = "all", value: Optional[str] = None,
+                  limit: int = 20) -> List[Dict]:
+        """Top members of a leaderboard with score, rank and rank change since the last snapshot"""
+        client = get_async_redis()
+        key = leaderboard_key(user_id, kind, scope, value)
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.zrevrange(key, 0, limit - 1, withscores=True)
+            pipe.get(EPOCH_KEY)
+            entries, epoch = await pipe.execute()
+        if not entries:
+            return []
+
+        previous_ranks = await client.hmget(ranks_key(key), [member for member, _ in entries])
+        now = time.time()
+        epoch = float(epoch) if epoch else now
+        results = []
+        for rank, ((member, score), previous) in enumerate(zip(entries, previous_ranks), 1):
+            results.append({
+                "member": member,
+                "score": velocity_per_hour(score, now, epoch) if kind == VELOCITY else score,
+                "rank": rank,
+                # Positive means the member climbed; None for new entries
+                "rank_change": int(previous) - rank if previous else None,
+            })
+        return results
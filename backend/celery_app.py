@@ -1,6 +1,12 @@
+import logging
+import random
+from contextlib import closing
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown, beat_init
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 celery_app = Celery(
     "scrapper",
     broker=settings.CELERY_BROKER_URL,
@@ -16,94 +22,326 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=30 * 60,  # 30 minutes hard limit
     task_soft_time_limit=25 * 60,  # 25 minutes soft limit
+    # Scraping tasks are routed per call to scrape.{platform}.{priority};
+    # one task per process at a time so a bulk backlog can't sit prefetched
+    # in front of interactive work
+    worker_prefetch_multiplier=1,
+    beat_schedule={
+        "ensure-price-history-partitions": {
+            "task": "maintenance.ensure_price_history_partitions",
+            "schedule": 24 * 3600,
+        },
+        "purge-expired-exports": {
+            "task": "exports.purge_expired",
+            "schedule": 3600,
+        },
+        "dispatch-due-monitors": {
+            "task": "monitors.dispatch_due",
+            "schedule": settings.MONITOR_DISPATCH_SECONDS,
+        },
+        "dispatch-held-tasks": {
+            "task": "scheduler.dispatch_pending",
+            "schedule": settings.SCHEDULER_DISPATCH_SECONDS,
+        },
+        "refresh-trend-leaderboards": {
+            "task": "analytics.refresh_trends",
+            "schedule": settings.TREND_REFRESH_SECONDS,
+        },
+    },
 )
 
+@worker_process_init.connect
+def configure_worker_database(**kwargs):
+    """Give each forked worker process its own, worker-sized connection pool"""
+    from app.core.database import configure_database
+    configure_database("worker")
+
+@beat_init.connect
+def configure_beat_database(**kwargs):
+    """Beat only dispatches; keep its pool minimal"""
+    from app.core.database import configure_database
+    configure_database("beat")
+
+@worker_process_init.connect
+def warm_browser_pool(**kwargs):
+    """Launch the per-process browser pool before the first task arrives"""
+    if settings.BROWSER_POOL_PREWARM:
+        from workers.scrapers.browser_pool import get_browser_pool
+        get_browser_pool().start()
+
+@worker_process_shutdown.connect
+def close_browser_pool(**kwargs):
+    """Stop pooled browsers and the Playwright driver with the worker process"""
+    from workers.scrapers.browser_pool import shutdown_browser_pool
+    shutdown_browser_pool()
+
+@worker_process_shutdown.connect
+def log_pool_metrics(**kwargs):
+    """Report this process's connection pool usage for fleet sizing"""
+    from app.core.database import engine
+    logger.info(f"Database pool metrics: {engine.pool_metrics.snapshot(engine.pool)}")
+
+def _complete(db, task_id: int, ingestion):
+    """Mark a task completed and feed its change rate to its monitor schedule"""
+    from app.services.scraping_service import ScrapingTaskService
+    from app.models.models import ScrapingStatus
+    
+    task = ScrapingTaskService.update_task_status(db, task_id, ScrapingStatus.completed)
+    if task is not None and task.schedule_id:
+        from app.services.monitor_service import MonitorScheduleService
+        MonitorScheduleService.record_run(db, task.schedule_id, ingestion)
+
+def _ingest_and_complete(db, task_id: int, user_id: int, platform: str, products):
+    """Persist products for one task and mark it completed"""
+    from app.services.ingestion_service import ProductIngestionService
+    
+    ingestion = ProductIngestionService.ingest(db, task_id, user_id, platform, products)
+    _complete(db, task_id, ingestion)
+    return ingestion
+
+def _scraper(task_id: int, user_id: int, platform: str):
+    """The platform scraper for one task, publishing crawl progress"""
+    from workers.scrapers.shopee_scraper import ShopeeScraper
+    from workers.scrapers.tiktok_scraper import TikTokScraper
+    from app.services.task_events import TaskEventService
+    
+    if platform == "shopee":
+        scraper = ShopeeScraper()
+    elif platform == "tiktok_shop":
+        scraper = TikTokScraper()
+    else:
+        raise ValueError(f"Unknown platform: {platform}")
+    scraper.on_progress = lambda progress: TaskEventService.progress(user_id, task_id, **progress)
+    return scraper
+
+def _retry_countdown(retries: int) -> float:
+    """Exponential backoff with jitter: base * 2^retries, capped, scaled by 0.5-1"""
+    delay = min(settings.SCRAPE_RETRY_BACKOFF_SECONDS * 2 ** retries, settings.SCRAPE_RETRY_BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1)
+
 @celery_app.task(bind=True, name="scraper.create_scraping_task")
 def create_scraping_task_celery(self, task_id: int, user_id: int, platform: str, 
                                 task_type: str, input_data: dict):
     """
-    Celery task to handle scraping requests
+    Celery task to handle scraping requests.
+    
+    Identical requests (same platform, task type and normalized input) are
+    served from the result cache, or coalesced onto the task already
+    scraping them, which then fans its products out to every follower.
+    
+    Interrupted crawls (browser errors, the soft time limit, database or
+    Redis outages) are retried with exponential backoff and resume from
+    the checkpoint committed with the last ingested batch. Retries scrape
+    for themselves, bypassing the cache and coalescing.
     """
+    from celery.exceptions import SoftTimeLimitExceeded
+    from redis import RedisError
+    from sqlalchemy.exc import OperationalError
     from app.core.database import SessionLocal
     from app.services.scraping_service import ScrapingTaskService
-    from app.models.models import ScrapingStatus, Product
+    from app.services.ingestion_service import IngestionSink, ProductIngestionService
+    from app.services.result_cache import ScrapeResultCache
+    from app.models.models import ScrapingStatus
+    from workers.scrapers.base_scraper import ScrapeInterrupted
     
     db = SessionLocal()
+    cache_key = ScrapeResultCache.cache_key(platform, task_type, input_data)
+    leader = False
     try:
+        if ScrapingTaskService.expire_if_stale(db, task_id):
+            return {"status": "expired", "task_id": task_id}
+        
         # Update task status to running
-        ScrapingTaskService.update_task_status(
+        task = ScrapingTaskService.update_task_status(
             db, task_id, ScrapingStatus.running
         )
+        checkpoint = task.checkpoint if task is not None else None
+        resuming = bool(checkpoint) or self.request.retries > 0
         
-        # Import scraper based on platform
-        from workers.scrapers.shopee_scraper import ShopeeScraper
-        from workers.scrapers.tiktok_scraper import TikTokScraper
+        batches = None
+        if not resuming:
+            batches = None if input_data.get("fresh") else ScrapeResultCache.get(cache_key)
+            if batches is None:
+                leader = ScrapeResultCache.claim(cache_key, task_id)
+                if not leader and ScrapeResultCache.follow(cache_key, task_id, user_id):
+                    # The leader ingests our products and completes this task
+                    return {"status": "coalesced", "task_id": task_id}
+                if not leader:
+                    batches = ScrapeResultCache.get(cache_key)
+        cached = batches is not None
         
-        # Route to appropriate scraper
-        if platform == "shopee":
-            scraper = ShopeeScraper()
-            results = scraper.scrape(input_data, task_type)
-        elif platform == "tiktok_shop":
-            scraper = TikTokScraper()
-            results = scraper.scrape(input_data, task_type)
+        # Store results in database as they arrive, one upsert and commit per
+        # batch: memory stays flat and a crawl that fails or hits the time
+        # limit keeps what it already flushed
+        sink = IngestionSink(db, task_id, user_id, platform)
+        if cached:
+            for batch in batches:
+                sink.write(batch)
         else:
-            raise ValueError(f"Unknown platform: {platform}")
+            scraper = _scraper(task_id, user_id, platform)
+            scraper.resume(checkpoint)
+            # closing(): a failed write stops the crawl and returns its browser context at once
+            with closing(scraper.iter_batches(input_data, task_type)) as scraped:
+                for batch in scraped:
+                    sink.write(batch, checkpoint=scraper.checkpoint())
+                    if not resuming:
+                        ScrapeResultCache.stage(cache_key, task_type, task_id, batch)
+            if scraper.error is not None:
+                raise ScrapeInterrupted(str(scraper.error))
+            # Only a complete, uninterrupted crawl becomes the cached result; an
+            # empty one (usually a soft failure) stages nothing and isn't pinned
+            if not resuming:
+                ScrapeResultCache.publish(cache_key, task_type, task_id)
+        ingestion = sink.result
+        _complete(db, task_id, ingestion)
         
-        # Store results in database
-        product_count = 0
-        for product_data in results:
-            product_data["user_id"] = user_id
-            product_data["task_id"] = task_id
-            product_data["platform"] = platform
-            
-            # Check if product already exists
-            existing = db.query(Product).filter(
-                Product.platform == platform,
-                Product.external_id == product_data.get("external_id"),
-                Product.user_id == user_id
-            ).first()
-            
-            if existing:
-                # Update existing product
-                for key, value in product_data.items():
-                    setattr(existing, key, value)
-            else:
-                # Create new product
-                product = Product(**product_data)
-                db.add(product)
-            
-            product_count += 1
-            db.commit()
-        
-        # Update task with results count
-        task = db.query(ScrapingTaskService.__class__).filter(
-            ScrapingTaskService.__class__.id == task_id
-        ).first()
-        
-        # Complete task
-        ScrapingTaskService.update_task_status(
-            db, task_id, ScrapingStatus.completed
-        )
-        task = db.query(ScrapingTaskService.__class__).filter(
-            ScrapingTaskService.__class__.id == task_id
-        ).first()
-        task.results_count = product_count
-        db.commit()
+        if leader:
+            leader = False
+            for follower_task_id, follower_user_id in ScrapeResultCache.release(cache_key):
+                try:
+                    _ingest_and_complete(
+                        db, follower_task_id, follower_user_id, platform,
+                        ProductIngestionService.products_by_id(db, ingestion.product_ids)
+                    )
+                except Exception as e:
+                    ScrapingTaskService.update_task_status(
+                        db, follower_task_id, ScrapingStatus.failed, str(e)
+                    )
         
         return {
             "status": "completed",
             "task_id": task_id,
-            "products_scraped": product_count
+            "cached": cached,
+            "products_scraped": ingestion.total,
+            "products_inserted": ingestion.inserted,
+            "products_updated": ingestion.updated,
+            "price_snapshots": ingestion.snapshots
         }
     
     except Exception as e:
-        ScrapingTaskService.update_task_status(
-            db, task_id, ScrapingStatus.failed, str(e)
+        # Batches already committed stay; results_count says how many
+        db.rollback()
+        ScrapeResultCache.discard(cache_key, task_id)
+        retrying = (
+            isinstance(e, (ScrapeInterrupted, SoftTimeLimitExceeded, OperationalError, RedisError))
+            and self.request.retries < settings.SCRAPE_MAX_RETRIES
         )
+        if retrying:
+            attempt = self.request.retries + 1
+            countdown = _retry_countdown(self.request.retries)
+            ScrapingTaskService.schedule_retry(
+                db, task_id, attempt,
+                f"Attempt {attempt} interrupted, retrying in {countdown:.0f}s: {str(e)}"
+            )
+        else:
+            ScrapingTaskService.update_task_status(
+                db, task_id, ScrapingStatus.failed, str(e)
+            )
+        if leader:
+            for follower_task_id, _ in ScrapeResultCache.release(cache_key):
+                if retrying:
+                    # Their own run starts fresh; the leader's retry may take a while
+                    ScrapingTaskService.requeue(db, follower_task_id)
+                else:
+                    ScrapingTaskService.update_task_status(
+                        db, follower_task_id, ScrapingStatus.failed, str(e)
+                    )
+        if retrying:
+            raise self.retry(exc=e, countdown=countdown, max_retries=settings.SCRAPE_MAX_RETRIES)
         return {
             "status": "failed",
             "task_id": task_id,
             "error": str(e)
         }
+    finally:
+        _release_held_tasks(db, user_id)
+        db.close()
+
+def _release_held_tasks(db, user_id: int):
+    """A slot just freed up: hand the user's next held task(s) to Celery now rather than on the next Beat pass"""
+    from app.services.dispatch_service import TaskDispatcher
+    
+    try:
+        db.rollback()
+        TaskDispatcher.dispatch_pending(db, user_ids=[user_id])
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to release held tasks for user {user_id}: {str(e)}")
+
+@celery_app.task(name="maintenance.ensure_price_history_partitions")
+def ensure_price_history_partitions_celery():
+    """Create this and next month's price_history partitions ahead of time"""
+    from app.core.database import SessionLocal
+    from app.services.timeseries_service import PriceRollupService
+    
+    db = SessionLocal()
+    try:
+        return {"partitions": PriceRollupService.ensure_partitions(db)}
+    finally:
+        db.close()
+
+@celery_app.task(name="analytics.refresh_trends")
+def refresh_trends_celery():
+    """Snapshot leaderboard ranks and rebase decayed velocity scores"""
+    from app.services.trend_service import TrendService
+    
+    return TrendService.refresh()
+
+@celery_app.task(name="exports.run_export")
+def run_export_celery(job_id: int):
+    """Write a background export job's file"""
+    from app.core.database import SessionLocal
+    from app.services.export_service import ExportService
+    
+    db = SessionLocal()
+    try:
+        job = ExportService.run_job(db, job_id)
+        if job is None:
+            return {"status": "missing", "job_id": job_id}
+        return {"status": job.status.value, "job_id": job_id, "rows": job.row_count}
+    finally:
+        db.close()
+
+@celery_app.task(name="exports.purge_expired")
+def purge_expired_exports_celery():
+    """Delete export files past their expiry"""
+    from app.core.database import SessionLocal
+    from app.services.export_service import ExportService
+    
+    db = SessionLocal()
+    try:
+        return {"purged": ExportService.purge_expired(db)}
+    finally:
+        db.close()
+
+@celery_app.task(name="monitors.dispatch_due")
+def dispatch_due_monitors_celery():
+    """Turn due monitor schedules into scraping tasks"""
+    from app.core.database import SessionLocal
+    from app.services.monitor_service import MonitorScheduleService
+    
+    db = SessionLocal()
+    try:
+        return MonitorScheduleService.dispatch_due(db)
+    finally:
+        db.close()
+
+@celery_app.task(name="scheduler.dispatch_pending")
+def dispatch_pending_celery():
+    """
+    Fair-share pass handing held tasks to Celery as users' quota frees up,
+    after requeueing coalesced followers whose leader died without fanning out
+    """
+    from app.core.database import SessionLocal
+    from app.services.dispatch_service import TaskDispatcher
+    from app.services.result_cache import ScrapeResultCache
+    from app.services.scraping_service import ScrapingTaskService
+    
+    db = SessionLocal()
+    try:
+        orphans = ScrapeResultCache.reap_orphans()
+        for follower_task_id, _ in orphans:
+            ScrapingTaskService.requeue(db, follower_task_id)
+        return {**TaskDispatcher.dispatch_pending(db), "requeued_followers": len(orphans)}
     finally:
         db.close()
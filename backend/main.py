@@ -2,11 +2,13 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from app.core.config import settings
-from app.routers import tasks, products, auth
-from app.core.database import Base, engine
+from app.routers import tasks, products, auth, analytics, exports, monitors
+from app.core.database import Base, engine, pool_metrics
+from app.services.search_service import ensure_search_index
 
 # Create tables (in production, use Alembic migrations)
 Base.metadata.create_all(bind=engine)
+ensure_search_index(engine)
 
 # Create FastAPI app
 app = FastAPI(
@@ -30,6 +32,9 @@ app.add_middleware(
 app.include_router(auth.router)
 app.include_router(tasks.router)
 app.include_router(products.router)
+app.include_router(analytics.router)
+app.include_router(exports.router)
+app.include_router(monitors.router)
 
 @app.get("/health", tags=["Health"])
 async def health_check():
@@ -39,6 +44,11 @@ async def health_check():
         content={"status": "healthy", "service": "Scrapper API"}
     )
 
+@app.get("/health/db", tags=["Health"])
+async def database_pool_health():
+    """Connection pool gauges and counters for this API process"""
+    return {"status": "healthy", "pools": pool_metrics()}
+
 @app.get("/", tags=["Root"])
 async def root():
     """Root endpoint"""
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import uuid
+
+# Settings and engines are built at import time: point them at a throwaway
+# SQLite file and in-process rate limiting / proxy state first
+_db_dir = tempfile.mkdtemp(prefix="scrapper-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/test.db"
+os.environ["EXPORT_DIR"] = os.path.join(_db_dir, "exports")
+os.environ["RATE_LIMIT_BACKEND"] = "memory"
+os.environ["PROXY_STATE_BACKEND"] = "memory"
+
+import fakeredis
+import pytest
+
+from app.core import redis_client
+from app.core.database import Base, engine, SessionLocal
+from app.models.models import User, ScrapingTask, ScrapingPlatform, ScrapingStatus
+from app.services.search_service import ensure_search_index
+
+@pytest.fixture(autouse=True)
+def redis():
+    """A fresh in-memory Redis behind get_redis() for every test"""
+    client = fakeredis.FakeRedis(decode_responses=True)
+    redis_client._client = client
+    yield client
+    redis_client._client = None
+
+@pytest.fixture
+def db():
+    """A session on freshly created tables; the database file is removed afterwards"""
+    Base.metadata.create_all(bind=engine)
+    ensure_search_index(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+        os.remove(engine.url.database)
+
+@pytest.fixture
+def make_user(db):
+    def make(name: str = "demo") -> User:
+        user = User(email=f"{name}@scrapper.test", username=name, password_hash="x")
+        db.add(user)
+        db.commit()
+        return user
+    return make
+
+@pytest.fixture
+def make_task(db):
+    def make(user: User, task_type: str = "keyword_search", input_data: dict = None,
+             platform: ScrapingPlatform = ScrapingPlatform.shopee) -> ScrapingTask:
+        task = ScrapingTask(
+            user_id=user.id,
+            platform=platform,
+            task_type=task_type,
+            input_data=input_data or {"keyword": "sepatu"},
+            status=ScrapingStatus.pending,
+            # Already handed to Celery, so the dispatcher doesn't try to send it
+            celery_task_id=str(uuid.uuid4())
+        )
+        db.add(task)
+        db.commit()
+        return task
+    return make
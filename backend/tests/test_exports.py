@@ -0,0 +1,79 @@
+import asyncio
+import csv
+import io
+
+from app.core.database import AsyncSessionLocal
+from app.models.models import ExportJob, ScrapingStatus
+from app.services import export_service
+from app.services.export_service import AsyncExportService, ExportService
+from app.services.ingestion_service import ProductIngestionService
+from celery_app import run_export_celery
+
+def create_job(user, dataset: str = "products", filters: dict = None) -> ExportJob:
+    async def create():
+        async with AsyncSessionLocal() as db:
+            return await AsyncExportService.create_job(db, user.id, dataset, "csv", filters or {})
+    return asyncio.run(create())
+
+def read_csv(path: str) -> list:
+    with open(path, newline="") as export_file:
+        return list(csv.DictReader(io.StringIO(export_file.read())))
+
+def ingest(db, task, *external_ids):
+    ProductIngestionService.ingest_batch(db, task.id, task.user_id, "shopee", [
+        {"external_id": external_id, "product_name": f"Product {external_id}", "price": 100}
+        for external_id in external_ids
+    ])
+
+def test_job_is_committed_before_the_worker_can_pick_it_up(db, make_user, make_task, monkeypatch):
+    user = make_user()
+    ingest(db, make_task(user), "1", "2")
+    sent = []
+
+    def apply_async(kwargs, task_id):
+        # A worker that runs immediately, on its own connection
+        sent.append((task_id, run_export_celery(**kwargs)))
+
+    monkeypatch.setattr(export_service.run_export_celery, "apply_async", apply_async)
+
+    job = create_job(user)
+
+    [(task_id, result)] = sent
+    assert result == {"status": "completed", "job_id": job.id, "rows": 2}
+    assert job.celery_task_id == task_id
+    db.expire_all()
+    stored = db.get(ExportJob, job.id)
+    assert stored.status == ScrapingStatus.completed
+    assert [row["external_id"] for row in read_csv(stored.file_path)] == ["1", "2"]
+
+def test_broker_error_fails_the_job(db, make_user, monkeypatch):
+    def apply_async(kwargs, task_id):
+        raise ConnectionError("broker unreachable")
+
+    monkeypatch.setattr(export_service.run_export_celery, "apply_async", apply_async)
+
+    job = create_job(make_user())
+
+    db.expire_all()
+    stored = db.get(ExportJob, job.id)
+    assert stored.status == ScrapingStatus.failed
+    assert "broker unreachable" in stored.error_message
+    assert stored.celery_task_id is None
+
+def test_task_results_export_is_scoped_to_the_task(db, make_user, make_task):
+    user = make_user()
+    first, second = make_task(user), make_task(user)
+    ingest(db, first, "1", "2")
+    ingest(db, second, "3")
+    job = ExportJob(user_id=user.id, dataset="task-results", format="csv", filters={"task_id": second.id})
+    db.add(job)
+    db.commit()
+
+    job = ExportService.run_job(db, job.id)
+
+    assert job.status == ScrapingStatus.completed
+    assert job.row_count == 1
+    assert [row["external_id"] for row in read_csv(job.file_path)] == ["3"]
+
+def test_missing_job(db):
+    assert ExportService.run_job(db, 404) is None
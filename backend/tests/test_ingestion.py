@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+from app.models.models import Product, PriceHistory, ScrapingTask
+from app.services.ingestion_service import ProductIngestionService
+
+def product(external_id: str, **fields) -> dict:
+    return {"external_id": external_id, "product_name": f"Product {external_id}", **fields}
+
+def ingest(db, task, products):
+    return ProductIngestionService.ingest_batch(db, task.id, task.user_id, "shopee", products)
+
+def test_inserts_then_updates_with_snapshots_for_changes_only(db, make_user, make_task):
+    task = make_task(make_user())
+
+    first = ingest(db, task, [product("1", price=100), product("2", price=200)])
+    assert (first.inserted, first.updated, first.snapshots) == (2, 0, 2)
+
+    second = ingest(db, task, [product("1", price=100), product("2", price=150), product("3", price=50)])
+    assert (second.inserted, second.updated, second.snapshots) == (1, 2, 2)
+
+    assert db.query(Product).count() == 3
+    history = db.query(PriceHistory).join(Product).filter(Product.external_id == "2").all()
+    assert sorted(row.price for row in history) == [Decimal("150"), Decimal("200")]
+    db.refresh(task)
+    assert task.results_count == 5
+
+def test_partial_rows_keep_columns_they_do_not_supply(db, make_user, make_task):
+    task = make_task(make_user())
+    ingest(db, task, [product("1", price=100, description="desc", category="Shoes")])
+
+    # One row from the API (no description), one enriched row in the same batch
+    result = ingest(db, task, [product("1", price=90), product("2", price=10, description="other")])
+
+    assert (result.inserted, result.updated) == (1, 1)
+    stored = db.query(Product).filter(Product.external_id == "1").one()
+    assert stored.price == Decimal("90")
+    assert stored.description == "desc"
+    assert stored.category == "Shoes"
+
+def test_explicit_none_still_overwrites(db, make_user, make_task):
+    task = make_task(make_user())
+    ingest(db, task, [product("1", price=100, discount_percentage=20)])
+
+    ingest(db, task, [product("1", price=100, discount_percentage=None)])
+
+    assert db.query(Product).one().discount_percentage is None
+
+def test_duplicates_within_a_batch_keep_the_last(db, make_user, make_task):
+    task = make_task(make_user())
+
+    result = ingest(db, task, [product("1", price=100), product("1", price=80), {"product_name": "no id"}])
+
+    assert (result.inserted, result.updated) == (1, 0)
+    assert db.query(Product).one().price == Decimal("80")
+
+def test_checkpoint_commits_with_the_batch(db, make_user, make_task):
+    task = make_task(make_user())
+    checkpoint = {"pages": ["page-1"], "last_external_id": "1"}
+
+    ProductIngestionService.ingest_batch(
+        db, task.id, task.user_id, "shopee", [product("1", price=1)], checkpoint=checkpoint
+    )
+
+    db.expire_all()
+    assert db.get(ScrapingTask, task.id).checkpoint == checkpoint
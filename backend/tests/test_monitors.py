@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.models.models import MonitorSchedule, ScrapingPlatform
+from app.services.ingestion_service import IngestionResult
+from app.services.monitor_service import MonitorScheduleService
+
+@pytest.fixture
+def schedule(db, make_user):
+    schedule = MonitorSchedule(
+        user_id=make_user().id,
+        platform=ScrapingPlatform.shopee,
+        task_type="shop_monitor",
+        target="12345",
+        options={},
+        interval_minutes=720,
+        current_interval_minutes=720,
+        next_run_at=datetime.now(timezone.utc),
+        last_run_at=datetime.now(timezone.utc)
+    )
+    db.add(schedule)
+    db.commit()
+    return schedule
+
+def record(db, schedule, inserted: int, updated: int, changed: int):
+    # Every inserted product writes a snapshot, as do changed existing ones
+    MonitorScheduleService.record_run(db, schedule.id, IngestionResult(inserted, updated, inserted + changed))
+    db.refresh(schedule)
+
+def test_first_run_does_not_adapt_the_interval(db, schedule):
+    record(db, schedule, inserted=40, updated=0, changed=0)
+
+    assert schedule.change_rate is None
+    assert schedule.current_interval_minutes == 720
+
+def test_new_products_do_not_count_as_change(db, schedule):
+    record(db, schedule, inserted=30, updated=10, changed=1)
+
+    assert schedule.change_rate == pytest.approx(0.1)
+    # Between the slow and fast thresholds: stays at the requested interval
+    assert schedule.current_interval_minutes == 720
+
+def test_fast_moving_listing_runs_more_often(db, schedule):
+    record(db, schedule, inserted=0, updated=10, changed=5)
+
+    assert schedule.current_interval_minutes == 360
+
+def test_static_listing_runs_less_often(db, schedule):
+    record(db, schedule, inserted=0, updated=50, changed=0)
+
+    assert schedule.current_interval_minutes == 1080
@@ -0,0 +1,139 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Set
+
+from workers.scrapers.base_scraper import ScrapeInterrupted
+from workers.scrapers.shopee_scraper import ShopeeScraper
+
+SEARCH_URL = "https://shopee.co.id/search?keyword=sepatu"
+URLS = [SEARCH_URL, f"{SEARCH_URL}&page=1", f"{SEARCH_URL}&page=2"]
+INPUT = {"keyword": "sepatu", "max_pages": 3, "mode": "dom"}
+
+class FakeResponse:
+    def __init__(self, status: int):
+        self.status = status
+
+class FakePage:
+    def __init__(self, context: "FakeContext"):
+        self.context = context
+        self.url = "about:blank"
+
+    def set_default_timeout(self, timeout):
+        pass
+
+    def on(self, event, callback):
+        pass
+
+    async def goto(self, url, **kwargs):
+        self.context.visited.append(url)
+        if url in self.context.unreachable:
+            raise Exception("net::ERR_CONNECTION_RESET")
+        self.url = url
+        return FakeResponse(self.context.statuses.get(url, 200))
+
+    async def wait_for_selector(self, selector, **kwargs):
+        pass
+
+    async def wait_for_load_state(self, state, **kwargs):
+        pass
+
+    async def close(self):
+        pass
+
+class FakeContext:
+    def __init__(self, unreachable: Set[str] = (), statuses: Optional[Dict[str, int]] = None):
+        self.unreachable = set(unreachable)
+        self.statuses = statuses or {}
+        self.visited: List[str] = []
+
+    async def new_page(self):
+        return FakePage(self)
+
+class FakePool:
+    def __init__(self, context: FakeContext):
+        self.context = context
+
+    @asynccontextmanager
+    async def lease_context(self, **context_options):
+        yield self.context
+
+class Unlimited:
+    """Rate limiter stand-in: the process-wide one would carry penalties across tests"""
+
+    async def acquire(self, platform, proxy):
+        pass
+
+    async def penalize(self, platform, proxy):
+        pass
+
+    async def reward(self, platform, proxy):
+        pass
+
+class ListingScraper(ShopeeScraper):
+    """Shopee crawl flow with listing extraction replaced by two products per URL"""
+
+    def __init__(self, context: FakeContext, broken: Set[str] = ()):
+        super().__init__(pool=FakePool(context))
+        self.rate_limiter = Unlimited()
+        self.broken = set(broken)
+
+    async def extract_listing(self, page):
+        if page.url in self.broken:
+            raise ValueError("card markup changed")
+        return [
+            {"external_id": f"{page.url}#{n}", "product_name": "Sepatu", "product_url": f"{page.url}/item/{n}"}
+            for n in range(2)
+        ]
+
+def scrape(scraper, input_data: dict = INPUT) -> List[List[dict]]:
+    async def collect():
+        return [batch async for batch in scraper.scrape_batches(input_data, "keyword_search")]
+    return asyncio.run(collect())
+
+def listing_visits(context: FakeContext) -> List[str]:
+    return [url for url in context.visited if url in URLS]
+
+def test_unreachable_page_is_not_checkpointed_and_retried():
+    scraper = ListingScraper(FakeContext(unreachable={URLS[1]}))
+
+    batches = scrape(scraper)
+
+    assert len(batches) == 2
+    assert isinstance(scraper.error, ScrapeInterrupted)
+    assert sorted(scraper.checkpoint()["pages"]) == sorted([URLS[0], URLS[2]])
+
+    context = FakeContext()
+    retry = ListingScraper(context)
+    retry.resume(scraper.checkpoint())
+
+    assert len(scrape(retry)) == 1
+    assert listing_visits(context) == [URLS[1]]
+    assert retry.error is None
+    assert sorted(retry.checkpoint()["pages"]) == sorted(URLS)
+
+def test_error_status_and_ban_fail_the_page():
+    scraper = ListingScraper(FakeContext(statuses={URLS[0]: 500, URLS[2]: 429}))
+
+    scrape(scraper)
+
+    assert scraper.checkpoint()["pages"] == [URLS[1]]
+    assert set(scraper.failed_pages) == {URLS[0], URLS[2]}
+    assert isinstance(scraper.error, ScrapeInterrupted)
+
+def test_extraction_error_fails_the_page():
+    scraper = ListingScraper(FakeContext(), broken={URLS[2]})
+
+    scrape(scraper)
+
+    assert URLS[2] not in scraper.checkpoint()["pages"]
+    assert isinstance(scraper.error, ScrapeInterrupted)
+
+def test_failed_detail_pages_keep_the_listing_page():
+    context = FakeContext(unreachable={f"{URLS[0]}/item/0"})
+    scraper = ListingScraper(context)
+
+    batches = scrape(scraper, {**INPUT, "max_pages": 1, "include_details": True})
+
+    assert [len(batch) for batch in batches] == [2]
+    assert scraper.checkpoint()["pages"] == [URLS[0]]
+    assert scraper.error is None
@@ -0,0 +1,180 @@
+from typing import Callable, List
+
+import pytest
+
+import celery_app
+from app.models.models import Product, ScrapingTask, ScrapingStatus
+from app.services.result_cache import ScrapeResultCache
+from workers.scrapers.base_scraper import BaseScraper
+
+INPUT = {"keyword": "sepatu"}
+
+def page_products(page: str, count: int = 2) -> List[dict]:
+    return [
+        {"external_id": f"{page}-{n}", "product_name": f"{page} #{n}", "price": 1000 + n}
+        for n in range(count)
+    ]
+
+class FakeScraper(BaseScraper):
+    """Delivers fixed listing pages through the real checkpoint helpers, without a browser"""
+
+    PAGES = ["page-1", "page-2", "page-3"]
+
+    def __init__(self, during_crawl: Callable[[str], None] = None):
+        super().__init__()
+        self.during_crawl = during_crawl
+        self.crawled: List[str] = []
+
+    def iter_batches(self, input_data: dict, task_type: str):
+        self.error = None
+        for page in self.pending_pages(self.PAGES):
+            self.crawled.append(page)
+            if self.during_crawl:
+                self.during_crawl(page)
+            products = page_products(page)
+            self.page_done(page, products)
+            yield products
+
+class ScraperRegistry(list):
+    """Every scraper the Celery task built, in order; `factory` builds the next one"""
+    factory: Callable[[], FakeScraper] = FakeScraper
+
+@pytest.fixture
+def scrapers(monkeypatch) -> ScraperRegistry:
+    registry = ScraperRegistry()
+
+    def make(task_id, user_id, platform):
+        scraper = registry.factory()
+        registry.append(scraper)
+        return scraper
+
+    monkeypatch.setattr(celery_app, "_scraper", make)
+    return registry
+
+def run(task: ScrapingTask):
+    return celery_app.create_scraping_task_celery.apply(kwargs={
+        "task_id": task.id,
+        "user_id": task.user_id,
+        "platform": "shopee",
+        "task_type": task.task_type,
+        "input_data": task.input_data,
+    }).get()
+
+def test_followers_each_receive_every_leader_product(db, make_user, make_task, scrapers):
+    alice, bob = make_user("alice"), make_user("bob")
+    leader = make_task(alice)
+    # Same-user followers re-ingest the leader's rows, which re-tags their task_id
+    followers = [make_task(alice), make_task(alice), make_task(bob)]
+    key = ScrapeResultCache.cache_key("shopee", "keyword_search", INPUT)
+
+    def arrive(page):
+        if page == "page-1":
+            for follower in followers:
+                assert ScrapeResultCache.follow(key, follower.id, follower.user_id)
+
+    scrapers.factory = lambda: FakeScraper(during_crawl=arrive)
+
+    result = run(leader)
+
+    assert result["status"] == "completed"
+    assert result["products_scraped"] == 6
+    db.expire_all()
+    for follower in followers:
+        task = db.get(ScrapingTask, follower.id)
+        assert task.status == ScrapingStatus.completed
+        assert task.results_count == 6
+    assert db.query(Product).filter(Product.user_id == bob.id).count() == 6
+    assert db.query(Product).filter(Product.user_id == alice.id).count() == 6
+
+def test_identical_task_is_served_from_the_cache(db, make_user, make_task, scrapers):
+    user = make_user()
+    assert run(make_task(user))["cached"] is False
+
+    second = run(make_task(make_user("other")))
+
+    assert second["cached"] is True
+    assert second["products_scraped"] == 6
+    assert len(scrapers) == 1
+
+class FlakyScraper(FakeScraper):
+    """Loses the browser after delivering `pages` pages"""
+
+    def __init__(self, pages: int):
+        super().__init__()
+        self.pages = pages
+
+    def iter_batches(self, input_data: dict, task_type: str):
+        for batch in super().iter_batches(input_data, task_type):
+            yield batch
+            if len(self.crawled) == self.pages:
+                self.error = RuntimeError("Target closed")
+                return
+
+def test_interrupted_crawl_retries_from_its_checkpoint(db, make_user, make_task, scrapers):
+    task = make_task(make_user())
+    attempts = iter([lambda: FlakyScraper(pages=2), FakeScraper])
+    scrapers.factory = lambda: next(attempts)()
+
+    result = run(task)
+
+    assert result["status"] == "completed"
+    first, retry = scrapers
+    assert first.crawled == ["page-1", "page-2"]
+    assert retry.crawled == ["page-3"]
+    db.expire_all()
+    task = db.get(ScrapingTask, task.id)
+    assert task.status == ScrapingStatus.completed
+    assert task.retry_count == 1
+    assert task.results_count == 6
+    assert task.checkpoint["pages"] == ["page-1", "page-2", "page-3"]
+    assert db.query(Product).count() == 6
+
+def test_crawl_still_failing_after_max_retries_keeps_partial_results(db, make_user, make_task, scrapers, monkeypatch):
+    monkeypatch.setattr(celery_app.settings, "SCRAPE_MAX_RETRIES", 1)
+    task = make_task(make_user())
+    scrapers.factory = lambda: FlakyScraper(pages=1)
+
+    result = run(task)
+
+    assert result["status"] == "failed"
+    assert [scraper.crawled for scraper in scrapers] == [["page-1"], ["page-2"]]
+    db.expire_all()
+    task = db.get(ScrapingTask, task.id)
+    assert task.status == ScrapingStatus.failed
+    assert task.results_count == 4
+
+def test_followers_of_a_dead_leader_are_requeued(db, make_user, make_task, scrapers, redis, monkeypatch):
+    from app.services.dispatch_service import TaskDispatcher
+
+    key = ScrapeResultCache.cache_key("shopee", "keyword_search", INPUT)
+    leader = make_task(make_user())
+    follower = make_task(make_user("other"))
+    assert ScrapeResultCache.claim(key, leader.id)
+    assert run(follower)["status"] == "coalesced"
+
+    # The leader is SIGKILLed: its claim lapses and it never releases its followers
+    redis.delete(ScrapeResultCache._inflight_key(key))
+    sent = []
+    monkeypatch.setattr(TaskDispatcher, "send", lambda task: sent.append(task.id))
+    assert celery_app.dispatch_pending_celery.apply().get()["requeued_followers"] == 0
+
+    member = redis.zrange(ScrapeResultCache._following_key(), 0, -1)[0]
+    redis.zadd(ScrapeResultCache._following_key(), {member: 0})
+    result = celery_app.dispatch_pending_celery.apply().get()
+
+    assert result["requeued_followers"] == 1
+    assert sent == [follower.id]
+    db.expire_all()
+    assert db.get(ScrapingTask, follower.id).status == ScrapingStatus.pending
+    # A leader that does come back finds nobody left to fan out to
+    assert ScrapeResultCache.release(key) == []
+
+def test_cache_hit_reads_a_consistent_snapshot(db, make_user, make_task, scrapers, redis):
+    run(make_task(make_user()))
+    key = ScrapeResultCache.cache_key("shopee", "keyword_search", INPUT)
+
+    batches = ScrapeResultCache.get(key)
+    # Expiry after the read started doesn't truncate the hit
+    redis.delete(ScrapeResultCache._result_key(key))
+
+    assert sum(len(batch) for batch in batches) == 6
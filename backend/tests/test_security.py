@@ -0,0 +1,18 @@
+import pytest
+from fastapi import HTTPException
+
+from app.core.security import create_access_token, create_stream_token, verify_token, STREAM_SCOPE
+
+def test_stream_token_only_opens_the_stream():
+    token = create_stream_token(7)
+
+    assert verify_token(token, scope=STREAM_SCOPE) == 7
+    with pytest.raises(HTTPException):
+        verify_token(token)
+
+def test_access_token_is_not_a_stream_token():
+    token = create_access_token({"sub": "7"})
+
+    assert verify_token(token) == 7
+    with pytest.raises(HTTPException):
+        verify_token(token, scope=STREAM_SCOPE)
@@ -1,3 +1,6 @@
+-- Extensions
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Create ENUM types
 CREATE TYPE user_role AS ENUM ('admin', 'user', 'enterprise');
 CREATE TYPE scraping_platform AS ENUM ('shopee', 'tokopedia', 'tiktok_shop');
@@ -61,6 +64,27 @@ CREATE TABLE api_keys (
     expires_at TIMESTAMP WITH TIME ZONE
 );
 
+-- Recurring monitors (shop_monitor / keyword_search), dispatched by Celery Beat
+CREATE TABLE monitor_schedules (
+    id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    platform scraping_platform NOT NULL,
+    task_type VARCHAR(50) NOT NULL,
+    target VARCHAR(255) NOT NULL, -- shop_id or keyword
+    options JSONB NOT NULL DEFAULT '{}',
+    interval_minutes INT NOT NULL,
+    current_interval_minutes INT NOT NULL,
+    change_rate DOUBLE PRECISION,
+    is_active BOOLEAN DEFAULT true,
+    next_run_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_run_at TIMESTAMP WITH TIME ZONE,
+    last_task_id BIGINT,
+    expires_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(user_id, platform, task_type, target)
+);
+
 -- Scraping Tasks Table
 CREATE TABLE scraping_tasks (
     id BIGSERIAL PRIMARY KEY,
@@ -68,6 +92,7 @@ CREATE TABLE scraping_tasks (
     platform scraping_platform NOT NULL,
     task_type VARCHAR(50) NOT NULL, -- 'keyword_search', 'url_scrape', 'shop_monitor'
     input_data JSONB NOT NULL, -- Contains URL, keyword, or shop parameters
+    priority VARCHAR(20) NOT NULL DEFAULT 'interactive', -- 'interactive', 'scheduled', 'bulk'
     status scraping_status DEFAULT 'pending',
     results_count INT DEFAULT 0,
     error_message TEXT,
@@ -76,7 +101,10 @@ CREATE TABLE scraping_tasks (
     completed_at TIMESTAMP WITH TIME ZONE,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-    expires_at TIMESTAMP WITH TIME ZONE
+    expires_at TIMESTAMP WITH TIME ZONE,
+    schedule_id BIGINT REFERENCES monitor_schedules(id) ON DELETE SET NULL,
+    checkpoint JSONB, -- Crawled page cursors and last product id, committed with each ingested batch
+    retry_count INT NOT NULL DEFAULT 0
 );
 
 -- Products Table (scraped data)
@@ -108,16 +136,59 @@ CREATE TABLE products (
     UNIQUE(platform, external_id, user_id)
 );
 
--- Price History Table (for analytics)
+-- Price History Table (for analytics), partitioned by month on recorded_at.
+-- The partition key must be part of the primary key.
 CREATE TABLE price_history (
-    id BIGSERIAL PRIMARY KEY,
+    id BIGSERIAL,
     product_id BIGINT NOT NULL REFERENCES products(id) ON DELETE CASCADE,
     user_id BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
     price DECIMAL(15, 2),
     discount_percentage INT,
     sold_count INT,
     rating DECIMAL(3, 2),
-    recorded_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    recorded_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, recorded_at)
+) PARTITION BY RANGE (recorded_at);
+
+-- Catches rows outside the monthly partitions created so far
+CREATE TABLE price_history_default PARTITION OF price_history DEFAULT;
+
+-- Creates the partition for the month containing `month_start` (idempotent).
+-- Called daily by Celery Beat for the current and next month.
+CREATE OR REPLACE FUNCTION create_price_history_partition(month_start DATE)
+RETURNS VOID AS $$
+DECLARE
+    start_date DATE := date_trunc('month', month_start)::DATE;
+    end_date DATE := (date_trunc('month', month_start) + INTERVAL '1 month')::DATE;
+    partition_name TEXT := 'price_history_' || to_char(start_date, 'YYYY_MM');
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF price_history FOR VALUES FROM (%L) TO (%L)',
+        partition_name, start_date, end_date
+    );
+END;
+$$ language 'plpgsql';
+
+SELECT create_price_history_partition(CURRENT_DATE);
+SELECT create_price_history_partition((CURRENT_DATE + INTERVAL '1 month')::DATE);
+
+-- Downsampled price history, maintained by ingestion as snapshots are written
+CREATE TABLE price_rollups (
+    id BIGSERIAL PRIMARY KEY,
+    product_id BIGINT NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    user_id BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    resolution VARCHAR(10) NOT NULL, -- 'hour', 'day', 'week'
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    min_price DECIMAL(15, 2),
+    max_price DECIMAL(15, 2),
+    price_sum DECIMAL(20, 2) DEFAULT 0,
+    price_samples INT DEFAULT 0,
+    last_price DECIMAL(15, 2),
+    last_sold_count INT,
+    sold_count_delta BIGINT DEFAULT 0,
+    samples INT DEFAULT 0,
+    last_recorded_at TIMESTAMP WITH TIME ZONE,
+    UNIQUE(product_id, resolution, bucket_start)
 );
 
 -- Collections/Watchlist Table
@@ -165,25 +236,73 @@ CREATE TABLE audit_logs (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Maintained per-user counters ('products', 'products:platform:shopee', 'tasks:status:pending', ...)
+CREATE TABLE user_counters (
+    id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    counter_key VARCHAR(100) NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(user_id, counter_key)
+);
+
+-- Background export jobs (files live in EXPORT_DIR until expires_at)
+CREATE TABLE export_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    dataset VARCHAR(50) NOT NULL,
+    format VARCHAR(20) NOT NULL,
+    filters JSONB NOT NULL DEFAULT '{}',
+    status scraping_status DEFAULT 'pending',
+    row_count INTEGER DEFAULT 0,
+    file_path VARCHAR(500),
+    file_size BIGINT,
+    error_message TEXT,
+    celery_task_id VARCHAR(255),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP WITH TIME ZONE,
+    expires_at TIMESTAMP WITH TIME ZONE
+);
+
 -- Create Indexes for Performance
 CREATE INDEX idx_users_email ON users(email);
 CREATE INDEX idx_users_username ON users(username);
 CREATE INDEX idx_scraping_tasks_user_id ON scraping_tasks(user_id);
 CREATE INDEX idx_scraping_tasks_status ON scraping_tasks(status);
 CREATE INDEX idx_scraping_tasks_celery_task_id ON scraping_tasks(celery_task_id);
+CREATE INDEX idx_scraping_tasks_schedule_id ON scraping_tasks(schedule_id);
+-- Tasks held back by the dispatcher until their user has a free slot
+CREATE INDEX idx_scraping_tasks_waiting ON scraping_tasks(user_id, created_at)
+    WHERE celery_task_id IS NULL AND status = 'pending';
+CREATE INDEX idx_monitor_schedules_user_id ON monitor_schedules(user_id);
+CREATE INDEX idx_monitor_schedules_due ON monitor_schedules(next_run_at) WHERE is_active;
 CREATE INDEX idx_products_user_id ON products(user_id);
 CREATE INDEX idx_products_platform ON products(platform);
 CREATE INDEX idx_products_task_id ON products(task_id);
 CREATE INDEX idx_products_external_id ON products(external_id);
 CREATE INDEX idx_price_history_product_id ON price_history(product_id);
 CREATE INDEX idx_price_history_recorded_at ON price_history(recorded_at DESC);
+-- Per-product time range scans (charts, latest N snapshots)
+CREATE INDEX idx_price_history_product_recorded ON price_history(product_id, recorded_at DESC);
 CREATE INDEX idx_collections_user_id ON collections(user_id);
 CREATE INDEX idx_collection_products_collection_id ON collection_products(collection_id);
 CREATE INDEX idx_alerts_user_id ON alerts(user_id);
+CREATE INDEX idx_export_jobs_user_id ON export_jobs(user_id);
 CREATE INDEX idx_alerts_product_id ON alerts(product_id);
 CREATE INDEX idx_audit_logs_user_id ON audit_logs(user_id);
 CREATE INDEX idx_audit_logs_created_at ON audit_logs(created_at DESC);
 
+-- Product search: full-text (must match the expression used by the search service,
+-- with SEARCH_TS_CONFIG in search_service.py) and trigram similarity for fuzzy name matches
+CREATE INDEX idx_products_search ON products USING GIN
+    (to_tsvector('simple'::regconfig, coalesce(product_name, '') || ' ' || coalesce(category, '')));
+CREATE INDEX idx_products_name_trgm ON products USING GIN (product_name gin_trgm_ops);
+
+-- Keyset (cursor) pagination on (created_at, id), newest first
+CREATE INDEX idx_scraping_tasks_user_created_id ON scraping_tasks(user_id, created_at DESC, id DESC);
+CREATE INDEX idx_products_user_created_id ON products(user_id, created_at DESC, id DESC);
+CREATE INDEX idx_products_user_platform_created_id ON products(user_id, platform, created_at DESC, id DESC);
+
 -- Create Updated_at Trigger Function
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
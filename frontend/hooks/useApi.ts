@@ -1,6 +1,7 @@
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { useAuthStore } from '@/store/authStore';
 import { api } from '@/lib/api';
+import type { ScrapingTask } from '@/types';
 
 export const useAuth = () => {
   const [loading, setLoading] = useState(true);
@@ -25,10 +26,16 @@ export const useAuth = () => {
   return { user, token, loading, setToken, logout };
 };
 
+const POLL_INTERVAL_MS = 5000;
+const STREAM_RETRY_MS = 3000;
+
 export const useScrapingTasks = () => {
-  const [tasks, setTasks] = useState([]);
+  const [tasks, setTasks] = useState<ScrapingTask[]>([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
+  const token = useAuthStore((state) => state.token);
+  const tasksRef = useRef(tasks);
+  tasksRef.current = tasks;
 
   const fetchTasks = async () => {
     setLoading(true);
@@ -45,9 +52,78 @@ export const useScrapingTasks = () => {
 
   useEffect(() => {
     fetchTasks();
-    const interval = setInterval(fetchTasks, 5000); // Poll every 5 seconds
-    return () => clearInterval(interval);
-  }, []);
+
+    // Poll only while the push channel is unavailable
+    let interval: ReturnType<typeof setInterval> | null = null;
+    const startPolling = () => {
+      if (!interval) interval = setInterval(fetchTasks, POLL_INTERVAL_MS);
+    };
+    const stopPolling = () => {
+      if (interval) clearInterval(interval);
+      interval = null;
+    };
+
+    if (!token || typeof EventSource === 'undefined') {
+      startPolling();
+      return stopPolling;
+    }
+
+    let source: EventSource | null = null;
+    let retry: ReturnType<typeof setTimeout> | null = null;
+    let closed = false;
+
+    const applyUpdate = (event: MessageEvent) => {
+      const update = JSON.parse(event.data);
+      if (!tasksRef.current.some((task) => task.id === update.id)) {
+        // Not on the current page: a status change may move it onto it, progress can't
+        if (event.type === 'status') fetchTasks();
+        return;
+      }
+      setTasks((current) =>
+        current.map((task) => (task.id === update.id ? { ...task, ...update } : task))
+      );
+    };
+
+    // Poll until the stream is back; stream tokens expire within a minute, so
+    // reconnect with a fresh one instead of letting EventSource retry the old URL
+    const reconnect = () => {
+      source?.close();
+      startPolling();
+      if (!closed) retry = setTimeout(connect, STREAM_RETRY_MS);
+    };
+
+    const connect = async () => {
+      let streamToken: string;
+      try {
+        const response = await api.createTaskStreamToken();
+        streamToken = response.data.data.token;
+      } catch (err) {
+        reconnect();
+        return;
+      }
+      if (closed) return;
+
+      source = new EventSource(api.taskStreamUrl(streamToken));
+      source.addEventListener('status', applyUpdate);
+      source.addEventListener('progress', applyUpdate);
+      source.addEventListener('created', () => fetchTasks());
+      source.onopen = () => {
+        stopPolling();
+        // Catch up on anything missed while disconnected
+        fetchTasks();
+      };
+      source.onerror = reconnect;
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      if (retry) clearTimeout(retry);
+      source?.close();
+      stopPolling();
+    };
+  }, [token]);
 
   return { tasks, loading, error, refetch: fetchTasks };
 };
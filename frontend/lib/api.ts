@@ -29,20 +29,57 @@ export const api = {
   // Tasks endpoints
   createScrapingTask: (data: any) =>
     apiClient.post('/api/v1/tasks', data),
+  // Up to TASK_BATCH_MAX_SIZE tasks; they default to the bulk queue
+  createScrapingTasksBatch: (tasks: any[]) =>
+    apiClient.post('/api/v1/tasks/batch', { tasks }),
   getTask: (taskId: number) =>
     apiClient.get(`/api/v1/tasks/${taskId}`),
-  listTasks: (skip = 0, limit = 10) =>
-    apiClient.get(`/api/v1/tasks?skip=${skip}&limit=${limit}`),
+  listTasks: (skip = 0, limit = 10, cursor?: string) =>
+    apiClient.get(`/api/v1/tasks?skip=${skip}&limit=${limit}${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`),
+  // Server-sent task events. EventSource can't send headers and the URL ends up in
+  // logs, so the stream takes a short-lived token that opens nothing else
+  createTaskStreamToken: () =>
+    apiClient.post('/api/v1/tasks/stream-token'),
+  taskStreamUrl: (streamToken: string) =>
+    `${API_URL}/api/v1/tasks/stream?token=${encodeURIComponent(streamToken)}`,
+
+  // Monitor endpoints (recurring shop_monitor / keyword_search runs)
+  listMonitors: () =>
+    apiClient.get('/api/v1/monitors'),
+  createMonitor: (data: any) =>
+    apiClient.post('/api/v1/monitors', data),
+  updateMonitor: (monitorId: number, data: any) =>
+    apiClient.patch(`/api/v1/monitors/${monitorId}`, data),
+  deleteMonitor: (monitorId: number) =>
+    apiClient.delete(`/api/v1/monitors/${monitorId}`),
 
   // Products endpoints
-  listProducts: (platform?: string, skip = 0, limit = 20) =>
-    apiClient.get(`/api/v1/products?platform=${platform || ''}&skip=${skip}&limit=${limit}`),
+  listProducts: (platform?: string, skip = 0, limit = 20, cursor?: string) =>
+    apiClient.get(`/api/v1/products?platform=${platform || ''}&skip=${skip}&limit=${limit}${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`),
   getProduct: (productId: number) =>
     apiClient.get(`/api/v1/products/${productId}`),
   getProductHistory: (productId: number, limit = 50) =>
     apiClient.get(`/api/v1/products/${productId}/history?limit=${limit}`),
-  searchProducts: (query: string, skip = 0, limit = 20) =>
-    apiClient.get(`/api/v1/products/search/${query}?skip=${skip}&limit=${limit}`),
+  searchProducts: (query: string, skip = 0, limit = 20, cursor?: string) =>
+    apiClient.get(`/api/v1/products/search?q=${encodeURIComponent(query)}&skip=${skip}&limit=${limit}${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`),
+
+  // Analytics endpoints
+  getTrendingProducts: (scope = 'all', value?: string, limit = 20) =>
+    apiClient.get(`/api/v1/analytics/trending?scope=${scope}&limit=${limit}${value ? `&value=${encodeURIComponent(value)}` : ''}`),
+  getPriceDrops: (scope = 'all', value?: string, limit = 20) =>
+    apiClient.get(`/api/v1/analytics/price-drops?scope=${scope}&limit=${limit}${value ? `&value=${encodeURIComponent(value)}` : ''}`),
+  getTrendingCategories: (limit = 20) =>
+    apiClient.get(`/api/v1/analytics/categories?limit=${limit}`),
+  getTrendingShops: (limit = 20) =>
+    apiClient.get(`/api/v1/analytics/shops?limit=${limit}`),
+
+  // Export endpoints (dataset: 'products' | 'price-history' | 'task-results')
+  exportUrl: (dataset: string, format = 'csv', taskId?: number) =>
+    `${API_URL}/api/v1/exports/${dataset}?format=${format}${taskId ? `&task_id=${taskId}` : ''}`,
+  createExportJob: (dataset: string, format = 'csv', taskId?: number) =>
+    apiClient.post(`/api/v1/exports/${dataset}/jobs?format=${format}${taskId ? `&task_id=${taskId}` : ''}`),
+  getExportJob: (jobId: number) =>
+    apiClient.get(`/api/v1/exports/jobs/${jobId}`),
 
   // Health check
   healthCheck: () =>
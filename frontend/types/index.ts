@@ -14,12 +14,16 @@ export interface ScrapingTask {
   id: number;
   platform: "shopee" | "tokopedia" | "tiktok_shop";
   task_type: string;
+  priority: "interactive" | "scheduled" | "bulk";
   status: "pending" | "running" | "completed" | "failed";
   results_count: number;
   celery_task_id: string | null;
   created_at: string;
   updated_at: string;
   error_message: string | null;
+  // Live progress from the task stream, absent until the first progress event
+  pages_crawled?: number;
+  products_ingested?: number;
 }
 
 export interface Product {
@@ -63,4 +67,6 @@ export interface PaginatedData<T> {
   page: number;
   page_size: number;
   items: T[];
+  next_cursor?: string | null;
+  prev_cursor?: string | null;
 }
@@ -1,11 +1,25 @@
 import asyncio
 import random
-from typing import List, Optional
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
 from playwright.async_api import async_playwright, Browser, Page, BrowserContext
 import logging
 
+from app.core.config import settings
+from .extraction import EXTRACT_CARDS_JS, Field, compile_fields, parse_cards
+from .interception import ApiCapture
+from .navigation import NAVIGATION_PROFILES, NavigationProfile, NavigationStats, get_profile, get_stats
+from .proxy_manager import get_proxy_manager, proxy_settings
+from .rate_limiter import get_rate_limiter
+
 logger = logging.getLogger(__name__)
 
+class ScrapeInterrupted(Exception):
+    """The crawl stopped on an error before covering every page; worth resuming"""
+
+class PageLoadFailed(Exception):
+    """A page could not be loaded: navigation error, ban or error status"""
+
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
@@ -24,15 +38,19 @@ class BrowserManager:
     """Manage browser instances with proxy rotation and user-agent switching"""
     
     def __init__(self, headless: bool = True, browser_timeout: int = 30000, 
-                 proxy_list: Optional[List[str]] = None):
+                 proxy_list: Optional[List[str]] = None, playwright=None):
         self.headless = headless
         self.browser_timeout = browser_timeout
         self.proxy_list = proxy_list or PROXY_LIST
         self.browser: Optional[Browser] = None
+        # A shared driver (e.g. from BrowserPool) is not ours to stop
+        self.playwright = playwright
+        self._owns_playwright = playwright is None
         
     async def launch_browser(self) -> Browser:
         """Launch browser instance"""
-        playwright = await async_playwright().start()
+        if self.playwright is None:
+            self.playwright = await async_playwright().start()
         
         launch_args = {
             "headless": self.headless,
@@ -43,20 +61,27 @@ class BrowserManager:
             ]
         }
         
-        # Add proxy if available
+        # Proxies are assigned per context; Chromium needs a global placeholder for that
         if self.proxy_list:
-            proxy = random.choice(self.proxy_list)
-            launch_args["proxy"] = {"server": proxy}
-            logger.info(f"Using proxy: {proxy}")
+            launch_args["proxy"] = {"server": "http://per-context"}
         
-        self.browser = await playwright.chromium.launch(**launch_args)
+        self.browser = await self.playwright.chromium.launch(**launch_args)
         return self.browser
     
-    async def create_context(self) -> BrowserContext:
-        """Create a new browser context with random user-agent"""
+    async def create_context(self, profile: Optional[NavigationProfile] = None,
+                             stats: Optional[NavigationStats] = None,
+                             proxy: Optional[str] = None) -> BrowserContext:
+        """Create a new browser context with random user-agent, navigation profile and proxy"""
         if not self.browser:
             await self.launch_browser()
         
+        profile = profile or NAVIGATION_PROFILES["full"]
+        if proxy is None and self.proxy_list:
+            proxy = random.choice(self.proxy_list)
+        context_args = {"proxy": proxy_settings(proxy)} if proxy else {}
+        if proxy:
+            logger.info(f"Using proxy: {proxy}")
+        
         user_agent = random.choice(USER_AGENTS)
         context = await self.browser.new_context(
             user_agent=user_agent,
@@ -64,7 +89,10 @@ class BrowserManager:
             timezone_id="Asia/Jakarta",  # Indonesia timezone
             locale="id-ID",
             permissions=[],
+            **profile.context_options(),
+            **context_args,
         )
+        await profile.attach(context, stats or NavigationStats())
         
         # Add stealth scripts to avoid detection
         await context.add_init_script("""
@@ -76,77 +104,306 @@ class BrowserManager:
         return context
     
     async def close(self):
-        """Close browser"""
+        """Close browser and stop the Playwright driver if we started it"""
         if self.browser:
             await self.browser.close()
+            self.browser = None
+        if self.playwright and self._owns_playwright:
+            await self.playwright.stop()
+            self.playwright = None
 
 class BaseScraper:
     """Base scraper class with common functionality"""
     
-    def __init__(self, headless: bool = True, browser_timeout: int = 30000,
-                 proxy_list: Optional[List[str]] = None):
-        self.browser_manager = BrowserManager(headless, browser_timeout, proxy_list)
+    PLATFORM = "generic"
+    
+    # Regexes for the platform's search/shop API URLs; empty disables interception
+    API_RESPONSE_PATTERNS: List[str] = []
+    
+    # Default navigation profile name, overridable per task via input_data
+    NAVIGATION_PROFILE = "full"
+    
+    def __init__(self, browser_timeout: int = 30000, pool=None):
+        # Browsers come from the per-process BrowserPool; headless mode and
+        # proxies are pool-level settings
+        self.pool = pool
         self.timeout = browser_timeout
+        self.mode = "dom"
+        self.profile = get_profile(self.NAVIGATION_PROFILE)
+        self.nav_stats = NavigationStats()
+        self.proxy_manager = get_proxy_manager()
+        self.rate_limiter = get_rate_limiter()
+        self.proxy: Optional[str] = None
+        self._captures: Dict[Page, ApiCapture] = {}
+        # Called off the event loop with {"pages_crawled": n} after each crawled page
+        self.on_progress: Optional[Callable[[dict], None]] = None
+        self.pages_crawled = 0
+        # Listing pages whose products were handed over, in order; see checkpoint()
+        self.pages_done: List[str] = []
+        self.last_external_id: Optional[str] = None
+        # Listing pages that failed this attempt; left out of the checkpoint so a retry re-crawls them
+        self.failed_pages: Dict[str, Exception] = {}
+        # The error that ended the last stream early (or left pages missing), if any
+        self.error: Optional[Exception] = None
+    
+    @property
+    def intercepting(self) -> bool:
+        return self.mode == "intercept" and bool(self.API_RESPONSE_PATTERNS)
     
-    async def get_page(self, context: BrowserContext, url: str) -> Page:
-        """Create and navigate to page"""
+    async def get_page(self, context: BrowserContext, url: str, wait_for: Optional[str] = None) -> Page:
+        """
+        Create and navigate to page. Readiness follows the navigation profile:
+        done as soon as `wait_for` appears, or after the settle state when no
+        selector (and no API capture) tells us the data is there.
+        
+        Raises PageLoadFailed (having closed the page) when navigation fails,
+        the proxy is banned or the response is an error status.
+        """
+        started = time.monotonic()
         page = await context.new_page()
         page.set_default_timeout(self.timeout)
         
+        if self.intercepting:
+            # Listen before navigating so the first API response is not missed
+            capture = ApiCapture(self.API_RESPONSE_PATTERNS)
+            self._captures[page] = capture
+            page.on("response", capture.on_response)
+            page.on("close", lambda _page: self._captures.pop(page, None))
+        
         try:
-            await page.goto(url, wait_until="domcontentloaded", timeout=self.timeout)
-            await page.wait_for_load_state("networkidle", timeout=10000)
+            await self.rate_limiter.acquire(self.PLATFORM, self.proxy)
+            async with self.proxy_manager.track(self.proxy) as outcome:
+                response = await page.goto(url, wait_until=self.profile.wait_until, timeout=self.timeout)
+                outcome.observe(response, page.url)
+            if outcome.banned:
+                await self.rate_limiter.penalize(self.PLATFORM, self.proxy)
+                raise PageLoadFailed(f"banned ({outcome.status} at {outcome.url})")
+            if outcome.status is not None and outcome.status >= 400:
+                raise PageLoadFailed(f"HTTP {outcome.status}")
+            if outcome.success:
+                await self.rate_limiter.reward(self.PLATFORM, self.proxy)
+            await self.profile.wait_until_ready(
+                page, self.nav_stats, started, selector=wait_for, skip_settle=self.intercepting
+            )
         except Exception as e:
             logger.error(f"Failed to load {url}: {str(e)}")
+            await page.close()
+            if isinstance(e, PageLoadFailed):
+                raise
+            raise PageLoadFailed(str(e)) from e
         
         return page
     
+    async def extract_listing(self, page: Page) -> List[dict]:
+        """Extract products using captured API payloads when intercepting, else the DOM"""
+        if self.intercepting:
+            products = await self.extract_from_api(page)
+            if products:
+                return products
+            logger.info(f"No API payload captured for {page.url}, falling back to DOM")
+        return await self.extract_data(page)
+    
+    async def extract_from_api(self, page: Page) -> List[dict]:
+        """Map the JSON payloads captured for this page into product dicts"""
+        capture = self._captures.get(page)
+        if capture is None:
+            return []
+        
+        results = []
+        for url, payload in await capture.wait(10000):
+            try:
+                results.extend(self.map_api_payload(url, payload))
+            except Exception as e:
+                logger.warning(f"Failed to map API payload from {url}: {str(e)}")
+        return results
+    
+    def map_api_payload(self, url: str, payload) -> List[dict]:
+        """Map a captured API payload to product dicts (to be implemented by subclasses)"""
+        return []
+    
+    async def crawl_pages(self, context: BrowserContext, urls: List[str],
+                          handler: Callable[[Page], Awaitable[List[dict]]],
+                          semaphore: asyncio.Semaphore,
+                          wait_for: Optional[str] = None
+                          ) -> AsyncIterator[Tuple[str, List[dict], Optional[Exception]]]:
+        """
+        Load URLs concurrently as pages of one shared context, at most
+        `semaphore` pages at a time, and yield (url, results, error) as soon as
+        each page finishes (not in URL order). `error` is set, and `results`
+        empty, when the page failed to load or extract; one failed page does
+        not stop the others.
+        """
+        async def load(url: str) -> Tuple[str, List[dict], Optional[Exception]]:
+            async with semaphore:
+                try:
+                    page = await self.get_page(context, url, wait_for)
+                except PageLoadFailed as e:
+                    return url, [], e
+                try:
+                    return url, await handler(page) or [], None
+                except Exception as e:
+                    logger.warning(f"Failed to crawl {url}: {str(e)}")
+                    return url, [], e
+                finally:
+                    await page.close()
+        
+        tasks = [asyncio.create_task(load(url)) for url in urls]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                url, results, error = await finished
+                await self._report_page()
+                yield url, results, error
+        finally:
+            # Consumer stopped early or failed: don't leave pages loading
+            for task in tasks:
+                task.cancel()
+    
+    def resume(self, checkpoint: Optional[dict]):
+        """Skip the listing pages a previous attempt already delivered"""
+        checkpoint = checkpoint or {}
+        self.pages_done = list(checkpoint.get("pages") or [])
+        self.last_external_id = checkpoint.get("last_external_id")
+    
+    def checkpoint(self) -> dict:
+        """Progress as of the last yielded batch, to be saved with that batch"""
+        return {"pages": list(self.pages_done), "last_external_id": self.last_external_id}
+    
+    def pending_pages(self, urls: List[str]) -> List[str]:
+        done = set(self.pages_done)
+        return [url for url in urls if url not in done]
+    
+    def page_done(self, url: str, products: List[dict]):
+        """Record a listing page as delivered; call right before yielding its products"""
+        self.pages_done.append(url)
+        if products:
+            self.last_external_id = products[-1].get("external_id")
+    
+    def page_failed(self, url: str, error: Exception):
+        """Record a listing page that produced nothing this attempt; the crawl goes on without it"""
+        logger.warning(f"Listing page {url} failed: {str(error)}")
+        self.failed_pages[url] = error
+    
+    async def _report_page(self):
+        """Count a crawled page (listing or detail) and report the running total"""
+        self.pages_crawled += 1
+        if self.on_progress is None:
+            return
+        try:
+            await asyncio.to_thread(self.on_progress, {"pages_crawled": self.pages_crawled})
+        except Exception as e:
+            logger.warning(f"Progress callback failed: {str(e)}")
+    
+    async def extract_cards(self, page: Page, card_selector: str, fields: Dict[str, Field],
+                            limit: Optional[int] = None) -> List[dict]:
+        """
+        Read every field of every card matching `card_selector` in a single
+        page round trip, then apply each field's typed post-processing.
+        """
+        raw_cards = await page.eval_on_selector_all(
+            card_selector, EXTRACT_CARDS_JS, {"fields": compile_fields(fields), "limit": limit}
+        )
+        return parse_cards(raw_cards, fields, base_url=page.url)
+    
     async def extract_data(self, page: Page) -> List[dict]:
         """Extract data from page (to be implemented by subclasses)"""
         raise NotImplementedError
     
     def scrape(self, input_data: dict, task_type: str) -> List[dict]:
-        """Synchronous wrapper for async scraping"""
-        return asyncio.run(self._scrape_async(input_data, task_type))
+        """Synchronous wrapper collecting every product; prefer iter_batches for long crawls"""
+        return [product for batch in self.iter_batches(input_data, task_type) for product in batch]
     
-    async def _scrape_async(self, input_data: dict, task_type: str) -> List[dict]:
-        """Async scraping implementation"""
-        results = []
-        context = None
+    def iter_batches(self, input_data: dict, task_type: str) -> Iterator[List[dict]]:
+        """
+        Synchronous view of scrape_batches, driven on the warm browser pool:
+        each batch is handed over as soon as it is scraped, and the crawl
+        waits while the caller persists it.
+        """
+        if self.pool is None:
+            from .browser_pool import get_browser_pool
+            self.pool = get_browser_pool()
+        return self.pool.iterate(self.scrape_batches(input_data, task_type))
+    
+    async def scrape_batches(self, input_data: dict, task_type: str) -> AsyncIterator[List[dict]]:
+        """
+        Scrape a task, yielding products a page at a time. Browser errors
+        end the stream early and are kept in `error`; everything yielded
+        before them stands. Listing pages that failed while the rest of the
+        crawl went on leave a ScrapeInterrupted in `error` too, so the task
+        is retried for exactly those pages.
+        """
+        self.error = None
+        self.failed_pages = {}
+        self.mode = input_data.get("mode") or settings.SCRAPER_MODE
+        self.profile = get_profile(input_data.get("navigation_profile"), self.NAVIGATION_PROFILE)
+        if not self.profile.javascript_enabled:
+            # No JavaScript means no API calls to intercept
+            self.mode = "dom"
+        self.nav_stats = get_stats(self.PLATFORM, self.profile)
         
         try:
-            context = await self.browser_manager.create_context()
-            
-            if task_type == "url_scrape":
-                url = input_data.get("url")
-                if url:
-                    page = await self.get_page(context, url)
-                    results = await self.extract_data(page)
-                    await page.close()
-            
-            elif task_type == "keyword_search":
-                keyword = input_data.get("keyword")
-                if keyword:
-                    results = await self.search_keyword(context, keyword)
-            
-            elif task_type == "shop_monitor":
-                shop_id = input_data.get("shop_id")
-                if shop_id:
-                    results = await self.monitor_shop(context, shop_id)
+            self.proxy = await self.proxy_manager.choose()
+            async with self.pool.lease_context(profile=self.profile, stats=self.nav_stats,
+                                               proxy=self.proxy) as context:
+                async for batch in self._dispatch(context, input_data, task_type):
+                    if batch:
+                        yield batch
+        
+            if self.failed_pages:
+                url, error = next(iter(self.failed_pages.items()))
+                self.error = ScrapeInterrupted(
+                    f"{len(self.failed_pages)} listing page(s) failed, first {url}: {str(error)}"
+                )
         
         except Exception as e:
             logger.error(f"Scraping error: {str(e)}")
+            self.error = e
         
         finally:
-            if context:
-                await context.close()
+            logger.info(f"Navigation stats {self.PLATFORM}/{self.profile.name}: {self.nav_stats.to_dict()}")
+    
+    async def _dispatch(self, context: BrowserContext, input_data: dict,
+                        task_type: str) -> AsyncIterator[List[dict]]:
+        """Route a task type to the matching scraping method"""
+        if task_type == "url_scrape":
+            url = input_data.get("url")
+            if url and self.pending_pages([url]):
+                page = await self.get_page(context, url)
+                try:
+                    products = await self.extract_listing(page)
+                finally:
+                    await page.close()
+                self.page_done(url, products)
+                yield products
         
-        return results
+        elif task_type == "keyword_search":
+            keyword = input_data.get("keyword")
+            if keyword:
+                async for batch in self.search_keyword(context, keyword, **self._crawl_options(input_data)):
+                    yield batch
+        
+        elif task_type == "shop_monitor":
+            shop_id = input_data.get("shop_id")
+            if shop_id:
+                async for batch in self.monitor_shop(context, shop_id, **self._crawl_options(input_data)):
+                    yield batch
+    
+    @staticmethod
+    def _crawl_options(input_data: dict) -> dict:
+        """Pagination options from task input, clamped to the configured limits"""
+        max_pages = int(input_data.get("max_pages") or 1)
+        concurrency = int(input_data.get("concurrency") or settings.SCRAPER_PAGE_CONCURRENCY)
+        return {
+            "max_pages": max(1, min(max_pages, settings.SCRAPER_MAX_PAGES)),
+            "concurrency": max(1, min(concurrency, settings.SCRAPER_PAGE_CONCURRENCY)),
+            "include_details": bool(input_data.get("include_details", False)),
+        }
     
-    async def search_keyword(self, context: BrowserContext, keyword: str) -> List[dict]:
-        """Search for keyword (to be implemented by subclasses)"""
+    def search_keyword(self, context: BrowserContext, keyword: str, max_pages: int = 1,
+                       concurrency: int = 1, include_details: bool = False) -> AsyncIterator[List[dict]]:
+        """Search for keyword, yielding a batch per page (async generator, to be implemented by subclasses)"""
         raise NotImplementedError
     
-    async def monitor_shop(self, context: BrowserContext, shop_id: str) -> List[dict]:
-        """Monitor shop (to be implemented by subclasses)"""
+    def monitor_shop(self, context: BrowserContext, shop_id: str, max_pages: int = 1,
+                     concurrency: int = 1, include_details: bool = False) -> AsyncIterator[List[dict]]:
+        """Monitor shop, yielding a batch per page (async generator, to be implemented by subclasses)"""
         raise NotImplementedError
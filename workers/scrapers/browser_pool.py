@@ -0,0 +1,324 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Iterator, List, Optional
+
+from playwright.async_api import async_playwright, BrowserContext
+
+from app.core.config import settings
+from .base_scraper import BrowserManager
+
+logger = logging.getLogger(__name__)
+
+class PooledBrowser:
+    """A warm browser owned by the pool, with usage counters for recycling"""
+
+    def __init__(self, manager: BrowserManager):
+        self.manager = manager
+        self.launched_at = time.monotonic()
+        self.pages_served = 0
+        self.active_leases = 0
+        self.retired = False
+
+    @property
+    def browser(self):
+        return self.manager.browser
+
+    def record_page(self):
+        """Count a page opened in one of this browser's contexts"""
+        self.pages_served += 1
+
+    def is_healthy(self) -> bool:
+        """Check the browser process is still connected"""
+        return self.browser is not None and self.browser.is_connected()
+
+    def should_recycle(self, max_pages: int, max_age_seconds: float) -> bool:
+        """Check whether the browser has served enough pages or lived long enough"""
+        if max_pages and self.pages_served >= max_pages:
+            return True
+        if max_age_seconds and time.monotonic() - self.launched_at >= max_age_seconds:
+            return True
+        return False
+
+class BrowserPool:
+    """
+    Long-lived pool of warm browsers for one worker process.
+
+    The pool owns a single Playwright driver and a persistent event loop
+    running on a background thread, so synchronous Celery tasks can submit
+    coroutines with `run()` and lease a fresh context on an already running
+    browser instead of launching Chromium for every task.
+    """
+
+    def __init__(self, size: Optional[int] = None, contexts_per_browser: Optional[int] = None,
+                 max_pages: Optional[int] = None, max_age_minutes: Optional[int] = None,
+                 health_check_seconds: Optional[int] = None, headless: Optional[bool] = None,
+                 browser_timeout: Optional[int] = None, proxy_list: Optional[List[str]] = None):
+        self.size = max(1, size or settings.BROWSER_POOL_SIZE)
+        self.contexts_per_browser = max(1, contexts_per_browser or settings.BROWSER_POOL_CONTEXTS_PER_BROWSER)
+        self.max_pages = max_pages if max_pages is not None else settings.BROWSER_POOL_MAX_PAGES
+        self.max_age_seconds = (max_age_minutes if max_age_minutes is not None
+                                else settings.BROWSER_POOL_MAX_AGE_MINUTES) * 60
+        self.health_check_seconds = health_check_seconds or settings.BROWSER_POOL_HEALTH_CHECK_SECONDS
+        self.headless = settings.PLAYWRIGHT_HEADLESS if headless is None else headless
+        self.browser_timeout = browser_timeout or settings.BROWSER_TIMEOUT
+        self.proxy_list = proxy_list if proxy_list is not None else settings.PROXY_LIST
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._playwright = None
+        self._browsers: List[PooledBrowser] = []
+        self._lock: Optional[asyncio.Lock] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._health_task: Optional[asyncio.Task] = None
+
+    @property
+    def started(self) -> bool:
+        return self._loop is not None
+
+    def start(self):
+        """Start the pool event loop and launch the warm browsers"""
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=self._run_loop, args=(loop,), name="browser-pool", daemon=True
+            )
+            self._thread.start()
+            try:
+                asyncio.run_coroutine_threadsafe(self._start_async(), loop).result()
+            except BaseException:
+                # e.g. the Playwright driver failed to start: release what did
+                # start and the loop thread, so the next start() begins clean
+                if self._lock is not None:
+                    try:
+                        asyncio.run_coroutine_threadsafe(self._shutdown_async(), loop).result(30)
+                    except Exception as e:
+                        logger.warning(f"Browser pool cleanup error: {str(e)}")
+                self._stop_loop(loop)
+                raise
+            self._loop = loop
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the pool event loop and wait for its result"""
+        if self._loop is None:
+            self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # e.g. a Celery soft time limit: stop the crawl rather than orphan it
+            future.cancel()
+            raise
+
+    def iterate(self, agen: AsyncIterator, timeout: Optional[float] = None) -> Iterator:
+        """
+        Drive an async generator on the pool event loop, yielding its items
+        in the calling thread. The generator is paused while the caller
+        handles an item, and closed if the caller stops early or fails.
+        """
+        if self._loop is None:
+            self.start()
+        loop = self._loop
+        current: List[asyncio.Task] = []
+
+        async def step():
+            current[:] = [asyncio.current_task()]
+            return await agen.__anext__()
+
+        async def close():
+            # A step still running (the caller timed out or was interrupted)
+            # must unwind before the generator can be closed
+            if current and not current[0].done():
+                current[0].cancel()
+                await asyncio.wait(current)
+            await agen.aclose()
+
+        try:
+            while True:
+                try:
+                    item = asyncio.run_coroutine_threadsafe(step(), loop).result(timeout)
+                except StopAsyncIteration:
+                    return
+                yield item
+        finally:
+            try:
+                asyncio.run_coroutine_threadsafe(close(), loop).result(30)
+            except Exception as e:
+                logger.warning(f"Failed to close scrape stream: {str(e)}")
+
+    def shutdown(self):
+        """Close all browsers, stop the Playwright driver and the event loop"""
+        with self._start_lock:
+            if self._loop is None:
+                return
+            loop, self._loop = self._loop, None
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown_async(), loop).result(30)
+            except Exception as e:
+                logger.warning(f"Browser pool shutdown error: {str(e)}")
+            self._stop_loop(loop)
+
+    def _stop_loop(self, loop: asyncio.AbstractEventLoop):
+        """Stop the pool event loop, join its thread and drop loop-bound state"""
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=10)
+        if not self._thread.is_alive():
+            loop.close()
+        self._thread = None
+        self._lock = None
+        self._slots = None
+        self._health_task = None
+
+    def stats(self) -> dict:
+        """Snapshot of pool usage for logging and health endpoints"""
+        return {
+            "size": self.size,
+            "browsers": len(self._browsers),
+            "active_leases": sum(b.active_leases for b in self._browsers),
+            "pages_served": sum(b.pages_served for b in self._browsers),
+        }
+
+    @asynccontextmanager
+    async def lease_context(self, **context_options):
+        """Lease a fresh BrowserContext on a warm browser; closed on exit"""
+        async with self._slots:
+            pooled = await self._acquire()
+            context: Optional[BrowserContext] = None
+            try:
+                context = await pooled.manager.create_context(**context_options)
+                context.on("page", lambda _page: pooled.record_page())
+                yield context
+            finally:
+                if context:
+                    try:
+                        await context.close()
+                    except Exception as e:
+                        logger.warning(f"Failed to close leased context: {str(e)}")
+                await self._release(pooled)
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    async def _start_async(self):
+        self._playwright = await async_playwright().start()
+        self._lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(self.size * self.contexts_per_browser)
+        async with self._lock:
+            await self._replenish()
+        self._health_task = asyncio.create_task(self._health_loop())
+        logger.info(f"Browser pool started with {len(self._browsers)} browsers")
+
+    async def _shutdown_async(self):
+        if self._health_task:
+            self._health_task.cancel()
+        async with self._lock:
+            for pooled in self._browsers:
+                await self._close_browser(pooled)
+            self._browsers.clear()
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _launch(self) -> PooledBrowser:
+        manager = BrowserManager(
+            self.headless, self.browser_timeout, self.proxy_list, playwright=self._playwright
+        )
+        await manager.launch_browser()
+        return PooledBrowser(manager)
+
+    async def _replenish(self):
+        """Launch browsers until the pool is back at its configured size (lock held)"""
+        while len([b for b in self._browsers if not b.retired]) < self.size:
+            try:
+                self._browsers.append(await self._launch())
+            except Exception as e:
+                logger.error(f"Failed to launch pooled browser: {str(e)}")
+                break
+
+    async def _acquire(self) -> PooledBrowser:
+        async with self._lock:
+            candidates = [b for b in self._browsers if not b.retired and b.is_healthy()]
+            if not candidates:
+                await self._evict_unhealthy()
+                await self._replenish()
+                candidates = [b for b in self._browsers if not b.retired and b.is_healthy()]
+            if not candidates:
+                raise RuntimeError("No healthy browser available in pool")
+            pooled = min(candidates, key=lambda b: b.active_leases)
+            pooled.active_leases += 1
+            return pooled
+
+    async def _release(self, pooled: PooledBrowser):
+        async with self._lock:
+            pooled.active_leases -= 1
+            if pooled.should_recycle(self.max_pages, self.max_age_seconds):
+                pooled.retired = True
+            if pooled.retired and pooled.active_leases == 0:
+                await self._remove(pooled)
+                await self._replenish()
+
+    async def _evict_unhealthy(self):
+        """Drop disconnected browsers (lock held)"""
+        for pooled in list(self._browsers):
+            if not pooled.is_healthy():
+                pooled.retired = True
+                if pooled.active_leases == 0:
+                    await self._remove(pooled)
+
+    async def _remove(self, pooled: PooledBrowser):
+        if pooled in self._browsers:
+            self._browsers.remove(pooled)
+        await self._close_browser(pooled)
+        logger.info(f"Recycled pooled browser after {pooled.pages_served} pages")
+
+    @staticmethod
+    async def _close_browser(pooled: PooledBrowser):
+        try:
+            await pooled.manager.close()
+        except Exception as e:
+            logger.warning(f"Failed to close pooled browser: {str(e)}")
+
+    async def _health_loop(self):
+        """Periodically evict dead or expired idle browsers and keep the pool warm"""
+        while True:
+            await asyncio.sleep(self.health_check_seconds)
+            try:
+                async with self._lock:
+                    await self._evict_unhealthy()
+                    for pooled in list(self._browsers):
+                        if pooled.should_recycle(self.max_pages, self.max_age_seconds):
+                            pooled.retired = True
+                            if pooled.active_leases == 0:
+                                await self._remove(pooled)
+                    await self._replenish()
+            except Exception as e:
+                logger.error(f"Browser pool health check failed: {str(e)}")
+
+_pool: Optional[BrowserPool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+def get_browser_pool() -> BrowserPool:
+    """Get the browser pool for the current process, creating it after fork"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = BrowserPool()
+            _pool_pid = os.getpid()
+        return _pool
+
+def shutdown_browser_pool():
+    """Shut down this process's browser pool if one was started"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown()
+        _pool = None
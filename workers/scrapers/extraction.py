@@ -0,0 +1,140 @@
+import re
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urljoin
+
+# Runs in the page: reads every field of every card in one evaluate call
+EXTRACT_CARDS_JS = """
+(cards, {fields, limit}) => cards.slice(0, limit || cards.length).map(card => {
+    const out = {};
+    for (const [name, field] of Object.entries(fields)) {
+        const elements = field.selector ? Array.from(card.querySelectorAll(field.selector)) : [card];
+        const read = el => field.attr
+            ? el.getAttribute(field.attr)
+            : (el.innerText || el.textContent || '').trim();
+        out[name] = field.many
+            ? elements.map(read).filter(Boolean)
+            : (elements.length ? read(elements[0]) : null);
+    }
+    return out;
+})
+"""
+
+_MULTIPLIERS = {
+    "rb": 1_000, "ribu": 1_000, "k": 1_000,
+    "jt": 1_000_000, "juta": 1_000_000, "m": 1_000_000,
+}
+
+def _normalize_decimal(number: str) -> Optional[float]:
+    """Parse '1,2' / '4.8' style decimals"""
+    try:
+        return float(number.replace(",", "."))
+    except ValueError:
+        return None
+
+def parse_price(text: Optional[str]) -> Optional[float]:
+    """'Rp1.234.567' -> 1234567.0; ranges like 'Rp10.000 - Rp20.000' take the lower bound"""
+    if not text:
+        return None
+    match = re.search(r"\d[\d.,]*", text)
+    if not match:
+        return None
+    number = match.group(0)
+    # IDR uses '.' as thousands separator and rarely shows cents
+    if re.fullmatch(r"\d{1,3}(\.\d{3})+(,\d+)?", number):
+        number = number.replace(".", "").replace(",", ".")
+    else:
+        number = number.replace(",", "")
+    try:
+        return float(number)
+    except ValueError:
+        return None
+
+def parse_count(text: Optional[str]) -> Optional[int]:
+    """'10RB terjual' -> 10000, '1,2JT+ terjual' -> 1200000, '250 sold' -> 250"""
+    if not text:
+        return None
+    match = re.search(r"(\d+(?:[.,]\d+)?)\s*(rb|ribu|jt|juta|k|m)?\b", text.lower())
+    if not match:
+        return None
+    number, suffix = match.groups()
+    if suffix:
+        value = _normalize_decimal(number)
+        return int(round(value * _MULTIPLIERS[suffix])) if value is not None else None
+    return int(number.replace(".", "").replace(",", ""))
+
+def parse_rating(text: Optional[str]) -> Optional[float]:
+    """'4,8' / '4.8/5' -> 4.8, clamped to a 0-5 scale"""
+    if not text:
+        return None
+    match = re.search(r"\d+(?:[.,]\d+)?", text)
+    if not match:
+        return None
+    value = _normalize_decimal(match.group(0))
+    if value is None or value > 5:
+        return None
+    return value
+
+def parse_percentage(text: Optional[str]) -> Optional[int]:
+    """'-25%' / '25% OFF' -> 25"""
+    if not text:
+        return None
+    match = re.search(r"(\d+)\s*%", text)
+    return int(match.group(1)) if match else None
+
+def parse_text(text: Optional[str]) -> Optional[str]:
+    if text is None:
+        return None
+    text = " ".join(text.split())
+    return text or None
+
+PARSERS: Dict[str, Callable] = {
+    "text": parse_text,
+    "price": parse_price,
+    "count": parse_count,
+    "rating": parse_rating,
+    "percent": parse_percentage,
+}
+
+class Field:
+    """
+    Declarative description of one value inside a card.
+
+    `selector` is relative to the card (None reads the card itself), `attr`
+    reads an attribute instead of text, `many` returns every match, and
+    `type` names the post-processor applied in Python ('url' resolves
+    against the page URL).
+    """
+
+    def __init__(self, selector: Optional[str] = None, attr: Optional[str] = None,
+                 type: str = "text", many: bool = False):
+        self.selector = selector
+        self.attr = attr
+        self.type = type
+        self.many = many
+
+    def to_js(self) -> dict:
+        return {"selector": self.selector, "attr": self.attr, "many": self.many}
+
+    def parse(self, raw, base_url: Optional[str] = None):
+        if self.many:
+            return [value for value in (self._parse_one(item, base_url) for item in raw or []) if value]
+        return self._parse_one(raw, base_url)
+
+    def _parse_one(self, raw, base_url: Optional[str]):
+        if self.type == "url":
+            return urljoin(base_url, raw) if raw and base_url else raw
+        if self.type == "raw":
+            return raw
+        return PARSERS[self.type](raw)
+
+def compile_fields(fields: Dict[str, Field]) -> dict:
+    """Serialize a field spec map for EXTRACT_CARDS_JS"""
+    return {name: field.to_js() for name, field in fields.items()}
+
+def parse_cards(raw_cards: List[dict], fields: Dict[str, Field],
+                base_url: Optional[str] = None) -> List[dict]:
+    """Apply typed post-processing to the raw dicts returned from the page"""
+    return [
+        {name: field.parse(card.get(name), base_url) for name, field in fields.items()}
+        for card in raw_cards
+    ]
@@ -0,0 +1,38 @@
+import asyncio
+import logging
+import re
+from typing import List, Tuple
+
+from playwright.async_api import Response
+
+logger = logging.getLogger(__name__)
+
+class ApiCapture:
+    """Collects JSON bodies of responses whose URL matches the platform's API patterns"""
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = [re.compile(pattern) for pattern in patterns]
+        self.payloads: List[Tuple[str, object]] = []
+        self.ready = asyncio.Event()
+
+    def matches(self, url: str) -> bool:
+        return any(pattern.search(url) for pattern in self.patterns)
+
+    async def on_response(self, response: Response):
+        if not self.matches(response.url):
+            return
+        try:
+            payload = await response.json()
+        except Exception as e:
+            logger.debug(f"Ignoring non-JSON API response {response.url}: {str(e)}")
+            return
+        self.payloads.append((response.url, payload))
+        self.ready.set()
+
+    async def wait(self, timeout_ms: int) -> List[Tuple[str, object]]:
+        """Wait for the first matching payload; returns whatever was captured"""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            pass
+        return list(self.payloads)
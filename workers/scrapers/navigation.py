@@ -0,0 +1,202 @@
+import logging
+import re
+import threading
+import time
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+from playwright.async_api import BrowserContext, Page, Response, Route
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_DOMAINS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "connect.facebook.net",
+    "analytics.tiktok.com",
+    "mon.tiktokv.com",
+    "criteo.com",
+    "hotjar.com",
+]
+
+ANALYTICS_URL_PATTERNS = [
+    r"facebook\.com/tr",
+    r"/(collect|track|beacon|log)(\?|/|$)",
+]
+
+# Assumed typical transfer sizes per resource type. An aborted request never
+# reports its size, so estimated_bytes_saved is these constants summed, not a measurement.
+ESTIMATED_BYTES = {
+    "image": 40_000,
+    "media": 500_000,
+    "font": 30_000,
+    "stylesheet": 20_000,
+    "script": 50_000,
+}
+DEFAULT_ESTIMATED_BYTES = 5_000
+
+# Assumed cost of the fixed networkidle wait every page used to pay (its timeout,
+# i.e. the worst case). estimated_time_saved_ms is this minus the measured settle
+# time, so it is an upper-bound estimate, not a before/after measurement.
+LEGACY_SETTLE_BUDGET_MS = 10000
+
+class NavigationStats:
+    """
+    Running totals of what a profile blocked, transferred and how fast pages
+    became ready. Counts, transferred bytes and timings are measured; the
+    estimated_* fields are derived from the assumed constants above.
+    """
+
+    def __init__(self):
+        self.navigations = 0
+        self.blocked_requests = 0
+        self.estimated_bytes_saved = 0
+        self.bytes_transferred = 0
+        self.ready_ms = 0.0
+        self.settle_ms = 0.0
+        self.estimated_time_saved_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record_blocked(self, resource_type: str):
+        with self._lock:
+            self.blocked_requests += 1
+            self.estimated_bytes_saved += ESTIMATED_BYTES.get(resource_type, DEFAULT_ESTIMATED_BYTES)
+
+    def record_transferred(self, size: int):
+        with self._lock:
+            self.bytes_transferred += size
+
+    def record_navigation(self, ready_ms: float, settle_ms: float):
+        with self._lock:
+            self.navigations += 1
+            self.ready_ms += ready_ms
+            self.settle_ms += settle_ms
+            self.estimated_time_saved_ms += max(0.0, LEGACY_SETTLE_BUDGET_MS - settle_ms)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "navigations": self.navigations,
+                "blocked_requests": self.blocked_requests,
+                "estimated_bytes_saved": self.estimated_bytes_saved,
+                "bytes_transferred": self.bytes_transferred,
+                "avg_ready_ms": round(self.ready_ms / self.navigations, 1) if self.navigations else None,
+                "avg_settle_ms": round(self.settle_ms / self.navigations, 1) if self.navigations else None,
+                "estimated_time_saved_ms": round(self.estimated_time_saved_ms),
+            }
+
+class NavigationProfile:
+    """
+    How a context loads pages: which requests to abort, when a page counts
+    as ready, and whether JavaScript runs at all.
+    """
+
+    def __init__(self, name: str, blocked_resource_types: Iterable[str] = (),
+                 blocked_domains: Iterable[str] = (), blocked_url_patterns: Iterable[str] = (),
+                 wait_until: str = "domcontentloaded", settle_state: Optional[str] = "networkidle",
+                 settle_timeout_ms: int = 10000, javascript_enabled: bool = True):
+        self.name = name
+        self.blocked_resource_types = set(blocked_resource_types)
+        self.blocked_domains = tuple(blocked_domains)
+        self.blocked_url_patterns = [re.compile(pattern) for pattern in blocked_url_patterns]
+        self.wait_until = wait_until
+        self.settle_state = settle_state
+        self.settle_timeout_ms = settle_timeout_ms
+        self.javascript_enabled = javascript_enabled
+
+    @property
+    def filters_requests(self) -> bool:
+        return bool(self.blocked_resource_types or self.blocked_domains or self.blocked_url_patterns)
+
+    def context_options(self) -> dict:
+        return {"java_script_enabled": self.javascript_enabled}
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        if resource_type in self.blocked_resource_types:
+            return True
+        host = urlparse(url).hostname or ""
+        if any(host == domain or host.endswith(f".{domain}") for domain in self.blocked_domains):
+            return True
+        return any(pattern.search(url) for pattern in self.blocked_url_patterns)
+
+    async def attach(self, context: BrowserContext, stats: NavigationStats):
+        """Install request filtering and transfer accounting on a new context"""
+        if self.filters_requests:
+            async def handle(route: Route):
+                request = route.request
+                if self.should_block(request.url, request.resource_type):
+                    stats.record_blocked(request.resource_type)
+                    await route.abort()
+                else:
+                    await route.continue_()
+
+            await context.route("**/*", handle)
+
+        def on_response(response: Response):
+            length = response.headers.get("content-length")
+            if length and length.isdigit():
+                stats.record_transferred(int(length))
+
+        context.on("response", on_response)
+
+    async def wait_until_ready(self, page: Page, stats: NavigationStats, started: float,
+                               selector: Optional[str] = None, skip_settle: bool = False):
+        """
+        Finish as soon as the target selector appears; without one, wait for
+        the settle state (unless the caller has its own readiness signal).
+        `started` is when the page was opened, for the total ready time.
+        """
+        settle_started = time.monotonic()
+        try:
+            if selector:
+                await page.wait_for_selector(selector, timeout=self.settle_timeout_ms)
+            elif self.settle_state and not skip_settle:
+                await page.wait_for_load_state(self.settle_state, timeout=self.settle_timeout_ms)
+        except Exception as e:
+            logger.debug(f"Page not ready within {self.settle_timeout_ms}ms: {str(e)}")
+        now = time.monotonic()
+        stats.record_navigation((now - started) * 1000, (now - settle_started) * 1000)
+
+NAVIGATION_PROFILES: Dict[str, NavigationProfile] = {
+    # The original behaviour: everything loads, wait for networkidle
+    "full": NavigationProfile("full"),
+    # Marketplace listings: no images/fonts/media/trackers, stop at the target selector
+    "lightweight": NavigationProfile(
+        "lightweight",
+        blocked_resource_types={"image", "media", "font"},
+        blocked_domains=ANALYTICS_DOMAINS,
+        blocked_url_patterns=ANALYTICS_URL_PATTERNS,
+        settle_timeout_ms=8000,
+    ),
+    # Server-rendered pages: no JavaScript, nothing to settle
+    "static": NavigationProfile(
+        "static",
+        blocked_resource_types={"image", "media", "font", "script", "stylesheet"},
+        blocked_domains=ANALYTICS_DOMAINS,
+        settle_state=None,
+        javascript_enabled=False,
+    ),
+}
+
+_stats: Dict[str, NavigationStats] = {}
+_stats_lock = threading.Lock()
+
+def get_profile(name: Optional[str], default: str = "full") -> NavigationProfile:
+    """Look up a profile by name, falling back to `default` for unknown names"""
+    if name and name not in NAVIGATION_PROFILES:
+        logger.warning(f"Unknown navigation profile '{name}', using '{default}'")
+    return NAVIGATION_PROFILES.get(name or default) or NAVIGATION_PROFILES[default]
+
+def get_stats(platform: str, profile: NavigationProfile) -> NavigationStats:
+    """Process-wide stats bucket for a (platform, profile) pair"""
+    key = f"{platform}:{profile.name}"
+    with _stats_lock:
+        if key not in _stats:
+            _stats[key] = NavigationStats()
+        return _stats[key]
+
+def navigation_report() -> Dict[str, dict]:
+    """All stats buckets recorded by this process, for tuning profiles per platform"""
+    with _stats_lock:
+        return {key: stats.to_dict() for key, stats in _stats.items()}
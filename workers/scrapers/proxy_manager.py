@@ -0,0 +1,335 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from app.core.config import settings
+from .state import get_async_redis, use_redis
+
+logger = logging.getLogger(__name__)
+
+# Responses that mean the target is refusing this proxy
+BAN_STATUS_CODES = {403, 429}
+CAPTCHA_URL_MARKERS = ["captcha", "/verify/", "/challenge"]
+
+LATENCY_SAMPLES = 100
+DEFAULT_LATENCY_MS = 1000.0
+# Floor so a handful of very fast samples cannot monopolise selection
+MIN_LATENCY_MS = 50.0
+
+# Take an in-flight slot: drop expired leases, then add ours if under the cap.
+# Leases are ZSET members scored by their deadline, so a worker killed
+# mid-request loses its slot when the lease runs out instead of leaking it.
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then return 0 end
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[4])
+redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[3])))
+return 1
+"""
+
+def is_ban_signal(status: Optional[int], url: str) -> bool:
+    """True for throttling/forbidden responses or a redirect to a captcha page"""
+    if status in BAN_STATUS_CODES:
+        return True
+    return any(marker in (url or "").lower() for marker in CAPTCHA_URL_MARKERS)
+
+def percentile(samples: List[float], fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class ProxyState:
+    """Health snapshot of one proxy"""
+
+    def __init__(self, proxy: str, successes: int = 0, failures: int = 0, bans: int = 0,
+                 consecutive_failures: int = 0, inflight: int = 0, cooldown_until: float = 0.0,
+                 latencies: Optional[List[float]] = None):
+        self.proxy = proxy
+        self.successes = successes
+        self.failures = failures
+        self.bans = bans
+        self.consecutive_failures = consecutive_failures
+        self.inflight = inflight
+        self.cooldown_until = cooldown_until
+        self.latencies = latencies or []
+
+    @property
+    def success_rate(self) -> float:
+        # Laplace smoothing so new proxies start at 0.5 instead of 0 or 1
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+    @property
+    def p50(self) -> Optional[float]:
+        return percentile(self.latencies, 0.5)
+
+    @property
+    def p95(self) -> Optional[float]:
+        return percentile(self.latencies, 0.95)
+
+    def cooling_down(self, now: float) -> bool:
+        return self.cooldown_until > now
+
+    def score(self) -> float:
+        """Higher is better: success rate per second of median latency"""
+        return self.success_rate / (max(self.p50 or DEFAULT_LATENCY_MS, MIN_LATENCY_MS) / 1000)
+
+    def to_dict(self) -> dict:
+        return {
+            "proxy": self.proxy,
+            "success_rate": round(self.success_rate, 3),
+            "p50_ms": self.p50,
+            "p95_ms": self.p95,
+            "bans": self.bans,
+            "inflight": self.inflight,
+            "cooldown_until": self.cooldown_until,
+        }
+
+class InMemoryProxyStore:
+    """Process-local proxy state, for tests and single-worker setups"""
+
+    def __init__(self):
+        self._states: Dict[str, ProxyState] = {}
+
+    def _state(self, proxy: str) -> ProxyState:
+        if proxy not in self._states:
+            self._states[proxy] = ProxyState(proxy)
+        return self._states[proxy]
+
+    async def snapshot(self, proxies: List[str]) -> Dict[str, ProxyState]:
+        return {proxy: self._state(proxy) for proxy in proxies}
+
+    async def try_acquire(self, proxy: str, max_inflight: int) -> Optional[str]:
+        """A lease id for one in-flight slot, or None when the proxy is saturated"""
+        state = self._state(proxy)
+        if state.inflight >= max_inflight:
+            return None
+        state.inflight += 1
+        return uuid.uuid4().hex
+
+    async def release(self, proxy: str, lease: str):
+        state = self._state(proxy)
+        state.inflight = max(0, state.inflight - 1)
+
+    async def record(self, proxy: str, success: bool, latency_ms: Optional[float], banned: bool) -> ProxyState:
+        state = self._state(proxy)
+        if success:
+            state.successes += 1
+            state.consecutive_failures = 0
+        else:
+            state.failures += 1
+            state.consecutive_failures += 1
+        if banned:
+            state.bans += 1
+        if latency_ms is not None:
+            state.latencies = (state.latencies + [latency_ms])[-LATENCY_SAMPLES:]
+        return state
+
+    async def set_cooldown(self, proxy: str, until: float):
+        self._state(proxy).cooldown_until = until
+
+class RedisProxyStore:
+    """Proxy state shared by every worker through Redis"""
+
+    KEY_PREFIX = "proxy"
+    # Counters age out so a long-dead proxy gets a fresh start eventually
+    TTL_SECONDS = 24 * 3600
+
+    def __init__(self, lease_seconds: Optional[int] = None):
+        # Longest a request may hold its in-flight slot before it is presumed dead
+        self.lease_seconds = lease_seconds or settings.PROXY_LEASE_SECONDS
+
+    def _key(self, proxy: str) -> str:
+        return f"{self.KEY_PREFIX}:{proxy}"
+
+    def _leases_key(self, proxy: str) -> str:
+        return f"{self._key(proxy)}:leases"
+
+    async def snapshot(self, proxies: List[str]) -> Dict[str, ProxyState]:
+        redis = get_async_redis()
+        now = time.time()
+        async with redis.pipeline(transaction=False) as pipe:
+            for proxy in proxies:
+                pipe.hgetall(self._key(proxy))
+                pipe.lrange(f"{self._key(proxy)}:latency", 0, LATENCY_SAMPLES - 1)
+                pipe.zcount(self._leases_key(proxy), now, "+inf")
+            replies = await pipe.execute()
+
+        states = {}
+        for index, proxy in enumerate(proxies):
+            fields, latencies, inflight = replies[3 * index:3 * index + 3]
+            states[proxy] = ProxyState(
+                proxy,
+                successes=int(fields.get("successes", 0)),
+                failures=int(fields.get("failures", 0)),
+                bans=int(fields.get("bans", 0)),
+                consecutive_failures=int(fields.get("consecutive_failures", 0)),
+                inflight=int(inflight),
+                cooldown_until=float(fields.get("cooldown_until", 0)),
+                latencies=[float(value) for value in latencies],
+            )
+        return states
+
+    async def try_acquire(self, proxy: str, max_inflight: int) -> Optional[str]:
+        """A lease id for one in-flight slot, or None when the proxy is saturated"""
+        lease = uuid.uuid4().hex
+        acquired = await get_async_redis().eval(
+            ACQUIRE_SCRIPT, 1, self._leases_key(proxy), time.time(), max_inflight, self.lease_seconds, lease
+        )
+        return lease if int(acquired) else None
+
+    async def release(self, proxy: str, lease: str):
+        await get_async_redis().zrem(self._leases_key(proxy), lease)
+
+    async def record(self, proxy: str, success: bool, latency_ms: Optional[float], banned: bool) -> ProxyState:
+        redis = get_async_redis()
+        key = self._key(proxy)
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hincrby(key, "successes" if success else "failures", 1)
+            if success:
+                pipe.hset(key, "consecutive_failures", 0)
+            else:
+                pipe.hincrby(key, "consecutive_failures", 1)
+            if banned:
+                pipe.hincrby(key, "bans", 1)
+            if latency_ms is not None:
+                pipe.lpush(f"{key}:latency", latency_ms)
+                pipe.ltrim(f"{key}:latency", 0, LATENCY_SAMPLES - 1)
+                pipe.expire(f"{key}:latency", self.TTL_SECONDS)
+            pipe.expire(key, self.TTL_SECONDS)
+            await pipe.execute()
+        return (await self.snapshot([proxy]))[proxy]
+
+    async def set_cooldown(self, proxy: str, until: float):
+        await get_async_redis().hset(self._key(proxy), "cooldown_until", until)
+
+class ProxyOutcome:
+    """Filled in by the caller while a tracked request is in flight"""
+
+    def __init__(self):
+        self.status: Optional[int] = None
+        self.url: str = ""
+
+    def observe(self, response, url: str):
+        self.status = response.status if response else None
+        self.url = url
+
+    @property
+    def banned(self) -> bool:
+        return is_ban_signal(self.status, self.url)
+
+    @property
+    def success(self) -> bool:
+        return self.status is not None and self.status < 400 and not self.banned
+
+class ProxyManager:
+    """
+    Assigns proxies to browser contexts and scores them from request outcomes.
+
+    Selection prefers healthy proxies with the best success rate per unit of
+    median latency (weighted-random, so load still spreads). Bans and runs of
+    failures put a proxy on cooldown; in-flight requests per proxy are capped.
+    """
+
+    def __init__(self, proxies: Optional[List[str]] = None, store=None,
+                 max_inflight: Optional[int] = None, cooldown_seconds: Optional[int] = None,
+                 ban_cooldown_seconds: Optional[int] = None, failure_threshold: Optional[int] = None):
+        self.proxies = [p.strip() for p in (proxies if proxies is not None else settings.PROXY_LIST) if p.strip()]
+        self.store = store or (RedisProxyStore() if use_redis(settings.PROXY_STATE_BACKEND) else InMemoryProxyStore())
+        self.max_inflight = max_inflight or settings.PROXY_MAX_INFLIGHT
+        self.cooldown_seconds = cooldown_seconds or settings.PROXY_COOLDOWN_SECONDS
+        self.ban_cooldown_seconds = ban_cooldown_seconds or settings.PROXY_BAN_COOLDOWN_SECONDS
+        self.failure_threshold = failure_threshold or settings.PROXY_FAILURE_THRESHOLD
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.proxies)
+
+    async def choose(self) -> Optional[str]:
+        """Pick a proxy for a new context, or None when no proxies are configured"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        states = await self.store.snapshot(self.proxies)
+        candidates = [
+            state for state in states.values()
+            if not state.cooling_down(now) and state.inflight < self.max_inflight
+        ]
+        if not candidates:
+            # Everything is cooling down or saturated: least-bad beats failing the task
+            candidates = sorted(states.values(), key=lambda s: (s.cooldown_until, s.inflight))[:1]
+        weights = [state.score() for state in candidates]
+        return random.choices(candidates, weights=weights)[0].proxy
+
+    @asynccontextmanager
+    async def track(self, proxy: Optional[str], wait_seconds: float = 30.0):
+        """
+        Hold one in-flight slot on `proxy` around a request and record its
+        outcome. The body calls `outcome.observe(response, page.url)`.
+        """
+        outcome = ProxyOutcome()
+        if proxy is None:
+            yield outcome
+            return
+
+        deadline = time.monotonic() + wait_seconds
+        lease = await self.store.try_acquire(proxy, self.max_inflight)
+        while lease is None and time.monotonic() < deadline:
+            await asyncio.sleep(0.2 + random.random() * 0.3)
+            lease = await self.store.try_acquire(proxy, self.max_inflight)
+        if lease is None:
+            logger.warning(f"Proxy {proxy} saturated, proceeding over its in-flight cap")
+
+        started = time.monotonic()
+        try:
+            yield outcome
+        except Exception:
+            await self.report(proxy, False, None, False)
+            raise
+        else:
+            await self.report(proxy, outcome.success, (time.monotonic() - started) * 1000, outcome.banned)
+        finally:
+            if lease is not None:
+                await self.store.release(proxy, lease)
+
+    async def report(self, proxy: str, success: bool, latency_ms: Optional[float], banned: bool):
+        """Record an outcome and start a cooldown on bans or repeated failures"""
+        state = await self.store.record(proxy, success, latency_ms if success else None, banned)
+        if banned:
+            await self.store.set_cooldown(proxy, time.time() + self.ban_cooldown_seconds)
+            logger.warning(f"Proxy {proxy} banned, cooling down for {self.ban_cooldown_seconds}s")
+        elif state.consecutive_failures >= self.failure_threshold:
+            await self.store.set_cooldown(proxy, time.time() + self.cooldown_seconds)
+            logger.warning(f"Proxy {proxy} failed {state.consecutive_failures} times, cooling down")
+
+    async def report_all(self) -> List[dict]:
+        """Health of every configured proxy"""
+        states = await self.store.snapshot(self.proxies)
+        return [state.to_dict() for state in states.values()]
+
+def proxy_settings(proxy: str) -> dict:
+    """Playwright proxy option from a URL that may carry credentials"""
+    parsed = urlparse(proxy if "://" in proxy else f"http://{proxy}")
+    options = {"server": f"{parsed.scheme}://{parsed.hostname}" + (f":{parsed.port}" if parsed.port else "")}
+    if parsed.username:
+        options["username"] = parsed.username
+        options["password"] = parsed.password or ""
+    return options
+
+_manager: Optional[ProxyManager] = None
+_manager_lock = threading.Lock()
+
+def get_proxy_manager() -> ProxyManager:
+    """Process-wide proxy manager"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ProxyManager()
+        return _manager
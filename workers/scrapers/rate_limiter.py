@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from .state import get_async_redis, use_redis
+
+logger = logging.getLogger(__name__)
+
+# Reserve one token and return how long the caller must wait for it. Tokens may
+# go negative: callers queue up behind each other instead of polling.
+RESERVE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local rate = tonumber(redis.call('HGET', KEYS[1], 'rate')) or tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens')) or burst
+local ts = tonumber(redis.call('HGET', KEYS[1], 'ts')) or now
+tokens = math.min(burst, tokens + (now - ts) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 3600)
+if tokens >= 0 then return '0' end
+return tostring(-tokens / rate)
+"""
+
+# Multiply (penalty) or add to (reward) the bucket's rate, clamped to [min, max]
+ADJUST_SCRIPT = """
+local rate = tonumber(redis.call('HGET', KEYS[1], 'rate')) or tonumber(ARGV[1])
+local new_rate = rate * tonumber(ARGV[2]) + tonumber(ARGV[3])
+new_rate = math.max(tonumber(ARGV[4]), math.min(tonumber(ARGV[5]), new_rate))
+redis.call('HSET', KEYS[1], 'rate', new_rate)
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(new_rate)
+"""
+
+class LocalBucketStore:
+    """In-process token buckets, the stand-in when Redis is not used"""
+
+    def __init__(self):
+        self._buckets: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    async def reserve(self, key: str, default_rate: float, burst: float) -> float:
+        now = time.time()
+        with self._lock:
+            bucket = self._buckets.setdefault(key, {"rate": default_rate, "tokens": burst, "ts": now})
+            tokens = min(burst, bucket["tokens"] + (now - bucket["ts"]) * bucket["rate"]) - 1
+            bucket.update(tokens=tokens, ts=now)
+            return 0.0 if tokens >= 0 else -tokens / bucket["rate"]
+
+    async def adjust(self, key: str, default_rate: float, factor: float, increment: float,
+                     min_rate: float, max_rate: float) -> float:
+        with self._lock:
+            bucket = self._buckets.setdefault(key, {"rate": default_rate, "tokens": 1.0, "ts": time.time()})
+            bucket["rate"] = max(min_rate, min(max_rate, bucket["rate"] * factor + increment))
+            return bucket["rate"]
+
+class RedisBucketStore:
+    """Token buckets shared by every worker, updated atomically with Lua"""
+
+    async def reserve(self, key: str, default_rate: float, burst: float) -> float:
+        wait = await get_async_redis().eval(RESERVE_SCRIPT, 1, key, time.time(), default_rate, burst)
+        return float(wait)
+
+    async def adjust(self, key: str, default_rate: float, factor: float, increment: float,
+                     min_rate: float, max_rate: float) -> float:
+        rate = await get_async_redis().eval(
+            ADJUST_SCRIPT, 1, key, default_rate, factor, increment, min_rate, max_rate
+        )
+        return float(rate)
+
+class RateLimiter:
+    """
+    Paces navigations per platform and per (platform, proxy) pair.
+
+    Rates adapt AIMD-style: a 429/captcha halves the affected buckets, each
+    clean response nudges them back up towards the configured ceiling.
+    """
+
+    KEY_PREFIX = "ratelimit"
+
+    def __init__(self, store=None, platform_rates: Optional[Dict[str, float]] = None,
+                 proxy_rate: Optional[float] = None, burst: Optional[float] = None):
+        self.store = store or (RedisBucketStore() if use_redis(settings.RATE_LIMIT_BACKEND) else LocalBucketStore())
+        self.platform_rates = platform_rates or settings.PLATFORM_RATE_LIMITS
+        self.proxy_rate = proxy_rate or settings.PROXY_RATE_LIMIT
+        self.burst = burst or settings.RATE_LIMIT_BURST
+
+    def _buckets(self, platform: str, proxy: Optional[str]) -> List[tuple]:
+        """(key, configured rate) for every bucket a request draws from"""
+        platform_rate = self.platform_rates.get(platform, settings.DEFAULT_PLATFORM_RATE_LIMIT)
+        buckets = [(f"{self.KEY_PREFIX}:{platform}", platform_rate)]
+        if proxy:
+            buckets.append((f"{self.KEY_PREFIX}:{platform}:{proxy}", self.proxy_rate))
+        return buckets
+
+    async def acquire(self, platform: str, proxy: Optional[str] = None):
+        """Wait until the platform (and proxy) buckets allow one more navigation"""
+        waits = [
+            await self.store.reserve(key, rate, self.burst)
+            for key, rate in self._buckets(platform, proxy)
+        ]
+        wait = max(waits)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def penalize(self, platform: str, proxy: Optional[str] = None):
+        """Back off after a throttling or captcha signal"""
+        for key, rate in self._buckets(platform, proxy):
+            new_rate = await self.store.adjust(
+                key, rate, settings.RATE_LIMIT_BACKOFF_FACTOR, 0.0,
+                rate * settings.RATE_LIMIT_MIN_FACTOR, rate
+            )
+            logger.warning(f"Rate limit {key} reduced to {new_rate:.3f}/s")
+
+    async def reward(self, platform: str, proxy: Optional[str] = None):
+        """Recover towards the configured rate after a clean response"""
+        for key, rate in self._buckets(platform, proxy):
+            await self.store.adjust(
+                key, rate, 1.0, rate * settings.RATE_LIMIT_RECOVERY_STEP,
+                rate * settings.RATE_LIMIT_MIN_FACTOR, rate
+            )
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide rate limiter"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
@@ -1,122 +1,188 @@
-from typing import List
+import asyncio
+import re
+from typing import AsyncIterator, List, Optional
+from urllib.parse import quote
 import logging
-from playwright.async_api import BrowserContext, Page
+from playwright.async_api import BrowserContext, Page, TimeoutError as PlaywrightTimeoutError
 from .base_scraper import BaseScraper
+from .extraction import Field, parse_percentage
 
 logger = logging.getLogger(__name__)
 
+# Product URLs end in "-i.<shop_id>.<item_id>"
+ITEM_URL_PATTERN = re.compile(r"i\.(\d+)\.(\d+)")
+
 class ShopeeScraper(BaseScraper):
     """Shopee platform scraper"""
     
     SHOPEE_BASE_URL = "https://shopee.co.id"
+    PLATFORM = "shopee"
+    NAVIGATION_PROFILE = "lightweight"
     
-    async def search_keyword(self, context: BrowserContext, keyword: str) -> List[dict]:
-        """Search products by keyword on Shopee"""
-        search_url = f"{self.SHOPEE_BASE_URL}/search?keyword={keyword}"
-        page = await self.get_page(context, search_url)
-        
-        try:
-            # Wait for product list to load
-            await page.wait_for_selector('[data-sqe="product"]', timeout=10000)
-            
-            # Extract product data
-            products = await page.query_selector_all('[data-sqe="product"]')
-            results = []
-            
-            for product_element in products[:50]:  # Limit to 50 products
-                try:
-                    product_data = await self._extract_product_data(product_element)
-                    if product_data:
-                        results.append(product_data)
-                except Exception as e:
-                    logger.warning(f"Failed to extract product data: {str(e)}")
-            
-            await page.close()
-            return results
-        
-        except Exception as e:
-            logger.error(f"Error searching Shopee: {str(e)}")
-            await page.close()
-            return []
+    PRODUCT_CARD_SELECTOR = '[data-sqe="product"]'
+    PRODUCT_FIELDS = {
+        "item_id": Field(attr="data-itemid", type="raw"),
+        "product_url": Field("a", attr="href", type="url"),
+        "product_name": Field('[data-sqe="name"]'),
+        "price": Field('[class*="price"]:not([class*="original"])', type="price"),
+        "original_price": Field('[class*="original-price"]', type="price"),
+        "discount_percentage": Field('[class*="discount"]', type="percent"),
+        "sold_count": Field('[class*="sold"]', type="count"),
+        "rating": Field('[class*="rating"]', type="rating"),
+        "shop_location": Field('[class*="location"]'),
+        "image_urls": Field("img", attr="src", type="url", many=True),
+    }
+    
+    API_RESPONSE_PATTERNS = [
+        r"/api/v4/search/search_items",
+        r"/api/v4/shop/(search_items|rcmd_items)",
+        r"/api/v4/recommend/recommend",
+    ]
+    IMAGE_BASE_URL = "https://down-id.img.susercontent.com/file"
+    # API prices are integers scaled by 100000
+    API_PRICE_SCALE = 100000
     
-    async def monitor_shop(self, context: BrowserContext, shop_id: str) -> List[dict]:
-        """Monitor Shopee shop"""
+    DETAIL_ROOT_SELECTOR = ".page-product"
+    DETAIL_FIELDS = {
+        "description": Field(".product-detail"),
+        "category": Field(".page-product__breadcrumb a:last-child"),
+        "shop_name": Field(".page-product__shop .shop-name"),
+        "review_count": Field('[class*="rating-count"]', type="count"),
+    }
+    
+    def search_keyword(self, context: BrowserContext, keyword: str, max_pages: int = 1,
+                       concurrency: int = 1, include_details: bool = False) -> AsyncIterator[List[dict]]:
+        """Search products by keyword on Shopee, crawling result pages concurrently"""
+        search_url = f"{self.SHOPEE_BASE_URL}/search?keyword={quote(keyword)}"
+        urls = [search_url] + [f"{search_url}&page={n}" for n in range(1, max_pages)]
+        return self._crawl_listing(context, urls, concurrency, include_details)
+    
+    def monitor_shop(self, context: BrowserContext, shop_id: str, max_pages: int = 1,
+                     concurrency: int = 1, include_details: bool = False) -> AsyncIterator[List[dict]]:
+        """Monitor Shopee shop, crawling catalog pages concurrently"""
         shop_url = f"{self.SHOPEE_BASE_URL}/shop/{shop_id}"
-        page = await self.get_page(context, shop_url)
+        urls = [shop_url] + [f"{shop_url}/search?page={n}" for n in range(1, max_pages)]
+        return self._crawl_listing(context, urls, concurrency, include_details)
+    
+    async def _crawl_listing(self, context: BrowserContext, urls: List[str], concurrency: int,
+                             include_details: bool) -> AsyncIterator[List[dict]]:
+        """
+        Crawl listing pages, optionally enriching each page's products from
+        their detail pages, and yield each page's products once it is done
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        # Pages a previous attempt already delivered are skipped
+        urls = self.pending_pages(urls)
         
         try:
-            await page.wait_for_selector('[data-sqe="product"]', timeout=10000)
-            products = await page.query_selector_all('[data-sqe="product"]')
-            results = []
-            
-            for product_element in products:
-                try:
-                    product_data = await self._extract_product_data(product_element)
-                    if product_data:
-                        results.append(product_data)
-                except Exception as e:
-                    logger.warning(f"Failed to extract product data: {str(e)}")
-            
-            await page.close()
-            return results
+            # With interception the API payload is the readiness signal, not the cards
+            wait_for = None if self.intercepting else self.PRODUCT_CARD_SELECTOR
+            async for url, products, error in self.crawl_pages(context, urls, self.extract_listing,
+                                                               semaphore, wait_for):
+                if error is not None:
+                    # Not checkpointed: the retry crawls it again
+                    self.page_failed(url, error)
+                    continue
+                if include_details and products:
+                    products = await self._add_details(context, products, semaphore)
+                logger.info(f"Crawled {url}: {len(products)} products")
+                self.page_done(url, products)
+                yield products
         
         except Exception as e:
-            logger.error(f"Error monitoring shop: {str(e)}")
-            await page.close()
-            return []
+            logger.error(f"Error crawling Shopee: {str(e)}")
+            raise
+    
+    async def _add_details(self, context: BrowserContext, products: List[dict],
+                           semaphore: asyncio.Semaphore) -> List[dict]:
+        """
+        Merge detail page fields into listing products, sharing the task's
+        page limit. Details are best-effort: a product whose detail page
+        fails keeps its listing fields (the upsert leaves stored details alone).
+        """
+        by_url = {p["product_url"]: p for p in products if p.get("product_url")}
+        async for url, details, error in self.crawl_pages(context, list(by_url), self._extract_detail_data,
+                                                          semaphore, self.DETAIL_ROOT_SELECTOR):
+            if error is not None:
+                logger.warning(f"No details for {url}: {str(error)}")
+            elif details:
+                by_url[url].update({k: v for k, v in details[0].items() if v is not None})
+        return products
     
     async def extract_data(self, page: Page) -> List[dict]:
-        """Extract data from direct URL"""
+        """
+        Extract every product card on a listing page in one round trip. A page
+        without cards is empty; any other error fails the page.
+        """
         try:
-            await page.wait_for_selector('[data-sqe="product"]', timeout=10000)
-            products = await page.query_selector_all('[data-sqe="product"]')
-            results = []
-            
-            for product_element in products:
-                try:
-                    product_data = await self._extract_product_data(product_element)
-                    if product_data:
-                        results.append(product_data)
-                except Exception as e:
-                    logger.warning(f"Failed to extract product data: {str(e)}")
-            
-            return results
-        
-        except Exception as e:
-            logger.error(f"Error extracting data: {str(e)}")
+            await page.wait_for_selector(self.PRODUCT_CARD_SELECTOR, timeout=10000)
+        except PlaywrightTimeoutError:
+            logger.info(f"No product cards on {page.url}")
             return []
+        cards = await self.extract_cards(page, self.PRODUCT_CARD_SELECTOR, self.PRODUCT_FIELDS)
+        return [product for product in map(self._finalize_product, cards) if product]
     
-    async def _extract_product_data(self, element) -> dict:
-        """Extract single product data"""
-        try:
-            # Mock implementation - replace with actual selectors
-            product_data = {
-                "external_id": await element.get_attribute("data-itemid") or "mock_id",
-                "product_name": await self._get_text(element, '.product-name') or "Product Name",
-                "price": 50000.0,
-                "original_price": None,
-                "discount_percentage": None,
-                "sold_count": 1000,
-                "rating": 4.5,
-                "review_count": 250,
-                "shop_name": "Shop Name",
-                "shop_location": "Indonesia",
-                "product_url": "https://shopee.co.id/product",
-                "image_urls": ["https://example.com/image.jpg"],
-                "category": "Electronics",
-                "raw_data": {}
-            }
-            return product_data
-        except Exception as e:
-            logger.error(f"Error extracting product data: {str(e)}")
-            return None
+    async def _extract_detail_data(self, page: Page) -> List[dict]:
+        """Extract extra fields from a product detail page"""
+        await page.wait_for_selector(self.DETAIL_ROOT_SELECTOR, timeout=10000)
+        return await self.extract_cards(page, self.DETAIL_ROOT_SELECTOR, self.DETAIL_FIELDS, limit=1)
     
-    async def _get_text(self, element, selector: str) -> str:
-        """Safely get text from element"""
-        try:
-            text_element = await element.query_selector(selector)
-            if text_element:
-                return await text_element.inner_text()
-        except:
-            pass
-        return None
+    def map_api_payload(self, url: str, payload) -> List[dict]:
+        """Map search/shop API items into product dicts"""
+        if not isinstance(payload, dict):
+            return []
+        data = payload.get("data") if isinstance(payload.get("data"), dict) else {}
+        items = list(payload.get("items") or data.get("items") or [])
+        for section in data.get("sections") or []:
+            items.extend((section.get("data") or {}).get("item") or [])
+        
+        results = []
+        for item in items:
+            basic = item.get("item_basic") or item
+            if basic.get("itemid") is None:
+                continue
+            results.append(self._map_api_item(basic))
+        return results
+    
+    def _map_api_item(self, item: dict) -> dict:
+        rating = item.get("item_rating") or {}
+        rating_count = rating.get("rating_count") or []
+        discount = item.get("raw_discount")
+        if discount is None:
+            discount = parse_percentage(item.get("discount"))
+        images = item.get("images") or ([item["image"]] if item.get("image") else [])
+        return {
+            "external_id": str(item["itemid"]),
+            "product_name": item.get("name"),
+            "price": self._api_price(item.get("price")),
+            "original_price": self._api_price(item.get("price_before_discount")) or None,
+            "discount_percentage": discount or None,
+            "sold_count": item.get("historical_sold", item.get("sold")),
+            "rating": round(rating.get("rating_star"), 2) if rating.get("rating_star") else None,
+            "review_count": rating_count[0] if rating_count else None,
+            "shop_id": str(item["shopid"]) if item.get("shopid") is not None else None,
+            "shop_name": item.get("shop_name"),
+            "shop_location": item.get("shop_location"),
+            "product_url": f"{self.SHOPEE_BASE_URL}/product/{item.get('shopid')}/{item['itemid']}",
+            "image_urls": [f"{self.IMAGE_BASE_URL}/{image}" for image in images],
+            "category": str(item["catid"]) if item.get("catid") is not None else None,
+            "raw_data": {"source": "api", "item": item},
+        }
+    
+    def _api_price(self, value) -> Optional[float]:
+        return value / self.API_PRICE_SCALE if value else None
+    
+    def _finalize_product(self, card: dict) -> Optional[dict]:
+        """Fill derived fields; cards without an item id are skipped"""
+        url = card.get("product_url") or ""
+        match = ITEM_URL_PATTERN.search(url)
+        external_id = card.pop("item_id", None) or (match.group(2) if match else None)
+        if not external_id or not card.get("product_name"):
+            return None
+        
+        card["external_id"] = external_id
+        card["shop_id"] = match.group(1) if match else None
+        if card.get("discount_percentage") is None and card.get("original_price") and card.get("price"):
+            card["discount_percentage"] = round(100 * (1 - card["price"] / card["original_price"]))
+        card["raw_data"] = {"source": "dom"}
+        return card
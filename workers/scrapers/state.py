@@ -0,0 +1,23 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# redis.asyncio clients are bound to the loop they were created on
+_clients: Dict[int, object] = {}
+
+def get_async_redis():
+    """Shared async Redis client for worker state on the current event loop"""
+    import redis.asyncio as redis
+
+    loop_id = id(asyncio.get_running_loop())
+    if loop_id not in _clients:
+        _clients[loop_id] = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _clients[loop_id]
+
+def use_redis(backend: Optional[str]) -> bool:
+    """Whether a state backend setting selects Redis (anything else is in-process)"""
+    return (backend or "").lower() == "redis"
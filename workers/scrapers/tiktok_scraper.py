@@ -1,7 +1,8 @@
-from typing import List
+from typing import AsyncIterator, List
 import logging
 from playwright.async_api import BrowserContext, Page
 from .base_scraper import BaseScraper
+from .extraction import parse_percentage, parse_price, parse_rating
 
 logger = logging.getLogger(__name__)
 
@@ -9,41 +10,87 @@ class TikTokScraper(BaseScraper):
     """TikTok Shop platform scraper"""
     
     TIKTOK_BASE_URL = "https://www.tiktok.com/search"
+    PLATFORM = "tiktok_shop"
+    NAVIGATION_PROFILE = "lightweight"
     
-    async def search_keyword(self, context: BrowserContext, keyword: str) -> List[dict]:
-        """Search products by keyword on TikTok Shop"""
+    API_RESPONSE_PATTERNS = [
+        r"/api/shop/.*(search|product)",
+        r"/api/search/(general|product)",
+        r"/api/.*/store/.*products",
+    ]
+    
+    async def search_keyword(self, context: BrowserContext, keyword: str, max_pages: int = 1,
+                             concurrency: int = 1, include_details: bool = False) -> AsyncIterator[List[dict]]:
+        """Search products by keyword on TikTok Shop (single infinite-scroll page)"""
         search_url = f"{self.TIKTOK_BASE_URL}?q={keyword}"
+        if not self.pending_pages([search_url]):
+            return
         page = await self.get_page(context, search_url)
         
         try:
-            # TikTok uses dynamic loading
-            await page.wait_for_timeout(3000)
+            # TikTok uses dynamic loading; interception waits for the API payload instead
+            if not self.intercepting:
+                await page.wait_for_timeout(3000)
             
-            # Extract product data
-            results = await self.extract_data(page)
-            await page.close()
-            return results
+            # Extract product data; a failure ends the stream without checkpointing the page
+            results = await self.extract_listing(page)
         
-        except Exception as e:
-            logger.error(f"Error searching TikTok: {str(e)}")
+        finally:
             await page.close()
-            return []
+        
+        self.page_done(search_url, results)
+        yield results
     
-    async def monitor_shop(self, context: BrowserContext, shop_id: str) -> List[dict]:
-        """Monitor TikTok Shop"""
+    async def monitor_shop(self, context: BrowserContext, shop_id: str, max_pages: int = 1,
+                           concurrency: int = 1, include_details: bool = False) -> AsyncIterator[List[dict]]:
+        """Monitor TikTok Shop (single infinite-scroll page)"""
         shop_url = f"https://www.tiktok.com/@{shop_id}"
+        if not self.pending_pages([shop_url]):
+            return
         page = await self.get_page(context, shop_url)
         
         try:
-            await page.wait_for_timeout(3000)
-            results = await self.extract_data(page)
-            await page.close()
-            return results
+            if not self.intercepting:
+                await page.wait_for_timeout(3000)
+            results = await self.extract_listing(page)
         
-        except Exception as e:
-            logger.error(f"Error monitoring TikTok shop: {str(e)}")
+        finally:
             await page.close()
+        
+        self.page_done(shop_url, results)
+        yield results
+    
+    def map_api_payload(self, url: str, payload) -> List[dict]:
+        """Map TikTok Shop search/store API products into product dicts"""
+        if not isinstance(payload, dict):
             return []
+        data = payload.get("data") if isinstance(payload.get("data"), dict) else payload
+        products = data.get("products") or data.get("product_list") or []
+        return [self._map_api_product(p) for p in products if p.get("product_id")]
+    
+    def _map_api_product(self, product: dict) -> dict:
+        price_info = product.get("product_price_info") or {}
+        sold_info = product.get("sold_info") or {}
+        rate_info = product.get("rate_info") or {}
+        seller = product.get("seller_info") or {}
+        image = product.get("image") or {}
+        return {
+            "external_id": str(product["product_id"]),
+            "product_name": product.get("title"),
+            "price": parse_price(price_info.get("sale_price_decimal")),
+            "original_price": parse_price(price_info.get("origin_price_decimal")),
+            "discount_percentage": parse_percentage(price_info.get("discount_format")),
+            "sold_count": sold_info.get("sold_count"),
+            "rating": parse_rating(str(rate_info.get("score"))) if rate_info.get("score") else None,
+            "review_count": rate_info.get("review_count"),
+            "shop_id": str(seller["seller_id"]) if seller.get("seller_id") else None,
+            "shop_name": seller.get("shop_name"),
+            "shop_location": "Indonesia",
+            "product_url": (product.get("seo_url") or {}).get("canonical_url"),
+            "image_urls": image.get("url_list") or [],
+            "category": product.get("category_name"),
+            "raw_data": {"source": "api", "product": product},
+        }
     
     async def extract_data(self, page: Page) -> List[dict]:
         """Extract data from TikTok page"""